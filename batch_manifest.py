@@ -0,0 +1,97 @@
+"""
+批量处理清单
+记录每个视频在何种设置下已处理完成，用于增量处理和中断后续跑
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+
+class BatchManifest:
+    """批量处理清单
+    
+    以 JSON 文件保存在输出目录中，键为视频的绝对路径，值记录文件大小、修改时间、
+    处理设置摘要和处理结果。每完成一个视频立即原子写入，进程崩溃或被中断时
+    已完成的视频不会丢失。
+    """
+    
+    def __init__(self, path: str):
+        """
+        初始化清单，已存在的清单文件会被加载
+        
+        Args:
+            path: 清单文件路径
+        """
+        self.path = Path(path)
+        self.entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('videos', {})
+            except (OSError, ValueError):
+                print(f"警告: 无法读取处理清单 {self.path}，将重新处理所有视频")
+                self.entries = {}
+    
+    @staticmethod
+    def settings_digest(settings: dict) -> str:
+        """计算处理设置的摘要，设置变化时已处理记录失效"""
+        key = json.dumps(settings, sort_keys=True)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    
+    @staticmethod
+    def _file_state(video_path: str) -> dict:
+        stat = os.stat(video_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    
+    def is_done(self, video_path: str, settings: dict) -> bool:
+        """
+        判断视频是否已在相同设置下处理完成且之后未被修改
+        
+        Args:
+            video_path: 视频文件路径
+            settings: 处理设置
+        
+        Returns:
+            是否可以跳过
+        """
+        entry = self.entries.get(str(Path(video_path).resolve()))
+        if entry is None:
+            return False
+        
+        state = self._file_state(video_path)
+        return (entry.get('size') == state['size'] and
+                entry.get('mtime_ns') == state['mtime_ns'] and
+                entry.get('settings') == self.settings_digest(settings))
+    
+    def get(self, video_path: str) -> Optional[dict]:
+        """返回视频的处理记录"""
+        return self.entries.get(str(Path(video_path).resolve()))
+    
+    def mark_done(self, video_path: str, settings: dict, result: dict):
+        """
+        记录视频处理完成并立即写入磁盘
+        
+        Args:
+            video_path: 视频文件路径
+            settings: 处理设置
+            result: 处理结果（截图数、片段数等）
+        """
+        entry = self._file_state(video_path)
+        entry['settings'] = self.settings_digest(settings)
+        entry['frames'] = result.get('frames', 0)
+        entry['clips'] = result.get('clips', 0)
+        entry['completed_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.entries[str(Path(video_path).resolve())] = entry
+        self.save()
+    
+    def save(self):
+        """原子写入清单文件"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'videos': self.entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,177 @@
+"""
+批量处理指标导出
+每个处理单元（单个视频、摄像头组或连续时间线）结束时向 JSONL 文件追加一条记录，
+批次结束时可按 Prometheus textfile collector 格式写出整个批次的汇总指标，
+用于在定时任务中监控处理速度是否跟得上录像的增长。
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+# Prometheus 指标名前缀
+METRIC_PREFIX = 'motion_extractor'
+
+# 按处理单元累计、写入 Prometheus 汇总的计数字段
+TOTAL_FIELDS = ('duration_s', 'frames_decoded', 'frames_redecoded', 'frames_analysed', 'screenshots',
+                'events', 'clips', 'bytes_written', 'cpu_s')
+
+
+class BatchMetrics:
+    """批量处理指标记录器"""
+    
+    def __init__(self, jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None):
+        """
+        初始化记录器
+        
+        Args:
+            jsonl_path: 逐单元记录的 JSONL 文件（追加写入），None 表示不写
+            prometheus_path: 批次汇总指标的 .prom 文件（每次批次结束时整体替换），None 表示不写
+        """
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.batch = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.started = time.perf_counter()
+        self.totals = {name: 0 for name in TOTAL_FIELDS}
+        self.stages: Dict[str, float] = {}
+        self.videos = {'ok': 0, 'failed': 0, 'skipped': 0}
+        self._file = None
+        if jsonl_path:
+            Path(jsonl_path).parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(jsonl_path, 'a', encoding='utf-8')
+    
+    def record(self,
+               name: str,
+               unit: str,
+               results: List[dict],
+               wall_time: float,
+               cpu_time: float,
+               stages: Dict[str, dict],
+               events: Optional[int] = None,
+               duration: float = 0.0,
+               frames: int = 0) -> dict:
+        """
+        记录一个处理单元
+        
+        Args:
+            name: 单元名称（视频文件名、摄像头组时间或时间线名称）
+            unit: 单元类型 (video/camera_group/timeline)
+            results: 该单元中每个视频的处理结果（video/frames/clips/error）
+            wall_time: 处理耗时（秒）
+            cpu_time: 处理占用的 CPU 时间（秒，含后台线程）
+            stages: StageProfiler.to_dict() 的分阶段统计
+            events: 运动事件数，未做事件分段（只提取截图）时为 None
+            duration: 单元中视频的总时长（秒），由处理时已读取的帧率和帧数得出
+            frames: 运动检测时顺序读取的帧数（命中运动索引缓存的视频为 0），
+                    为片段和截图重新定位解码的帧单独记入 frames_redecoded
+        
+        Returns:
+            写入的记录
+        """
+        errors = [r['error'] for r in results if r['error']]
+        record = {
+            'batch': self.batch,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'unit': unit,
+            'name': name,
+            'videos': [r['video'] for r in results],
+            'status': 'failed' if errors else 'ok',
+            'error': errors[0] if errors else None,
+            'duration_s': round(duration, 3),
+            'frames_decoded': frames,
+            'frames_redecoded': stages.get('redecode', {}).get('count', 0),
+            # 每次运动检测都经过灰度转换阶段
+            'frames_analysed': stages.get('gray', {}).get('count', 0),
+            'screenshots': sum(r['frames'] for r in results),
+            'events': events,
+            'clips': sum(r['clips'] for r in results),
+            'bytes_written': sum(s['bytes'] for s in stages.values()),
+            'wall_s': round(wall_time, 3),
+            'cpu_s': round(cpu_time, 3),
+            'fps': round(frames / wall_time, 2) if wall_time > 0 else 0.0,
+            'realtime_factor': round(duration / wall_time, 2) if wall_time > 0 else 0.0,
+            'stages': {stage: round(s['seconds'], 4) for stage, s in stages.items()},
+        }
+        
+        for field in TOTAL_FIELDS:
+            self.totals[field] += record[field] or 0
+        for stage, seconds in record['stages'].items():
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        for result in results:
+            self.videos['failed' if result['error'] else 'ok'] += 1
+        
+        if self._file:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._file.flush()
+        return record
+    
+    def format_prometheus(self, skipped: int = 0) -> str:
+        """
+        格式化整个批次的汇总指标（Prometheus 文本格式，均为 gauge）
+        
+        Args:
+            skipped: 增量模式下跳过的视频数
+        
+        Returns:
+            指标文本
+        """
+        wall_time = time.perf_counter() - self.started
+        lines = []
+        
+        def gauge(name: str, help_text: str, samples: Dict[str, float]):
+            metric = f"{METRIC_PREFIX}_batch_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for labels, value in samples.items():
+                lines.append(f"{metric}{labels} {value:g}")
+        
+        videos = dict(self.videos, skipped=skipped)
+        gauge('videos', 'Videos in the last batch by status.',
+              {f'{{status="{status}"}}': count for status, count in videos.items()})
+        gauge('video_seconds', 'Seconds of footage processed in the last batch.', {'': self.totals['duration_s']})
+        gauge('frames_decoded', 'Frames read sequentially for motion detection in the last batch.',
+              {'': self.totals['frames_decoded']})
+        gauge('frames_redecoded', 'Frames decoded again for clips and screenshots in the last batch.',
+              {'': self.totals['frames_redecoded']})
+        gauge('frames_analysed', 'Frames run through motion detection in the last batch.',
+              {'': self.totals['frames_analysed']})
+        gauge('screenshots', 'Screenshots written in the last batch.', {'': self.totals['screenshots']})
+        gauge('events', 'Motion events found in the last batch.', {'': self.totals['events']})
+        gauge('clips', 'Video clips written in the last batch.', {'': self.totals['clips']})
+        gauge('bytes_written', 'Bytes of screenshots and clips written in the last batch.',
+              {'': self.totals['bytes_written']})
+        gauge('cpu_seconds', 'CPU seconds spent processing videos in the last batch.', {'': self.totals['cpu_s']})
+        gauge('wall_seconds', 'Wall-clock duration of the last batch.', {'': round(wall_time, 3)})
+        gauge('realtime_factor', 'Seconds of footage processed per wall-clock second in the last batch.',
+              {'': round(self.totals['duration_s'] / wall_time, 3) if wall_time > 0 else 0})
+        gauge('stage_seconds', 'Time spent per processing stage in the last batch.',
+              {f'{{stage="{stage}"}}': round(seconds, 4) for stage, seconds in sorted(self.stages.items())})
+        gauge('end_timestamp_seconds', 'Unix time at which the last batch finished.', {'': round(time.time())})
+        return '\n'.join(lines) + '\n'
+    
+    def write_prometheus(self, skipped: int = 0):
+        """
+        写出整个批次的汇总指标
+        
+        先写入临时文件再替换，node_exporter 不会读到写了一半的文件。
+        
+        Args:
+            skipped: 增量模式下跳过的视频数
+        """
+        if not self.prometheus_path:
+            return
+        path = Path(self.prometheus_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(path.name + '.tmp')
+        temp_path.write_text(self.format_prometheus(skipped), encoding='utf-8')
+        os.replace(temp_path, path)
+    
+    def close(self):
+        """关闭 JSONL 文件"""
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,158 @@
+"""
+批量处理进度显示
+处理单个视频时显示逐帧进度条；处理多个视频时只显示一个批量进度条，当前视频的进度
+按比例计入批量进度。刷新频率受限，输出不是终端时不创建进度条，逐帧更新直接返回。
+"""
+
+import sys
+import time
+from typing import Optional
+
+from tqdm import tqdm
+
+
+def _is_terminal(stream) -> bool:
+    """stream 是否为交互式终端"""
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+class BatchProgress:
+    """批量处理进度
+    
+    逐帧的 update() 至多每 interval 秒刷新一次显示，速度、剩余时间等附加信息只在刷新时计算；
+    视频总帧数由处理器在回调中提供，结束时直接补满，不再重新打开视频读取帧数。
+    """
+    
+    def __init__(self, total_videos: int, enabled: bool = True, interval: float = 0.5, file=None):
+        """
+        初始化进度显示
+        
+        Args:
+            total_videos: 本批次要处理的视频数，大于 1 时显示合并的批量进度条
+            enabled: 是否显示进度；即使为 True，输出不是终端时也不显示
+            interval: 逐帧更新的最小刷新间隔（秒）
+            file: 进度条输出流，默认为 sys.stderr（与 tqdm 相同）
+        """
+        self.file = file or sys.stderr
+        self.enabled = enabled and _is_terminal(self.file)
+        self.total_videos = total_videos
+        self.interval = interval
+        self.done = 0
+        self.screenshots = 0
+        self.video_name = None
+        self.video_weight = 1
+        self.video_started = 0.0
+        self.next_refresh = 0.0
+        self.bar = None
+        if self.enabled and self.aggregated:
+            self.bar = tqdm(total=total_videos, desc="批量进度", file=self.file,
+                            bar_format='{desc}: {percentage:3.0f}%|{bar}| {elapsed} {postfix}')
+            self._refresh_batch({})
+    
+    @property
+    def aggregated(self) -> bool:
+        """是否为多个视频合并显示"""
+        return self.total_videos > 1
+    
+    def start_video(self, name: str, videos: int = 1):
+        """
+        开始处理一个视频（或摄像头组、时间线）
+        
+        Args:
+            name: 显示的名称
+            videos: 包含的视频数，当前进度按该数量计入批量进度
+        """
+        if not self.enabled:
+            return
+        self.video_name = name
+        self.video_weight = videos
+        self.video_started = time.monotonic()
+        self.next_refresh = 0.0
+    
+    def update(self, current_frame: int, total_frames: int, timestamp: float):
+        """
+        逐帧更新当前视频的进度（限频刷新）
+        
+        Args:
+            current_frame: 当前帧号
+            total_frames: 当前视频的总帧数
+            timestamp: 当前帧在视频中的时间（秒）
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now < self.next_refresh:
+            return
+        self.next_refresh = now + self.interval
+        
+        info = {}
+        elapsed = now - self.video_started
+        if elapsed > 0 and current_frame > 0:
+            fps = current_frame / elapsed
+            info['速度'] = f'{fps:.1f}帧/s'
+            info['剩余'] = f'{int(max(0, total_frames - current_frame) / fps)}s'
+        info['时间'] = f"{int(timestamp // 60):02d}:{int(timestamp % 60):02d}"
+        
+        if self.aggregated:
+            fraction = min(1.0, current_frame / total_frames) if total_frames > 0 else 0.0
+            self.bar.n = self.done + fraction * self.video_weight
+            self._refresh_batch(info)
+            return
+        
+        if self.bar is None:
+            self.bar = tqdm(total=total_frames, unit='帧', desc="处理进度", file=self.file)
+        self.bar.n = current_frame
+        self.bar.set_postfix(info, refresh=False)
+        self.bar.refresh()
+    
+    def end_video(self, completed: bool = True):
+        """
+        当前视频处理结束；单个视频的进度条补满到 100% 后关闭
+        
+        Args:
+            completed: 是否处理完成（出错时不补满）
+        """
+        if not self.enabled:
+            return
+        self.video_name = None
+        if self.aggregated or self.bar is None:
+            return
+        if completed:
+            self.bar.n = self.bar.total
+            self.bar.refresh()
+        self.bar.close()
+        self.bar = None
+    
+    def advance(self, videos: int = 1, screenshots: Optional[int] = None):
+        """
+        批量进度前进
+        
+        Args:
+            videos: 完成的视频数
+            screenshots: 整个批次到目前为止提取的截图数
+        """
+        self.done += videos
+        self.video_name = None
+        if screenshots is not None:
+            self.screenshots = screenshots
+        if self.bar is not None and self.aggregated:
+            self.bar.n = self.done
+            self._refresh_batch({})
+    
+    def _refresh_batch(self, info: dict):
+        """刷新批量进度条的附加信息"""
+        postfix = {'完成': f'{self.done}/{self.total_videos}', '截图': self.screenshots}
+        if self.video_name:
+            postfix['当前'] = self.video_name
+        postfix.update(info)
+        self.bar.set_postfix(postfix, refresh=False)
+        self.bar.refresh()
+    
+    def close(self):
+        """关闭进度条"""
+        if self.bar is not None:
+            self.bar.close()
+            self.bar = None
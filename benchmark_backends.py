@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+检测后端基准测试
+在相同的采样帧上比较各检测后端的吞吐量和检测结果
+
+用法:
+  python benchmark_backends.py                 # 使用合成视频（已知运动时段，可计算准确率）
+  python benchmark_backends.py a.mp4 b.mp4     # 使用自己的录像（以 diff 后端为参照比较一致性）
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from detection_backends import DETECTION_BACKENDS
+from video_processor import MotionDetector, sample_frames
+
+
+# 合成视频中有运动的时段（秒）
+SYNTHETIC_MOTION = ((3.0, 7.0), (11.0, 13.5))
+
+
+def create_synthetic_clip(output_path: str, duration: int = 16, fps: int = 30):
+    """
+    创建带已知运动时段的合成视频
+    
+    背景带噪声和缓慢的亮度变化，右上角有一块持续轻微抖动的区域（模拟树叶），
+    SYNTHETIC_MOTION 时段内有物体穿过画面。
+    
+    Args:
+        output_path: 输出视频路径
+        duration: 时长（秒）
+        fps: 帧率
+    """
+    width, height = 640, 360
+    rng = np.random.default_rng(0)
+    base = np.full((height, width, 3), 70, dtype=np.uint8)
+    cv2.rectangle(base, (0, 250), (width, height), (90, 90, 90), -1)
+    foliage = rng.integers(30, 200, (80, 160, 3), dtype=np.uint8)
+    
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for i in range(duration * fps):
+        t = i / fps
+        frame = cv2.add(base, np.full_like(base, int(10 * (1 + np.sin(t / 4)))))
+        shift = int(2 * np.sin(t * 6))
+        frame[10:90, 460 + shift:620 + shift] = foliage
+        for start, end in SYNTHETIC_MOTION:
+            if start <= t < end:
+                x = int(20 + (t - start) / (end - start) * (width - 100))
+                cv2.rectangle(frame, (x, 170), (x + 60, 240), (30, 160, 220), -1)
+        frame = cv2.add(frame, rng.integers(0, 8, frame.shape, dtype=np.uint8))
+        out.write(frame)
+    out.release()
+
+
+def load_samples(video_path: str, fps: int, max_frames: int) -> Tuple[List[float], List[np.ndarray]]:
+    """
+    解码视频的采样帧，所有后端在同一组帧上检测
+    
+    Args:
+        video_path: 视频文件路径
+        fps: 处理帧率
+        max_frames: 最多保留的采样帧数
+    
+    Returns:
+        (timestamps, frames)
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"无法打开视频文件: {video_path}")
+    video_fps = cap.get(cv2.CAP_PROP_FPS)
+    interval = max(1, int(video_fps / fps)) if video_fps > 0 else 1
+    timestamps, frames = [], []
+    try:
+        for frame_index, frame in sample_frames(cap, interval):
+            timestamps.append(frame_index / video_fps if video_fps > 0 else 0.0)
+            frames.append(frame)
+            if len(frames) >= max_frames:
+                break
+    finally:
+        cap.release()
+    return timestamps, frames
+
+
+def run_backend(backend: str, frames: List[np.ndarray], **detector_options) -> Tuple[float, np.ndarray]:
+    """
+    用指定后端依次检测所有帧
+    
+    Args:
+        backend: 后端名称
+        frames: 采样帧
+        detector_options: 其他 MotionDetector 参数
+    
+    Returns:
+        (elapsed, flags): 检测耗时（秒）和逐帧是否有运动
+    """
+    detector = MotionDetector(backend=backend, **detector_options)
+    flags = np.zeros(len(frames), dtype=bool)
+    start = time.perf_counter()
+    for i, frame in enumerate(frames):
+        flags[i] = detector.detect_motion(frame)[0]
+    return time.perf_counter() - start, flags
+
+
+def score(flags: np.ndarray, truth: np.ndarray) -> Tuple[float, float, float]:
+    """
+    计算逐帧检测的精确率、召回率和 F1
+    
+    Returns:
+        (precision, recall, f1)
+    """
+    true_positive = float(np.sum(flags & truth))
+    precision = true_positive / max(1, np.sum(flags))
+    recall = true_positive / max(1, np.sum(truth))
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def benchmark_clip(video_path: str,
+                   fps: int,
+                   max_frames: int,
+                   truth_spans: Optional[tuple] = None,
+                   **detector_options):
+    """
+    在一个视频上比较所有后端并打印结果
+    
+    Args:
+        video_path: 视频文件路径
+        fps: 处理帧率
+        max_frames: 最多检测的采样帧数
+        truth_spans: 已知的运动时段，None 表示以 diff 后端的结果为参照
+        detector_options: 其他 MotionDetector 参数
+    """
+    timestamps, frames = load_samples(video_path, fps, max_frames)
+    print(f"\n{os.path.basename(video_path)}: {len(frames)} 个采样帧")
+    if not frames:
+        return
+    
+    results = {name: run_backend(name, frames, **detector_options) for name in DETECTION_BACKENDS}
+    if truth_spans is not None:
+        times = np.asarray(timestamps)
+        reference = np.zeros(len(times), dtype=bool)
+        for start, end in truth_spans:
+            reference |= (times >= start) & (times < end)
+        quality = '精确率   召回率   F1'
+    else:
+        reference = results['diff'][1]
+        quality = '与 diff 一致率'
+    
+    print(f"  {'后端':<8} {'帧/秒':>8} {'运动帧':>6}   {quality}")
+    for name, (elapsed, flags) in results.items():
+        throughput = len(frames) / elapsed if elapsed > 0 else float('inf')
+        if truth_spans is not None:
+            precision, recall, f1 = score(flags, reference)
+            detail = f"{precision:6.2f}  {recall:6.2f}  {f1:6.2f}"
+        else:
+            detail = f"{np.mean(flags == reference):6.2f}"
+        print(f"  {name:<8} {throughput:8.1f} {int(flags.sum()):6d}   {detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较各运动检测后端的吞吐量和检测结果')
+    parser.add_argument('videos', nargs='*', help='视频文件（省略时使用合成视频）')
+    parser.add_argument('--fps', type=int, default=5, help='处理帧率 (默认: 5)')
+    parser.add_argument('--max-frames', type=int, default=600, help='每个视频最多检测的采样帧数 (默认: 600)')
+    parser.add_argument('--detect-scale', type=float, default=1.0, help='检测分辨率缩放比例 (默认: 1.0)')
+    parser.add_argument('--no-prefilter', action='store_true', help='禁用缩略图预筛选')
+    args = parser.parse_args()
+    
+    options = dict(detection_scale=args.detect_scale, prefilter=not args.no_prefilter)
+    if args.videos:
+        for video_path in args.videos:
+            benchmark_clip(video_path, args.fps, args.max_frames, **options)
+        return 0
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'synthetic.mp4')
+        create_synthetic_clip(video_path)
+        benchmark_clip(video_path, args.fps, args.max_frames, SYNTHETIC_MOTION, **options)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+检测器工作缓冲区微基准
+比较 MotionDetector 复用预分配缓冲区与逐帧分配两种模式的单帧耗时和临时内存分配
+
+用法:
+  python benchmark_buffers.py                  # 使用合成视频
+  python benchmark_buffers.py video.mp4        # 使用自己的录像
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List
+
+import numpy as np
+
+from benchmark_backends import create_synthetic_clip, load_samples
+from video_processor import MotionDetector
+
+
+def measure_latency(frames: List[np.ndarray], repeat: int, **detector_options) -> float:
+    """
+    测量单帧检测耗时（多轮取中位数）
+    
+    Returns:
+        每帧耗时（毫秒）
+    """
+    rounds = []
+    for _ in range(repeat):
+        detector = MotionDetector(**detector_options)
+        start = time.perf_counter()
+        for frame in frames:
+            detector.detect_motion(frame)
+        rounds.append((time.perf_counter() - start) / len(frames) * 1000)
+    return float(np.median(rounds))
+
+
+def measure_allocations(frames: List[np.ndarray], **detector_options) -> float:
+    """
+    测量每帧检测期间临时分配的内存峰值（跳过第一帧的缓冲区分配）
+    
+    Returns:
+        每帧临时分配峰值的中位数（KB）
+    """
+    detector = MotionDetector(**detector_options)
+    detector.detect_motion(frames[0])
+    peaks = []
+    tracemalloc.start()
+    try:
+        for frame in frames[1:]:
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            detector.detect_motion(frame)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return float(np.median(peaks)) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较检测器复用缓冲区前后的单帧耗时和内存分配')
+    parser.add_argument('video', nargs='?', help='视频文件（省略时使用合成视频）')
+    parser.add_argument('--fps', type=int, default=10, help='处理帧率 (默认: 10)')
+    parser.add_argument('--max-frames', type=int, default=200, help='最多检测的采样帧数 (默认: 200)')
+    parser.add_argument('--repeat', type=int, default=5, help='计时轮数 (默认: 5)')
+    parser.add_argument('--detect-scale', type=float, default=1.0, help='检测分辨率缩放比例 (默认: 1.0)')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = args.video
+        if video_path is None:
+            video_path = os.path.join(tmp, 'synthetic.mp4')
+            create_synthetic_clip(video_path)
+        _, frames = load_samples(video_path, args.fps, args.max_frames)
+    if len(frames) < 2:
+        print("错误: 采样帧不足")
+        return 1
+    
+    # 关闭预筛选，让每一帧都走完整的检测流程
+    print(f"{len(frames)} 个采样帧, 分辨率 {frames[0].shape[1]}x{frames[0].shape[0]}, "
+          f"检测缩放 {args.detect_scale}")
+    print(f"  {'模式':<10} {'毫秒/帧':>8} {'临时分配(KB/帧)':>16}")
+    for label, reuse in (('逐帧分配', False), ('复用缓冲区', True)):
+        options = dict(detection_scale=args.detect_scale, prefilter=False, reuse_buffers=reuse)
+        latency = measure_latency(frames, args.repeat, **options)
+        allocated = measure_allocations(frames, **options)
+        print(f"  {label:<10} {latency:8.3f} {allocated:16.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+性能基准套件
+合成特斯拉风格的多摄像头录像（默认 1280x960、36 fps），测量解码、运动检测和片段提取的
+吞吐量、各阶段耗时以及进程峰值内存；结果可保存为 JSON，与之前保存的结果逐项比较
+
+用法:
+  python benchmark_suite.py                                  # 4 个摄像头，每个 10 秒，运动密度 0.3
+  python benchmark_suite.py --density 0.8 --json result.json # 保存结果
+  python benchmark_suite.py --compare baseline.json          # 与之前的结果比较
+  python benchmark_suite.py --footage-dir ./bench_footage    # 复用合成的录像，省去每次合成的时间
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不报告峰值内存
+    resource = None
+
+from camera_groups import TESLA_CAMERAS
+from motion_regions import draw_motion_boxes
+from video_clip_extractor import VideoClipExtractor, find_ffmpeg
+from video_processor import MotionDetector, sample_frames
+
+
+# JSON 结果格式版本，指标含义变化时递增
+RESULT_VERSION = 1
+
+# 合成录像按该时长（秒）分段，每段按运动密度决定是否有车辆经过
+SLOT_SECONDS = 2.0
+
+# 合成录像使用的特斯拉文件名时间戳
+FOOTAGE_TIMESTAMP = '2024-01-01_12-00-00'
+
+
+def synthesize_camera(output_path: str,
+                      width: int,
+                      height: int,
+                      fps: int,
+                      duration: float,
+                      density: float,
+                      seed: int) -> List[Tuple[float, float]]:
+    """
+    合成一个摄像头的录像
+    
+    背景为天空和路面并带有逐帧变化的传感器噪声；有运动的时段内 1-4 辆"车"以随机的速度和方向穿过画面。
+    
+    Args:
+        output_path: 输出视频路径
+        width: 画面宽度
+        height: 画面高度
+        fps: 帧率
+        duration: 时长（秒）
+        density: 运动密度 (0-1)，有运动的时段占比，同时也决定同一时段内的车辆数
+        seed: 随机种子，相同参数生成相同的录像
+    
+    Returns:
+        有运动的时段 [(start, end), ...]（秒）
+    """
+    rng = np.random.default_rng(seed)
+    horizon = height * 2 // 5
+    base = np.empty((height, width, 3), dtype=np.uint8)
+    base[:horizon] = (150, 120, 90)
+    base[horizon:] = (80, 80, 80)
+    for x in range(0, width, width // 8):
+        cv2.line(base, (x, height * 3 // 4), (x + width // 16, height * 3 // 4), (200, 200, 200), 4)
+    noise = rng.integers(0, 12, (8, height, width, 3), dtype=np.uint8)
+    
+    # 有运动的时段均匀分布，占比等于运动密度（第一个时段总是静止的，检测器先建立参考帧）
+    slots = int(np.ceil(duration / SLOT_SECONDS))
+    steps = np.floor(np.arange(slots + 1) * density)
+    active = steps[1:] > steps[:-1]
+    vehicles = {}
+    for slot in np.flatnonzero(active):
+        count = 1 + int(rng.integers(0, 1 + int(density * 3)))
+        vehicles[slot] = [(int(rng.integers(horizon, height - height // 6)),  # 车辆上边缘
+                           int(rng.integers(width // 12, width // 5)),        # 车长
+                           float(rng.uniform(0.6, 1.0)),                       # 相对速度
+                           bool(rng.integers(0, 2)),                           # 是否从右向左
+                           tuple(int(c) for c in rng.integers(0, 255, 3)))
+                          for _ in range(count)]
+    
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise ValueError(f"无法创建合成录像: {output_path}")
+    try:
+        for i in range(int(duration * fps)):
+            t = i / fps
+            frame = cv2.add(base, noise[i % len(noise)])
+            slot = int(t // SLOT_SECONDS)
+            progress = t / SLOT_SECONDS - slot
+            for top, length, speed, reverse, color in vehicles.get(slot, ()):
+                x = int((width + length) * progress * speed) - length
+                if reverse:
+                    x = width - x - length
+                cv2.rectangle(frame, (x, top), (x + length, top + length // 2), color, -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    
+    # 相邻的运动时段合并
+    spans = []
+    for slot in np.flatnonzero(active):
+        start, end = float(slot * SLOT_SECONDS), float(min(duration, (slot + 1) * SLOT_SECONDS))
+        if spans and spans[-1][1] == start:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def synthesize_footage(directory: Path, config: dict) -> Tuple[Dict[str, str], Dict[str, list]]:
+    """
+    合成各摄像头的录像；目录中已有相同参数合成的录像时直接复用
+    
+    Args:
+        directory: 录像目录
+        config: 合成参数（cameras、width、height、video_fps、duration、density、seed）
+    
+    Returns:
+        (paths, spans): 摄像头名称 -> 录像路径，摄像头名称 -> 有运动的时段
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    meta_path = directory / 'footage.json'
+    cameras = TESLA_CAMERAS[:config['cameras']]
+    paths = {camera: str(directory / f"{FOOTAGE_TIMESTAMP}-{camera}.mp4") for camera in cameras}
+    
+    try:
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        if meta['config'] == config and all(os.path.exists(p) for p in paths.values()):
+            return paths, meta['spans']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    
+    spans = {camera: synthesize_camera(path, config['width'], config['height'], config['video_fps'],
+                                       config['duration'], config['density'], config['seed'] + number)
+             for number, (camera, path) in enumerate(paths.items())}
+    meta_path.write_text(json.dumps({'config': config, 'spans': spans}, sort_keys=True), encoding='utf-8')
+    return paths, spans
+
+
+def peak_rss_mb() -> Optional[float]:
+    """进程迄今为止的峰值常驻内存（MB），平台不支持时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure_detection(paths: List[str], fps: int, **detector_options) -> dict:
+    """
+    按处理帧率采样各录像并检测运动，分别统计解码和检测的耗时
+    
+    Args:
+        paths: 录像路径
+        fps: 处理帧率
+        detector_options: MotionDetector 参数
+    
+    Returns:
+        检测阶段的指标
+    """
+    decode_s = detect_s = video_s = 0.0
+    calls = motion = prefilter_rejected = 0
+    for path in paths:
+        cap = cv2.VideoCapture(path)
+        video_fps = cap.get(cv2.CAP_PROP_FPS)
+        video_s += cap.get(cv2.CAP_PROP_FRAME_COUNT) / video_fps
+        detector = MotionDetector(**detector_options)
+        frames = sample_frames(cap, max(1, int(video_fps / fps)))
+        try:
+            while True:
+                start = time.perf_counter()
+                sample = next(frames, None)
+                decode_s += time.perf_counter() - start
+                if sample is None:
+                    break
+                start = time.perf_counter()
+                detector.detect_motion(sample[1])
+                detect_s += time.perf_counter() - start
+                calls += 1
+        finally:
+            cap.release()
+        motion += detector.stats['motion']
+        prefilter_rejected += detector.stats['prefilter_rejected']
+    
+    elapsed = decode_s + detect_s
+    return {
+        'sampled_frames': calls,
+        'motion_frames': motion,
+        'prefilter_rejected': prefilter_rejected,
+        'decode_s': decode_s,
+        'detect_s': detect_s,
+        'detect_ms_per_call': detect_s / calls * 1000 if calls else 0.0,
+        'frames_per_s': calls / elapsed if elapsed else 0.0,
+        'realtime_factor': video_s / elapsed if elapsed else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def measure_stage_split(path: str, frames: int, start_time: float = 0.0, **detector_options) -> dict:
+    """
+    逐帧解码、检测、绘制标注并重新编码，分别统计各步骤每帧的耗时（即片段提取的逐帧开销）
+    
+    Args:
+        path: 录像路径
+        frames: 处理的帧数
+        start_time: 开始时间（秒），通常为第一个运动时段的开始
+        detector_options: MotionDetector 参数
+    
+    Returns:
+        各步骤的每帧耗时（毫秒）
+    """
+    totals = {'decode': 0.0, 'detect': 0.0, 'annotate': 0.0, 'encode': 0.0}
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    if start_time > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(start_time * fps))
+    detector = MotionDetector(**detector_options)
+    processed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = cv2.VideoWriter(os.path.join(tmp, 'split.mp4'), cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+        try:
+            while processed < frames:
+                start = time.perf_counter()
+                ret, frame = cap.read()
+                decoded = time.perf_counter()
+                if not ret:
+                    break
+                _, _, regions = detector.detect_motion(frame)
+                detected = time.perf_counter()
+                draw_motion_boxes(frame, regions.boxes)
+                annotated = time.perf_counter()
+                writer.write(frame)
+                encoded = time.perf_counter()
+                
+                totals['decode'] += decoded - start
+                totals['detect'] += detected - decoded
+                totals['annotate'] += annotated - detected
+                totals['encode'] += encoded - annotated
+                processed += 1
+        finally:
+            cap.release()
+            writer.release()
+    
+    result = {f'{step}_ms_per_frame': seconds / processed * 1000 if processed else 0.0
+              for step, seconds in totals.items()}
+    result['frames'] = processed
+    return result
+
+
+def measure_clip_extraction(paths: List[str], fps: int, clip_workers: int, **extractor_options) -> dict:
+    """
+    检测各录像的运动事件并提取片段，统计片段提取阶段的吞吐量（不含事件检测）
+    
+    Args:
+        paths: 录像路径
+        fps: 处理帧率
+        clip_workers: 同时提取的片段数
+        extractor_options: VideoClipExtractor 参数
+    
+    Returns:
+        片段提取阶段的指标
+    """
+    clips = clip_frames = 0
+    elapsed = 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        for number, path in enumerate(paths):
+            extractor = VideoClipExtractor(clip_workers=clip_workers, **extractor_options)
+            with contextlib.redirect_stdout(io.StringIO()):
+                windows = extractor.clip_windows(extractor.detect_motion_events(path, fps))
+                extract = extractor.remux_window if extractor.fast_clips else extractor.extract_window
+                outputs = [os.path.join(tmp, f'{number}_{i}.mp4') for i in range(len(windows))]
+                start = time.perf_counter()
+                results = extractor.run_clip_jobs([partial(extract, path, window, output)
+                                                   for window, output in zip(windows, outputs)])
+                elapsed += time.perf_counter() - start
+            
+            for output, success in zip(outputs, results):
+                if success:
+                    cap = cv2.VideoCapture(output)
+                    clip_frames += int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                    cap.release()
+                    clips += 1
+    
+    return {
+        'clips': clips,
+        'clip_frames': clip_frames,
+        'seconds': elapsed,
+        'frames_per_s': clip_frames / elapsed if elapsed else 0.0,
+        'clips_per_s': clips / elapsed if elapsed else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def flatten_metrics(metrics: dict, prefix: str = '') -> Dict[str, float]:
+    """把嵌套的指标展开为 "阶段.指标" -> 数值"""
+    flat = {}
+    for key, value in metrics.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten_metrics(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare_results(current: dict, baseline: dict):
+    """
+    逐项打印与之前保存的结果相比的变化
+    
+    Args:
+        current: 本次结果
+        baseline: 之前保存的结果
+    """
+    if baseline.get('version') != current['version']:
+        print(f"警告: 结果格式版本不同 ({baseline.get('version')} -> {current['version']})，部分指标可能不可比")
+    if baseline.get('config') != current['config']:
+        print("警告: 两次运行的基准参数不同，结果不可直接比较")
+    
+    old = flatten_metrics(baseline.get('metrics', {}))
+    new = flatten_metrics(current['metrics'])
+    print(f"\n与 {baseline.get('timestamp', '之前的结果')} 比较:")
+    print(f"  {'指标':<42} {'之前':>10} {'本次':>10} {'变化':>8}")
+    for name in sorted(set(old) & set(new)):
+        change = f"{(new[name] - old[name]) / old[name] * 100:+7.1f}%" if old[name] else '       -'
+        print(f"  {name:<42} {old[name]:10.2f} {new[name]:10.2f} {change}")
+
+
+def print_summary(result: dict):
+    """打印基准结果摘要"""
+    metrics = result['metrics']
+    detection = metrics['detection']
+    split = metrics['stage_split']
+    clips = metrics['clips']
+    print(f"\n合成录像: {result['footage']['synthesize_s']:.1f}s")
+    print(f"运动检测: {detection['sampled_frames']} 个采样帧, {detection['frames_per_s']:.1f} 帧/秒, "
+          f"每次检测 {detection['detect_ms_per_call']:.2f} ms, 实时倍速 {detection['realtime_factor']:.1f}x")
+    print(f"  解码 {detection['decode_s']:.2f}s, 检测 {detection['detect_s']:.2f}s, "
+          f"有运动 {detection['motion_frames']} 帧, 预筛选排除 {detection['prefilter_rejected']} 帧")
+    print(f"逐帧耗时 ({split['frames']} 帧): 解码 {split['decode_ms_per_frame']:.2f} ms, "
+          f"检测 {split['detect_ms_per_frame']:.2f} ms, 标注 {split['annotate_ms_per_frame']:.2f} ms, "
+          f"编码 {split['encode_ms_per_frame']:.2f} ms")
+    print(f"片段提取: {clips['clips']} 个片段 / {clips['clip_frames']} 帧, 用时 {clips['seconds']:.2f}s, "
+          f"{clips['frames_per_s']:.1f} 帧/秒")
+    if metrics['peak_rss_mb'] is not None:
+        print(f"峰值内存: {metrics['peak_rss_mb']:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合成多摄像头录像，测量解码、运动检测和片段提取的性能')
+    parser.add_argument('--cameras', type=int, default=4, choices=range(1, len(TESLA_CAMERAS) + 1),
+                        help='摄像头数量 (默认: 4)')
+    parser.add_argument('--duration', type=float, default=10.0, help='每个摄像头的录像时长（秒）(默认: 10)')
+    parser.add_argument('--width', type=int, default=1280, help='画面宽度 (默认: 1280)')
+    parser.add_argument('--height', type=int, default=960, help='画面高度 (默认: 960)')
+    parser.add_argument('--video-fps', type=int, default=36, help='录像帧率 (默认: 36)')
+    parser.add_argument('--density', type=float, default=0.3, help='运动密度 0-1，有运动的时段占比 (默认: 0.3)')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子 (默认: 0)')
+    parser.add_argument('--fps', type=int, default=2, help='处理帧率 (默认: 2)')
+    parser.add_argument('--detect-scale', type=float, default=1.0, help='检测分辨率缩放比例 (默认: 1.0)')
+    parser.add_argument('--detect-backend', default='diff', help='运动检测后端 (默认: diff)')
+    parser.add_argument('--split-frames', type=int, default=72, help='逐帧耗时统计的帧数 (默认: 72)')
+    parser.add_argument('--clip-workers', type=int, default=1, help='同时提取的片段数 (默认: 1)')
+    parser.add_argument('--fast-clips', action='store_true', help='以码流复制方式提取片段（需要 ffmpeg）')
+    parser.add_argument('--footage-dir', default=None, help='合成录像的保存目录，参数相同时复用 (默认: 临时目录)')
+    parser.add_argument('--json', default=None, help='把结果保存为 JSON 文件')
+    parser.add_argument('--compare', default=None, help='与之前保存的 JSON 结果比较')
+    args = parser.parse_args()
+    
+    if not 0 <= args.density <= 1:
+        print("错误: 运动密度必须在 0-1 之间")
+        return 1
+    if args.fast_clips and find_ffmpeg() is None:
+        print("错误: 未找到 ffmpeg，无法测量快速片段模式")
+        return 1
+    
+    footage = {'cameras': args.cameras, 'width': args.width, 'height': args.height,
+               'video_fps': args.video_fps, 'duration': args.duration,
+               'density': args.density, 'seed': args.seed}
+    detector_options = {'detection_scale': args.detect_scale, 'backend': args.detect_backend}
+    config = dict(footage, fps=args.fps, split_frames=args.split_frames, clip_workers=args.clip_workers,
+                  fast_clips=args.fast_clips, **detector_options)
+    
+    with contextlib.ExitStack() as stack:
+        directory = args.footage_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        print(f"合成 {args.cameras} 个摄像头的录像: {args.width}x{args.height}, {args.video_fps} fps, "
+              f"{args.duration:g} 秒, 运动密度 {args.density:g}")
+        start = time.perf_counter()
+        paths, spans = synthesize_footage(Path(directory), footage)
+        synthesize_s = time.perf_counter() - start
+        first_camera = next(iter(paths))
+        first_motion = spans[first_camera][0][0] if spans[first_camera] else 0.0
+        paths = list(paths.values())
+        
+        print("测量运动检测...")
+        detection = measure_detection(paths, args.fps, **detector_options)
+        print("测量逐帧耗时...")
+        split = measure_stage_split(paths[0], args.split_frames, first_motion, **detector_options)
+        print("测量片段提取...")
+        clips = measure_clip_extraction(paths, args.fps, args.clip_workers,
+                                        min_motion_duration=1.0, clip_before=2.0, clip_after=2.0,
+                                        detection_scale=args.detect_scale,
+                                        detection_backend=args.detect_backend,
+                                        fast_clips=args.fast_clips)
+    
+    result = {
+        'version': RESULT_VERSION,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'opencv_threads': cv2.getNumThreads(),
+        },
+        'config': config,
+        # 合成耗时取决于是否复用了已有录像，不参与比较
+        'footage': {'synthesize_s': synthesize_s, 'spans': spans},
+        'metrics': {
+            'detection': detection,
+            'stage_split': split,
+            'clips': clips,
+            'peak_rss_mb': peak_rss_mb(),
+        },
+    }
+    print_summary(result)
+    
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n结果已保存: {args.json}")
+    if args.compare:
+        compare_results(result, json.loads(Path(args.compare).read_text(encoding='utf-8')))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+特斯拉多摄像头分组
+按文件名把同一分钟的前/后/侧方录像归为一组，各角度的运动检测结果融合为同一条时间线
+"""
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from motion_index import MotionIndex
+
+
+# 特斯拉录像的摄像头名称（新车型额外有 B 柱摄像头）
+TESLA_CAMERAS = ('front', 'back', 'left_repeater', 'right_repeater', 'left_pillar', 'right_pillar')
+
+_TESLA_FILENAME = re.compile(
+    r'^(?P<timestamp>\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})-(?P<camera>' + '|'.join(TESLA_CAMERAS) + r')$')
+
+
+def parse_tesla_filename(video_path) -> Optional[Tuple[str, str]]:
+    """
+    解析特斯拉录像文件名，例如 2024-05-01_12-30-00-front.mp4
+    
+    Args:
+        video_path: 视频文件路径
+    
+    Returns:
+        (timestamp, camera) 元组，不是特斯拉命名格式时返回 None
+    """
+    match = _TESLA_FILENAME.match(Path(video_path).stem)
+    if match is None:
+        return None
+    return match.group('timestamp'), match.group('camera')
+
+
+@dataclass
+class CameraGroup:
+    """同一分钟、同一目录下各摄像头角度的录像"""
+    timestamp: str                                           # 录像开始时间（文件名中的时间戳）
+    cameras: Dict[str, Path] = field(default_factory=dict)   # 摄像头名称 -> 视频路径
+    source: str = '.'                                        # 所在目录（相对输入目录）
+    
+    @property
+    def videos(self) -> List[Path]:
+        """组内所有视频路径"""
+        return list(self.cameras.values())
+    
+    @property
+    def output_name(self) -> Path:
+        """输出子目录：不同目录下同一时间的录像（如 SavedClips 和 SentryClips）各自输出"""
+        return Path(self.source) / self.timestamp
+    
+    def __repr__(self):
+        return f"CameraGroup({self.timestamp}, {', '.join(self.cameras)})"
+
+
+def group_camera_files(video_files: List[Path],
+                       root: Optional[Path] = None) -> Tuple[List[CameraGroup], List[Path]]:
+    """
+    把特斯拉多摄像头录像按分钟分组
+    
+    只有同一目录下、同一时间戳的文件才归为一组；不符合特斯拉命名格式或只有
+    单个角度的文件按普通视频处理。
+    
+    Args:
+        video_files: 视频文件列表
+        root: 输入目录，组的 source 为所在目录相对它的路径；None 或不在其下时为所在目录名
+    
+    Returns:
+        (groups, singles): 摄像头组列表和其余的单个视频列表
+    """
+    groups = {}
+    singles = []
+    for video_path in video_files:
+        parsed = parse_tesla_filename(video_path)
+        if parsed is None:
+            singles.append(video_path)
+            continue
+        timestamp, camera = parsed
+        key = (video_path.parent, timestamp)
+        if key not in groups:
+            groups[key] = CameraGroup(timestamp, source=_source_dir(video_path.parent, root))
+        groups[key].cameras[camera] = video_path
+    
+    result = []
+    for key in sorted(groups):
+        group = groups[key]
+        if len(group.cameras) < 2:
+            singles.extend(group.videos)
+            continue
+        # 按固定的摄像头顺序排列，输出文件名和日志保持稳定
+        group.cameras = {c: group.cameras[c] for c in TESLA_CAMERAS if c in group.cameras}
+        result.append(group)
+    
+    return result, sorted(singles)
+
+
+def _source_dir(directory: Path, root: Optional[Path]) -> str:
+    """目录相对输入目录的路径，不在输入目录下时取目录名"""
+    if root is not None:
+        try:
+            return str(directory.relative_to(root))
+        except ValueError:
+            pass
+    return directory.name or '.'
+
+
+def fuse_motion_indices(indices: List[MotionIndex]) -> MotionIndex:
+    """
+    按采样时间对齐多个角度的运动索引，融合为一条时间线
+    
+    各角度的采样时间按采样间隔取整对齐，任一角度有运动即视为有运动，
+    运动面积为各角度之和。融合后的索引不含运动区域，只用于推导事件。
+    
+    Args:
+        indices: 各角度的运动索引
+    
+    Returns:
+        融合后的运动索引
+    """
+    intervals = [np.median(np.diff(index.timestamps)) for index in indices if len(index) > 1]
+    step = min(intervals) if intervals else 1.0
+    video_fps = max(index.video_fps for index in indices)
+    
+    bins = [np.rint(index.timestamps / step).astype(np.int64) for index in indices]
+    size = max((int(b.max()) + 1 for b in bins if len(b)), default=0)
+    covered = np.zeros(size, dtype=bool)
+    has_motion = np.zeros(size, dtype=bool)
+    motion_area = np.zeros(size, dtype=np.float32)
+    for index, index_bins in zip(indices, bins):
+        covered[index_bins] = True
+        has_motion[index_bins[index.has_motion]] = True
+        np.add.at(motion_area, index_bins, index.motion_area)
+    
+    keep = np.flatnonzero(covered)
+    fused = MotionIndex(video_fps, max(index.total_frames for index in indices))
+    fused.timestamps = keep * step
+    fused.frame_indices = np.rint(fused.timestamps * video_fps).astype(np.int64)
+    fused.has_motion = has_motion[keep]
+    fused.motion_area = motion_area[keep]
+    fused.box_offsets = np.zeros(len(keep) + 1, dtype=np.int64)
+    return fused
+
+
+def peak_time(index: MotionIndex, start_time: float, end_time: float) -> float:
+    """
+    返回时间范围内运动面积最大的采样时间
+    
+    Args:
+        index: 运动索引
+        start_time: 开始时间（秒）
+        end_time: 结束时间（秒）
+    
+    Returns:
+        采样时间（秒），范围内没有采样时返回 start_time
+    """
+    in_range = np.flatnonzero((index.timestamps >= start_time) & (index.timestamps <= end_time))
+    if len(in_range) == 0:
+        return start_time
+    return float(index.timestamps[in_range[np.argmax(index.motion_area[in_range])]])
+
+
+def nearest_sample(index: MotionIndex, timestamp: float) -> Optional[int]:
+    """
+    返回时间上最接近 timestamp 的采样帧序号
+    
+    Args:
+        index: 运动索引
+        timestamp: 时间（秒）
+    
+    Returns:
+        采样帧序号，索引为空时返回 None
+    """
+    if len(index) == 0:
+        return None
+    return int(np.argmin(np.abs(index.timestamps - timestamp)))
@@ -17,6 +17,42 @@ MOTION_DETECTION = {
     
     # 处理帧率（每秒处理的帧数）
     'process_fps': 2,
+    
+    # 自适应采样：检测到运动后提高到的处理帧率，空闲时按 process_fps 采样，0 表示关闭，对应 --adaptive-fps
+    'adaptive_fps': 0,
+    
+    # 检测分辨率缩放比例 (0-1]，0.5 表示在 1/2 分辨率上检测，可大幅降低CPU占用
+    'detection_scale': 1.0,
+    
+    # 缩略图预筛选：先比较 1/8 缩略图的帧差，静止帧跳过完整的轮廓检测，对应 --no-prefilter
+    'prefilter': True,
+    
+    # 检测后端：diff（帧差）、average（滑动平均背景）、mog2、knn，对应 --detect-backend
+    # 可用 python benchmark_backends.py <视频> 比较各后端在自己录像上的速度和检测结果
+    'detection_backend': 'diff',
+    
+    # 运动中断不超过该时长（秒）时视为同一事件，对应命令行参数 --gap-tolerance
+    'gap_tolerance': 0.0,
+    
+    # 触发事件所需的最小运动面积（像素），较小的运动只维持已开始的事件，对应 --trigger-area
+    'trigger_area': 0,
+}
+
+# 按摄像头配置的检测区域（ROI）和忽略区域，坐标按画面宽高归一化到 [0, 1]
+# 保存为 JSON 文件后通过 --mask-config 指定；未单独配置的摄像头使用 default
+DETECTION_MASKS = {
+    'default': {
+        # 忽略画面顶部的时间戳水印
+        'ignore': [[[0.0, 0.0], [1.0, 0.0], [1.0, 0.06], [0.0, 0.06]]],
+    },
+    'front': {
+        # 只检测天空以下、引擎盖以上的区域
+        'roi': [[[0.0, 0.25], [1.0, 0.25], [1.0, 0.85], [0.0, 0.85]]],
+    },
+    'back': {
+        # 忽略画面底部的车尾和牌照框
+        'ignore': [[[0.0, 0.82], [1.0, 0.82], [1.0, 1.0], [0.0, 1.0]]],
+    },
 }
 
 # 输出配置
@@ -24,11 +60,14 @@ OUTPUT = {
     # 默认输出目录
     'default_dir': './extracted_frames',
     
-    # 图像格式 ('jpg' 或 'png')
+    # 图像格式 ('jpg'、'png' 或 'webp')
     'format': 'jpg',
     
-    # JPEG质量 (0-100)
+    # JPEG/WebP质量 (0-100)，对应命令行参数 --quality
     'jpeg_quality': 95,
+    
+    # 后台编码截图的线程数，对应命令行参数 --writer-threads
+    'writer_threads': 2,
 }
 
 # 视频文件配置
@@ -0,0 +1,154 @@
+"""
+运动检测后端
+MotionDetector 把模糊后的灰度帧交给后端生成前景掩码，之后的形态学和轮廓查找与后端无关。
+各后端在第一次检测时才创建，reset() 只丢弃后端对象，不分配新的模型。
+apply() 的 dst 为检测器复用的输出缓冲区（可能为 None），前景掩码应写入其中并返回。
+"""
+
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+class FrameDifferenceBackend:
+    """帧差法：与上一个采样帧比较（默认后端，开销最小）"""
+    
+    name = 'diff'
+    
+    def __init__(self, threshold: float, blur_ksize: tuple):
+        """
+        Args:
+            threshold: 二值化阈值 (0-255)
+            blur_ksize: 高斯模糊核大小，用于补算被预筛选跳过的上一帧
+        """
+        self.threshold = threshold
+        self.blur_ksize = blur_ksize
+        self.prev_gray = None
+        self.prev_blurred = None
+    
+    def skip(self, gray: np.ndarray):
+        """
+        记录被预筛选排除的帧，模糊结果在下一个候选帧需要时再计算
+        
+        Args:
+            gray: 检测分辨率的灰度帧
+        """
+        self.prev_gray, self.prev_blurred = gray, None
+    
+    def apply(self,
+              gray: np.ndarray,
+              blurred: np.ndarray,
+              dst: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        生成前景掩码
+        
+        Args:
+            gray: 检测分辨率的灰度帧
+            blurred: 模糊后的灰度帧
+            dst: 输出缓冲区，None 时新分配
+        
+        Returns:
+            二值前景掩码，第一帧（尚无参考帧）时返回 None
+        """
+        if self.prev_gray is None:
+            self.prev_gray, self.prev_blurred = gray, blurred
+            return None
+        
+        if self.prev_blurred is None:
+            self.prev_blurred = cv2.GaussianBlur(self.prev_gray, self.blur_ksize, 0)
+        
+        # 帧差和二值化共用同一块输出
+        mask = cv2.absdiff(self.prev_blurred, blurred, dst=dst)
+        cv2.threshold(mask, self.threshold, 255, cv2.THRESH_BINARY, dst=mask)
+        self.prev_gray, self.prev_blurred = gray, blurred
+        return mask
+
+
+class RunningAverageBackend:
+    """滑动平均背景：与 accumulateWeighted 累积的背景比较，对缓慢的光照变化不敏感"""
+    
+    name = 'average'
+    
+    # 每个候选帧并入背景的权重
+    ALPHA = 0.05
+    
+    def __init__(self, threshold: float, blur_ksize: tuple):
+        self.threshold = threshold
+        self.background = None
+        self.background_u8 = None
+    
+    def skip(self, gray: np.ndarray):
+        """静止帧不更新背景"""
+    
+    def apply(self,
+              gray: np.ndarray,
+              blurred: np.ndarray,
+              dst: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        if self.background is None:
+            self.background = blurred.astype(np.float32)
+            return None
+        
+        self.background_u8 = cv2.convertScaleAbs(self.background, dst=self.background_u8)
+        mask = cv2.absdiff(blurred, self.background_u8, dst=dst)
+        cv2.threshold(mask, self.threshold, 255, cv2.THRESH_BINARY, dst=mask)
+        cv2.accumulateWeighted(blurred, self.background, self.ALPHA)
+        return mask
+
+
+class _SubtractorBackend(ABC):
+    """OpenCV 背景减除器的公共部分，子类通过 _create() 提供具体的减除器"""
+    
+    name = None
+    # 第一帧重复输入的次数，模型在此之前把整帧判为前景
+    SEED_FRAMES = 1
+    
+    def __init__(self, threshold: float, blur_ksize: tuple):
+        self.subtractor = self._create()
+        self.initialized = False
+    
+    @abstractmethod
+    def _create(self) -> cv2.BackgroundSubtractor:
+        """创建背景减除器"""
+    
+    def skip(self, gray: np.ndarray):
+        """静止帧不更新模型"""
+    
+    def apply(self,
+              gray: np.ndarray,
+              blurred: np.ndarray,
+              dst: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        # 用第一帧初始化模型，与其他后端一样从第二帧开始输出前景
+        if not self.initialized:
+            for _ in range(self.SEED_FRAMES):
+                self.subtractor.apply(blurred)
+            self.initialized = True
+            return None
+        return self.subtractor.apply(blurred, dst)
+
+
+class MOG2Backend(_SubtractorBackend):
+    """高斯混合背景模型，适合有周期性背景变化（树叶、水面）的场景"""
+    
+    name = 'mog2'
+    
+    def _create(self):
+        return cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=False)
+
+
+class KNNBackend(_SubtractorBackend):
+    """K 近邻背景模型，前景较多时比 MOG2 更稳定"""
+    
+    name = 'knn'
+    SEED_FRAMES = 4
+    
+    def _create(self):
+        return cv2.createBackgroundSubtractorKNN(history=500, dist2Threshold=400.0, detectShadows=False)
+
+
+# 后端名称 -> 后端类
+DETECTION_BACKENDS = {
+    backend.name: backend
+    for backend in (FrameDifferenceBackend, RunningAverageBackend, MOG2Backend, KNNBackend)
+}
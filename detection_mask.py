@@ -0,0 +1,122 @@
+"""
+检测区域掩码
+按摄像头配置检测区域（ROI）和忽略区域多边形，排除车身、时间戳水印、摇动的树木等区域。
+多边形坐标按画面宽高归一化到 [0, 1]，同一配置适用于不同分辨率的录像。
+"""
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from camera_groups import parse_tesla_filename
+
+
+# 未单独配置的摄像头使用的配置名
+DEFAULT_MASK = 'default'
+
+
+@dataclass
+class DetectionMask:
+    """单个摄像头的检测区域
+    
+    roi 为空表示整个画面都是检测区域；ignore 中的区域总是被排除。
+    每个多边形是 [[x, y], ...] 形式的归一化顶点列表。
+    """
+    roi: List[List[List[float]]] = field(default_factory=list)     # 检测区域多边形
+    ignore: List[List[List[float]]] = field(default_factory=list)  # 忽略区域多边形
+    
+    @classmethod
+    def from_config(cls, config: dict) -> 'DetectionMask':
+        """
+        从配置字典创建掩码
+        
+        Args:
+            config: {"roi": [多边形, ...], "ignore": [多边形, ...]}，两项都可省略
+        
+        Returns:
+            检测区域掩码
+        """
+        if not isinstance(config, dict):
+            raise ValueError(f"掩码配置必须是包含 roi/ignore 的对象: {config!r}")
+        unknown = set(config) - {'roi', 'ignore'}
+        if unknown:
+            raise ValueError(f"未知的掩码配置项: {', '.join(sorted(unknown))}")
+        try:
+            mask = cls([[list(map(float, p)) for p in polygon] for polygon in config.get('roi', [])],
+                       [[list(map(float, p)) for p in polygon] for polygon in config.get('ignore', [])])
+        except (TypeError, ValueError):
+            raise ValueError(f"多边形格式应为 [[x, y], ...]: {config!r}")
+        for polygon in mask.roi + mask.ignore:
+            if len(polygon) < 3 or any(len(p) != 2 or not 0 <= p[0] <= 1 or not 0 <= p[1] <= 1 for p in polygon):
+                raise ValueError(f"多边形至少需要 3 个顶点，坐标须归一化到 [0, 1]: {polygon}")
+        return mask
+    
+    def to_config(self) -> dict:
+        """返回可序列化的配置字典（用作运动索引缓存键的一部分）"""
+        return {'roi': self.roi, 'ignore': self.ignore}
+    
+    def rasterize(self, width: int, height: int) -> np.ndarray:
+        """
+        生成指定分辨率的掩码图像
+        
+        Args:
+            width: 画面宽度
+            height: 画面高度
+        
+        Returns:
+            uint8 掩码，检测区域为 255，其余为 0
+        """
+        def to_pixels(polygons):
+            return [np.round(np.asarray(p) * [width - 1, height - 1]).astype(np.int32) for p in polygons]
+        
+        if self.roi:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(mask, to_pixels(self.roi), 255)
+        else:
+            mask = np.full((height, width), 255, dtype=np.uint8)
+        if self.ignore:
+            cv2.fillPoly(mask, to_pixels(self.ignore), 0)
+        return mask
+
+
+def load_mask_config(path: str) -> Dict[str, DetectionMask]:
+    """
+    读取按摄像头配置的掩码文件
+    
+    文件为 JSON 对象，键为摄像头名称（front、back、left_repeater 等）或 "default"，
+    值为 {"roi": [...], "ignore": [...]}。
+    
+    Args:
+        path: 配置文件路径
+    
+    Returns:
+        摄像头名称 -> 检测区域掩码
+    """
+    try:
+        config = json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"无法读取掩码配置 {path}: {e}")
+    if not isinstance(config, dict):
+        raise ValueError(f"掩码配置必须是 JSON 对象: {path}")
+    return {camera: DetectionMask.from_config(value) for camera, value in config.items()}
+
+
+def select_mask(masks: Dict[str, DetectionMask], video_path) -> Optional[DetectionMask]:
+    """
+    按视频文件名中的摄像头名称选择掩码
+    
+    Args:
+        masks: 摄像头名称 -> 检测区域掩码
+        video_path: 视频文件路径
+    
+    Returns:
+        对应摄像头的掩码，没有单独配置时返回 default，都没有时返回 None
+    """
+    parsed = parse_tesla_filename(video_path)
+    if parsed is not None and parsed[1] in masks:
+        return masks[parsed[1]]
+    return masks.get(DEFAULT_MASK)
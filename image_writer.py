@@ -0,0 +1,102 @@
+"""
+异步截图写入器
+在后台线程池中编码并写入截图，与解码和运动检测并行
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from stage_profiler import StageProfiler
+from video_processor import VideoProcessor
+
+
+class AsyncImageWriter:
+    """后台线程池截图写入器
+    
+    OpenCV 在 JPEG/PNG/WebP 编码期间释放 GIL，因此编码可以与主线程的解码和检测真正并行。
+    待写入的截图数量受 max_pending 限制，写入跟不上时 submit() 会阻塞（背压），
+    避免截图在内存中堆积。
+    编码（image_encode）和写盘（write）分两步进行，分别计时。
+    """
+    
+    def __init__(self, workers: int = 2, max_pending: int = 8, quality: int = 95,
+                 profiler: Optional[StageProfiler] = None):
+        """
+        初始化写入器
+        
+        Args:
+            workers: 编码线程数
+            max_pending: 最多同时等待写入的截图数
+            quality: JPEG/WebP 质量 (0-100)
+            profiler: 分阶段计时器，None 表示不计时
+        """
+        self.quality = quality
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                           thread_name_prefix='image-writer')
+        self.slots = threading.BoundedSemaphore(max(1, max_pending))
+        self.lock = threading.Lock()
+        self.written = 0
+        self.failures = []  # (output_path, 错误信息)
+    
+    def submit(self, frame: np.ndarray, output_path: str):
+        """
+        提交一张截图，队列已满时阻塞直到有截图写完
+        
+        提交后调用方不应再修改 frame。
+        
+        Args:
+            frame: 要保存的帧
+            output_path: 输出文件路径
+        """
+        self.slots.acquire()
+        try:
+            self.executor.submit(self._write, frame, output_path)
+        except Exception:
+            self.slots.release()
+            raise
+    
+    def _write(self, frame: np.ndarray, output_path: str):
+        """在工作线程中编码并写入单张截图"""
+        try:
+            started = self.profiler.start()
+            params = VideoProcessor.image_params(output_path, self.quality)
+            ok, data = cv2.imencode(os.path.splitext(output_path)[1], frame, params)
+            started = self.profiler.lap('image_encode', started)
+            if ok:
+                with open(output_path, 'wb') as f:
+                    f.write(data)
+                self.profiler.lap('write', started, nbytes=len(data))
+            error = None if ok else '编码失败'
+        except Exception as e:
+            ok, error = False, str(e)
+        finally:
+            self.slots.release()
+        
+        with self.lock:
+            if ok:
+                self.written += 1
+            else:
+                self.failures.append((output_path, error))
+    
+    def close(self) -> Tuple[int, List[Tuple[str, str]]]:
+        """
+        等待所有截图写完并关闭线程池
+        
+        Returns:
+            (written, failures): 成功写入的数量和失败列表
+        """
+        self.executor.shutdown(wait=True)
+        return self.written, list(self.failures)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
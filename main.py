@@ -3,17 +3,35 @@
 处理命令行参数，批量处理视频文件
 """
 
+import io
 import os
 import sys
 import time
 import argparse
+import contextlib
+import cProfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 import cv2
 from tqdm import tqdm
 
+from detection_backends import DETECTION_BACKENDS
+from detection_mask import load_mask_config, select_mask
 from video_processor import VideoProcessor
-from video_clip_extractor import VideoClipExtractor
+from video_clip_extractor import VideoClipExtractor, run_with_slots
+from motion_index import MotionIndexCache
+from batch_manifest import BatchManifest
+from image_writer import AsyncImageWriter
+from batch_metrics import BatchMetrics
+from batch_progress import BatchProgress
+from camera_groups import CameraGroup, group_camera_files, fuse_motion_indices, peak_time, nearest_sample
+from segment_timeline import SegmentTimeline, find_continuous_runs
+from stage_profiler import StageProfiler
 
 
 class BatchProcessor:
@@ -29,7 +47,32 @@ class BatchProcessor:
                  extract_clips: bool = False,
                  min_motion_duration: float = 3.0,
                  clip_before: float = 20.0,
-                 clip_after: float = 20.0):
+                 clip_after: float = 20.0,
+                 seek_keyframes: bool = False,
+                 workers: int = 1,
+                 show_progress: bool = True,
+                 detection_scale: float = 1.0,
+                 fast_clips: bool = False,
+                 index_cache_dir: Optional[str] = None,
+                 incremental: bool = False,
+                 jpeg_quality: int = 95,
+                 writer_threads: int = 2,
+                 threaded_decode: bool = False,
+                 camera_groups: bool = False,
+                 continuous: bool = False,
+                 gap_tolerance: float = 0.0,
+                 trigger_area: float = 0.0,
+                 max_clip_length: float = 0.0,
+                 prefilter: bool = True,
+                 adaptive_fps: int = 0,
+                 detection_backend: str = 'diff',
+                 mask_config: Optional[str] = None,
+                 clip_workers: int = 1,
+                 max_jobs: int = 0,
+                 clip_slots=None,
+                 profile: bool = False,
+                 metrics_jsonl: Optional[str] = None,
+                 metrics_prom: Optional[str] = None):
         """
         初始化批量处理器
         
@@ -44,6 +87,32 @@ class BatchProcessor:
             min_motion_duration: 最小连续运动时长（秒）
             clip_before: 片段前提取时长（秒）
             clip_after: 片段后提取时长（秒）
+            seek_keyframes: 是否按关键帧跳转采样（适合极低的处理帧率）
+            workers: 并行处理的进程数（每个视频、摄像头组或连续时间线为一个任务），1 表示在当前进程中顺序处理
+            show_progress: 是否显示单个视频的逐帧进度条
+            detection_scale: 运动检测分辨率缩放比例 (0-1]
+            fast_clips: 是否以码流复制方式快速提取片段（不绘制标注，需要 ffmpeg）
+            index_cache_dir: 运动索引缓存目录，None 表示不使用缓存
+            incremental: 增量模式，跳过已在相同设置下处理完成且未修改的视频
+            jpeg_quality: JPEG/WebP 截图质量 (0-100)
+            writer_threads: 后台编码截图的线程数
+            threaded_decode: 是否使用独立的解码线程，使解码与运动检测并行
+            camera_groups: 特斯拉多摄像头分组模式，同一分钟的各角度录像并行检测、融合为同一组事件
+            continuous: 连续时间线模式，连续的特斯拉 1 分钟分段拼接为一条时间线，事件和片段可跨越文件
+            gap_tolerance: 运动中断不超过该时长（秒）时视为同一事件
+            trigger_area: 触发事件所需的最小运动面积（0 表示不限制）
+            max_clip_length: 重叠片段合并后的最大时长（秒），0 表示不限制
+            prefilter: 是否启用缩略图预筛选，静止帧跳过完整的轮廓检测
+            adaptive_fps: 自适应采样时有运动期间的处理帧率，空闲时按 fps 采样；0 表示固定按 fps 采样
+            detection_backend: 运动检测后端 (diff/average/mog2/knn)
+            mask_config: 按摄像头配置检测区域/忽略区域的 JSON 文件，None 表示检测整个画面
+            clip_workers: 每个视频同时提取的片段数
+            max_jobs: 整个批次同时进行的解码/编码任务上限（视频工作进程 + 额外的片段提取线程和摄像头组的角度线程），
+                      0 表示 CPU 核心数
+            clip_slots: 工作进程中由进程池传入的共享片段提取额度，None 时按 max_jobs 在本进程内创建
+            profile: 是否统计各处理阶段的耗时，每个视频和整个批次结束时打印分阶段耗时表
+            metrics_jsonl: 每个视频（摄像头组、时间线）处理完后追加一条 JSON 指标记录的文件，None 表示不记录
+            metrics_prom: 批次结束时写出 Prometheus textfile collector 汇总指标的 .prom 文件，None 表示不写
         """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -56,19 +125,222 @@ class BatchProcessor:
         self.min_motion_duration = min_motion_duration
         self.clip_before = clip_before
         self.clip_after = clip_after
-        self.processor = VideoProcessor(sensitivity, min_interval, fps)
+        self.seek_keyframes = seek_keyframes
+        self.workers = max(1, workers)
+        self.show_progress = show_progress
+        self.detection_scale = detection_scale
+        self.fast_clips = fast_clips
+        self.index_cache_dir = index_cache_dir
+        self.index_cache = MotionIndexCache(index_cache_dir) if index_cache_dir else None
+        self.threaded_decode = threaded_decode
+        self.gap_tolerance = gap_tolerance
+        self.trigger_area = trigger_area
+        self.max_clip_length = max_clip_length
+        self.prefilter = prefilter
+        self.adaptive_fps = adaptive_fps
+        self.detection_backend = detection_backend
+        self.mask_config = mask_config
+        self.clip_workers = max(1, clip_workers)
+        self.max_jobs = max_jobs or os.cpu_count() or 1
+        # 当前进程本身占用一个任务，额外的片段提取线程和角度线程需要占用共享额度
+        self.clip_slots = clip_slots if clip_slots is not None else threading.BoundedSemaphore(
+            max(0, self.max_jobs - 1))
+        self.detection_masks = load_mask_config(mask_config) if mask_config else {}
+        # 处理器、提取器和截图写入器共用一个计时器，每个视频结束时并入整个批次的统计后清空；
+        # 导出指标时也需要其中的解码帧数和写入字节数
+        self.profile = profile
+        self.metrics_jsonl = metrics_jsonl
+        self.metrics_prom = metrics_prom
+        self.profiler = StageProfiler(enabled=profile or bool(metrics_jsonl or metrics_prom))
+        self.batch_profiler = StageProfiler(enabled=profile)
+        self.metrics = None  # process_all 期间的 BatchMetrics
+        self.progress = None  # process_all 期间的 BatchProgress
+        self.last_unit = None  # 最近一个处理单元的耗时和分阶段统计
+        self.processor = VideoProcessor(sensitivity, min_interval, fps,
+                                        seek_keyframes=seek_keyframes,
+                                        detection_scale=detection_scale,
+                                        index_cache=self.index_cache,
+                                        threaded_decode=threaded_decode,
+                                        prefilter=prefilter,
+                                        adaptive_fps=adaptive_fps,
+                                        detection_backend=detection_backend,
+                                        profiler=self.profiler)
         
         # 如果启用视频片段提取，初始化提取器
         if self.extract_clips:
-            self.clip_extractor = VideoClipExtractor(
-                sensitivity=sensitivity,
-                min_motion_duration=min_motion_duration,
-                clip_before=clip_before,
-                clip_after=clip_after
-            )
+            self.clip_extractor = self._new_clip_extractor()
+        
+        self.camera_groups = camera_groups
+        self.continuous = continuous
+        self.incremental = incremental
+        self.jpeg_quality = jpeg_quality
+        self.writer_threads = writer_threads
+        # 处理清单始终记录，增量模式下据此跳过已完成的视频
+        self.manifest = BatchManifest(self.output_dir / '.manifest.json')
         
         self.total_videos = 0
         self.total_frames_extracted = 0
+        self.skipped_videos = 0
+        self.results = []  # 每个视频的处理结果
+    
+    def worker_settings(self) -> dict:
+        """
+        返回在工作进程中重建处理器所需的参数
+        
+        Returns:
+            BatchProcessor 构造参数字典（可被 pickle）
+        """
+        return {
+            'output_dir': str(self.output_dir),
+            'sensitivity': self.sensitivity,
+            'min_interval': self.min_interval,
+            'fps': self.fps,
+            'image_format': self.image_format,
+            'preview': False,
+            'extract_clips': self.extract_clips,
+            'min_motion_duration': self.min_motion_duration,
+            'clip_before': self.clip_before,
+            'clip_after': self.clip_after,
+            'seek_keyframes': self.seek_keyframes,
+            'workers': 1,
+            'show_progress': False,
+            'detection_scale': self.detection_scale,
+            'fast_clips': self.fast_clips,
+            'index_cache_dir': self.index_cache_dir,
+            'jpeg_quality': self.jpeg_quality,
+            'writer_threads': self.writer_threads,
+            'threaded_decode': self.threaded_decode,
+            'camera_groups': self.camera_groups,
+            'continuous': self.continuous,
+            'gap_tolerance': self.gap_tolerance,
+            'trigger_area': self.trigger_area,
+            'max_clip_length': self.max_clip_length,
+            'prefilter': self.prefilter,
+            'adaptive_fps': self.adaptive_fps,
+            'detection_backend': self.detection_backend,
+            'mask_config': self.mask_config,
+            'clip_workers': self.clip_workers,
+            'max_jobs': self.max_jobs,
+            'profile': self.profile,
+            'metrics_jsonl': self.metrics_jsonl,
+            'metrics_prom': self.metrics_prom,
+        }
+    
+    def output_settings(self) -> dict:
+        """
+        返回影响输出结果的设置，用于判断已处理的视频是否需要重新处理
+        
+        Returns:
+            设置字典（不含并行度、进度显示、缓存位置等不影响输出的选项）
+        """
+        settings = self.worker_settings()
+        for key in ('output_dir', 'preview', 'workers', 'show_progress', 'index_cache_dir',
+                    'writer_threads', 'threaded_decode', 'mask_config', 'clip_workers', 'max_jobs',
+                    'profile', 'metrics_jsonl', 'metrics_prom'):
+            settings.pop(key, None)
+        # 掩码按内容而不是文件路径比较
+        settings['detection_masks'] = {camera: mask.to_config() for camera, mask in self.detection_masks.items()}
+        return settings
+    
+    def _new_clip_extractor(self, video_path: Optional[Path] = None) -> VideoClipExtractor:
+        """
+        按当前设置创建片段提取器（每个提取器持有独立的运动检测器状态）
+        
+        Args:
+            video_path: 要处理的视频，用于选择对应摄像头的检测区域掩码
+        """
+        return VideoClipExtractor(
+            sensitivity=self.sensitivity,
+            min_motion_duration=self.min_motion_duration,
+            clip_before=self.clip_before,
+            clip_after=self.clip_after,
+            seek_keyframes=self.seek_keyframes,
+            detection_scale=self.detection_scale,
+            fast_clips=self.fast_clips,
+            index_cache=self.index_cache,
+            threaded_decode=self.threaded_decode,
+            gap_tolerance=self.gap_tolerance,
+            trigger_area=self.trigger_area,
+            max_clip_length=self.max_clip_length,
+            prefilter=self.prefilter,
+            adaptive_fps=self.adaptive_fps,
+            detection_backend=self.detection_backend,
+            detection_mask=select_mask(self.detection_masks, video_path) if video_path else None,
+            clip_workers=self.clip_workers,
+            clip_slots=self.clip_slots,
+            profiler=self.profiler
+        )
+    
+    def _use_detection_mask(self, video_path: Path):
+        """为共享的处理器和提取器设置该视频所属摄像头的检测区域掩码"""
+        mask = select_mask(self.detection_masks, video_path)
+        self.processor.motion_detector.set_mask(mask)
+        if self.extract_clips:
+            self.clip_extractor.motion_detector.set_mask(mask)
+    
+    def _new_image_writer(self) -> AsyncImageWriter:
+        """按当前设置创建截图写入器"""
+        return AsyncImageWriter(workers=self.writer_threads, quality=self.jpeg_quality, profiler=self.profiler)
+    
+    def _start_unit(self) -> tuple:
+        """开始处理一个视频（或摄像头组、时间线），返回传给 _finish_unit 的起点"""
+        return time.perf_counter(), time.process_time(), len(self.results)
+    
+    def _finish_unit(self, name: str, unit: str, started: tuple, events: Optional[int] = None,
+                     duration: float = 0.0, frames: int = 0):
+        """
+        结束一个处理单元：记录耗时和分阶段统计，打印耗时表、写入指标后清空计时器
+        
+        Args:
+            name: 单元名称（用于报告标题和指标记录）
+            unit: 单元类型 (video/camera_group/timeline)
+            started: _start_unit 的返回值
+            events: 运动事件数，未做事件分段时为 None
+            duration: 单元中视频的总时长（秒），无法打开的视频不计入
+            frames: 运动检测时顺序读取的帧数，命中运动索引缓存的视频不计入
+        """
+        if not self.profiler.enabled:
+            return
+        wall_started, cpu_started, first_result = started
+        self.last_unit = {
+            'name': name,
+            'unit': unit,
+            'wall': time.perf_counter() - wall_started,
+            'cpu': time.process_time() - cpu_started,
+            'stages': self.profiler.to_dict(),
+            'events': events,
+            'duration': duration,
+            'decoded': frames,
+        }
+        self.profiler.reset()
+        self._report_unit(self.last_unit, self.results[first_result:])
+    
+    @staticmethod
+    def _decoded_frames(indices) -> int:
+        """运动检测时顺序读取的帧数（取自各运动索引的总帧数，从缓存加载的索引没有读取视频）"""
+        return sum(index.total_frames for index in indices if not index.from_cache)
+    
+    def _report_unit(self, unit: dict, results: List[dict]):
+        """
+        打印处理单元的分阶段耗时并写入指标（工作进程的单元由主进程调用）
+        
+        Args:
+            unit: _finish_unit 记录的单元统计
+            results: 该单元中每个视频的处理结果
+        """
+        if self.profile:
+            unit_profiler = StageProfiler()
+            unit_profiler.merge(unit['stages'])
+            tqdm.write(unit_profiler.format_report(f"阶段耗时: {unit['name']}", unit['wall']))
+            self.batch_profiler.merge(unit_profiler)
+        if self.metrics:
+            self.metrics.record(unit['name'], unit['unit'], results, unit['wall'], unit['cpu'],
+                                unit['stages'], unit['events'], unit['duration'], unit['decoded'])
+    
+    def _record_result(self, result: dict):
+        """处理成功的视频写入清单，供增量模式和中断续跑使用"""
+        if not result['error']:
+            self.manifest.mark_done(result['video'], self.output_settings(), result)
     
     def find_video_files(self, input_path: str) -> List[Path]:
         """
@@ -76,7 +348,7 @@ class BatchProcessor:
         
         Args:
             input_path: 输入路径（文件或目录）
-            
+        
         Returns:
             视频文件路径列表
         """
@@ -105,45 +377,19 @@ class BatchProcessor:
         
         Args:
             video_path: 视频文件路径
-            
+        
         Returns:
             提取的帧数
         """
         print(f"\n正在处理: {video_path.name}")
+        started = self._start_unit()
         
-        # 创建进度条
-        pbar = None
-        last_frame_count = 0
-        start_time = None
+        # 批量处理时使用整个批次的进度显示，单独调用时只显示这个视频的进度
+        progress = self.progress or BatchProgress(1, enabled=self.show_progress)
+        progress.start_video(video_path.name)
         
         def progress_callback(frame, timestamp, has_motion, current_frame, total_frames):
-            nonlocal pbar, last_frame_count, start_time
-            if pbar is None:
-                pbar = tqdm(total=total_frames, unit='帧', desc="处理进度")
-                start_time = time.time()
-            
-            # 更新进度：计算自上次回调以来处理的帧数
-            frames_processed = current_frame - last_frame_count
-            if frames_processed > 0:
-                pbar.update(frames_processed)
-                last_frame_count = current_frame
-            
-            # 计算处理速度和预计剩余时间
-            elapsed = time.time() - start_time
-            if elapsed > 0 and current_frame > 0:
-                fps = current_frame / elapsed
-                remaining_frames = total_frames - current_frame
-                eta = remaining_frames / fps if fps > 0 else 0
-                
-                # 格式化时间戳
-                timestamp_str = f"{int(timestamp//60):02d}:{int(timestamp%60):02d}"
-                
-                # 更新进度条显示信息
-                pbar.set_postfix({
-                    '速度': f'{fps:.1f}帧/s',
-                    '剩余': f'{int(eta)}s',
-                    '时间': timestamp_str
-                })
+            progress.update(current_frame, total_frames, timestamp)
             
             # 如果启用预览
             if self.preview and has_motion:
@@ -154,82 +400,486 @@ class BatchProcessor:
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     return False
         
+        writer = None
         try:
+            self._use_detection_mask(video_path)
+            
             # 为每个视频创建独立的输出文件夹
             video_name = video_path.stem
             video_output_dir = self.output_dir / video_name
             video_output_dir.mkdir(parents=True, exist_ok=True)
             
-            # 1. 提取截图（始终执行）
-            extracted_frames = self.processor.process_video(
-                str(video_path),
-                callback=progress_callback,
-                output_video_path=None  # 不再使用旧的视频输出功能
-            )
+            # 截图一经产生立即交给后台线程编码写入，不在内存中累积
+            writer = self._new_image_writer()
             
-            # 确保进度条达到100%
-            if pbar:
-                cap = cv2.VideoCapture(str(video_path))
-                total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                cap.release()
+            def save_screenshot(frame, timestamp):
+                timestamp_str = VideoProcessor.format_timestamp(timestamp)
+                output_filename = f"{video_name}_{timestamp_str}.{self.image_format}"
+                writer.submit(frame, str(video_output_dir / output_filename))
+            
+            clips = []
+            cached = self.clip_extractor.load_cached_index(str(video_path), self.fps) if self.extract_clips else None
+            
+            if cached is not None:
+                # 命中运动索引缓存：截图和事件都从索引推导，只解码需要输出的帧
+                for frame, timestamp in self.processor.iter_motion_frames(str(video_path)):
+                    save_screenshot(frame, timestamp)
+                clips = self.clip_extractor.process_video(
+                    str(video_path),
+                    str(video_output_dir / "clips"),
+                    fps=self.fps,
+                    index=cached
+                )
+            elif self.extract_clips:
+                # 单遍处理：截图、运动事件检测和片段提取共享同一次解码
+                self.processor.reset()
                 
-                remaining = total_frames - last_frame_count
-                if remaining > 0:
-                    pbar.update(remaining)
+                def sample_callback(frame, timestamp, has_motion, regions, current_frame, total_frames):
+                    screenshot = self.processor.select_screenshot(frame, has_motion, regions, timestamp)
+                    if screenshot is not None:
+                        save_screenshot(screenshot, timestamp)
+                    progress_callback(frame, timestamp, has_motion, current_frame, total_frames)
                 
-                pbar.close()
+                clips_output_dir = video_output_dir / "clips"
+                clips = self.clip_extractor.process_video(
+                    str(video_path),
+                    str(clips_output_dir),
+                    fps=self.fps,
+                    frame_callback=sample_callback
+                )
+            else:
+                # 只提取截图；不显示进度也不预览时不设置逐帧回调
+                callback = progress_callback if progress.enabled or self.preview else None
+                for frame, timestamp in self.processor.iter_motion_frames(str(video_path), callback=callback):
+                    save_screenshot(frame, timestamp)
             
-            # 保存提取的帧到视频专属文件夹
-            saved_count = 0
+            # 等待所有截图写完
+            saved_count, failures = writer.close()
+            for output_path, error in failures:
+                print(f"警告: 无法保存 {output_path} ({error})")
             
-            for frame, timestamp in extracted_frames:
-                timestamp_str = VideoProcessor.format_timestamp(timestamp)
-                output_filename = f"{video_name}_{timestamp_str}.{self.image_format}"
-                output_path = video_output_dir / output_filename
-                
-                if VideoProcessor.save_frame(frame, str(output_path)):
-                    saved_count += 1
-                else:
-                    print(f"警告: 无法保存 {output_path}")
+            # 确保进度条达到100%（总帧数已在回调中获得，无需重新打开视频）
+            progress.end_video()
             
             # 显示截图提取结果
             result_info = f"✓ 截图提取完成: {saved_count} 张"
             print(result_info)
             
-            # 2. 如果启用视频片段提取
+            # 显示视频片段提取结果
             if self.extract_clips:
-                print(f"\n开始提取视频片段...")
-                clips_output_dir = video_output_dir / "clips"
-                clips = self.clip_extractor.process_video(
-                    str(video_path),
-                    str(clips_output_dir),
-                    fps=self.fps
-                )
-                
                 if clips:
                     print(f"✓ 视频片段提取完成: {len(clips)} 个片段")
                     clips_size = sum(os.path.getsize(c) for c in clips) / (1024 * 1024)
                     print(f"  总大小: {clips_size:.2f} MB")
             
             print(f"  输出目录: {video_output_dir}\n")
+            self.results.append({
+                'video': str(video_path),
+                'frames': saved_count,
+                'clips': len(clips),
+                'error': None,
+            })
             return saved_count
-            
+        
         except Exception as e:
-            if pbar:
-                pbar.close()
+            progress.end_video(completed=False)
             print(f"✗ 错误: 处理视频时出错 - {e}")
+            self.results.append({
+                'video': str(video_path),
+                'frames': 0,
+                'clips': 0,
+                'error': str(e),
+            })
             return 0
         finally:
+            if writer:
+                writer.close()
             if self.preview:
                 cv2.destroyAllWindows()
+            if progress is not self.progress:
+                progress.close()
+            events = len(self.clip_extractor.last_events) if self.extract_clips else None
+            # 时长取自处理时已读取的帧率和帧数
+            index = self.clip_extractor.last_index if self.extract_clips else self.processor.last_index
+            indices = [index] if index is not None else []
+            self._finish_unit(video_path.name, 'video', started, events,
+                              sum(i.duration for i in indices), self._decoded_frames(indices))
+    
+    def process_camera_group(self, group: CameraGroup) -> int:
+        """
+        处理同一分钟的多角度录像
+        
+        各角度在独立线程中并行解码和检测（OpenCV 解码和图像运算期间释放 GIL），
+        当前线程之外的角度线程与片段提取线程一样占用共享额度 clip_slots，
+        运动时间线融合后只推导一次事件。每个事件输出所有角度在运动最明显时刻的截图，
+        启用片段提取时同时输出所有角度的片段。每个角度的视频各记录一条处理结果。
+        
+        Args:
+            group: 摄像头组
+        
+        Returns:
+            提取的截图数
+        """
+        print(f"\n正在处理摄像头组: {group.output_name} ({', '.join(group.cameras)})")
+        started = self._start_unit()
+        if self.progress:
+            self.progress.start_video(group.timestamp, len(group.videos))
+        
+        group_output_dir = self.output_dir / group.output_name
+        frames = {camera: 0 for camera in group.cameras}
+        clips = {camera: [] for camera in group.cameras}
+        events = []
+        indices = {}
+        writer = None
+        try:
+            # 每个角度使用独立的提取器，运动检测器状态互不干扰
+            extractors = {camera: self._new_clip_extractor(path) for camera, path in group.cameras.items()}
+            built = run_with_slots([partial(extractors[camera].build_motion_index, str(path), self.fps)
+                                    for camera, path in group.cameras.items()],
+                                   len(group.cameras), self.clip_slots)
+            indices = dict(zip(group.cameras, built))
+            
+            fused = fuse_motion_indices(list(indices.values()))
+            events = next(iter(extractors.values())).events_from_index(fused)
+            
+            group_output_dir.mkdir(parents=True, exist_ok=True)
+            writer = self._new_image_writer()
+            output_cameras = {}
+            for number, event in enumerate(events, 1):
+                moment = peak_time(fused, event.start_time, event.end_time)
+                for camera, video_path in group.cameras.items():
+                    sample = nearest_sample(indices[camera], moment)
+                    if sample is None:
+                        continue
+                    for frame, timestamp in self.processor.iter_index_frames(
+                            str(video_path), indices[camera], [sample]):
+                        timestamp_str = VideoProcessor.format_timestamp(timestamp)
+                        output_path = str(group_output_dir /
+                                          f"{group.timestamp}_event{number:02d}_{camera}_{timestamp_str}.{self.image_format}")
+                        writer.submit(frame, output_path)
+                        output_cameras[output_path] = camera
+                        frames[camera] += 1
+            
+            if self.extract_clips and events:
+                clips_output_dir = group_output_dir / "clips"
+                clips_output_dir.mkdir(parents=True, exist_ok=True)
+                windows = next(iter(extractors.values())).clip_windows(events)
+                extracted = run_with_slots([partial(self._extract_camera_clips, extractors[camera],
+                                                    group, camera, windows, clips_output_dir)
+                                            for camera in group.cameras],
+                                           len(group.cameras), self.clip_slots)
+                clips = dict(zip(group.cameras, extracted))
+            
+            saved_count, failures = writer.close()
+            for output_path, error in failures:
+                print(f"警告: 无法保存 {output_path} ({error})")
+                frames[output_cameras[output_path]] -= 1
+            
+            print(f"✓ 摄像头组处理完成: {len(events)} 个事件, {saved_count} 张截图, "
+                  f"{sum(len(c) for c in clips.values())} 个片段")
+            print(f"  输出目录: {group_output_dir}\n")
+            for camera, video_path in group.cameras.items():
+                self.results.append({
+                    'video': str(video_path),
+                    'frames': frames[camera],
+                    'clips': len(clips[camera]),
+                    'error': None,
+                })
+            return saved_count
+        
+        except Exception as e:
+            print(f"✗ 错误: 处理摄像头组时出错 - {e}")
+            for video_path in group.videos:
+                self.results.append({
+                    'video': str(video_path),
+                    'frames': 0,
+                    'clips': 0,
+                    'error': str(e),
+                })
+            return 0
+        finally:
+            if writer:
+                writer.close()
+            self._finish_unit(str(group.output_name), 'camera_group', started, len(events),
+                              sum(index.duration for index in indices.values()),
+                              self._decoded_frames(indices.values()))
+    
+    def process_timeline(self, video_files: List[Path]) -> int:
+        """
+        把连续的分段作为一条时间线处理
+        
+        运动检测状态跨越文件边界延续，截图以时间线时间命名，片段可以包含多个文件的内容，
+        clip_before/clip_after 不再被限制在单个文件内。每个文件各记录一条处理结果，
+        截图计入所在的文件，片段计入事件开始时所在的文件。
+        
+        Args:
+            video_files: 按时间顺序排列的连续分段
+        
+        Returns:
+            提取的截图数
+        """
+        frames = {str(v): 0 for v in video_files}
+        clips = {str(v): 0 for v in video_files}
+        events = None
+        writer = None
+        duration = 0.0
+        decoded = 0
+        started = self._start_unit()
+        try:
+            timeline = SegmentTimeline(video_files)
+            duration = timeline.duration
+            print(f"\n正在处理连续时间线: {timeline.name} ({len(video_files)} 个文件)")
+            progress = self.progress or BatchProgress(1, enabled=False)
+            progress.start_video(timeline.name, len(video_files))
+            
+            timeline_output_dir = self.output_dir / timeline.name
+            timeline_output_dir.mkdir(parents=True, exist_ok=True)
+            writer = self._new_image_writer()
+            output_videos = {}
+            extractor = self._new_clip_extractor(video_files[0])
+            self.processor.reset()
+            
+            def sample_callback(frame, timestamp, has_motion, regions, current_frame, total_frames):
+                screenshot = self.processor.select_screenshot(frame, has_motion, regions, timestamp)
+                if screenshot is not None:
+                    timestamp_str = VideoProcessor.format_timestamp(timestamp)
+                    output_path = str(timeline_output_dir /
+                                      f"{timeline.name}_{timestamp_str}.{self.image_format}")
+                    writer.submit(screenshot, output_path)
+                    video = str(timeline.segment_at(timestamp).path)
+                    output_videos[output_path] = video
+                    frames[video] += 1
+                progress.update(current_frame, total_frames, timestamp)
+            
+            index = extractor.build_timeline_index(timeline, self.fps, frame_callback=sample_callback)
+            decoded = self._decoded_frames([index])
+            events = extractor.events_from_index(index) if self.extract_clips else None
+            
+            if events:
+                clips_output_dir = timeline_output_dir / "clips"
+                clips_output_dir.mkdir(parents=True, exist_ok=True)
+                windows = extractor.clip_windows(events, timeline.duration)
+                extract = extractor.remux_timeline_clip if extractor.fast_clips else extractor.extract_timeline_clip
+                jobs = [partial(extract, timeline, window, str(clips_output_dir / VideoClipExtractor._clip_filename(
+                            timeline.name, number, window.events[0].start_time)))
+                        for number, window in enumerate(windows, 1)]
+                for window, success in zip(windows, extractor.run_clip_jobs(jobs)):
+                    if success:
+                        clips[str(timeline.segment_at(window.events[0].start_time).path)] += 1
+            
+            saved_count, failures = writer.close()
+            for output_path, error in failures:
+                print(f"警告: 无法保存 {output_path} ({error})")
+                frames[output_videos[output_path]] -= 1
+            
+            print(f"✓ 连续时间线处理完成: {saved_count} 张截图, {sum(clips.values())} 个片段")
+            print(f"  输出目录: {timeline_output_dir}\n")
+            for video in frames:
+                self.results.append({
+                    'video': video,
+                    'frames': frames[video],
+                    'clips': clips[video],
+                    'error': None,
+                })
+            return saved_count
+        
+        except Exception as e:
+            print(f"✗ 错误: 处理连续时间线时出错 - {e}")
+            for video in frames:
+                self.results.append({
+                    'video': video,
+                    'frames': 0,
+                    'clips': 0,
+                    'error': str(e),
+                })
+            return 0
+        finally:
+            if writer:
+                writer.close()
+            self._finish_unit(video_files[0].stem, 'timeline', started,
+                              len(events) if events is not None else None, duration, decoded)
+    
+    @staticmethod
+    def _extract_camera_clips(extractor: VideoClipExtractor,
+                              group: CameraGroup,
+                              camera: str,
+                              windows: list,
+                              output_dir: Path) -> List[str]:
+        """提取单个角度的所有片段（clip_workers > 1 时并行提取）"""
+        video_path = str(group.cameras[camera])
+        extract = extractor.remux_window if extractor.fast_clips else extractor.extract_window
+        paths = [str(output_dir / f"{group.timestamp}_clip{number:02d}_{camera}.mp4")
+                 for number in range(1, len(windows) + 1)]
+        results = extractor.run_clip_jobs([partial(extract, video_path, window, path)
+                                           for window, path in zip(windows, paths)])
+        return [path for path, success in zip(paths, results) if success]
+    
+    def _process_unit(self, unit) -> int:
+        """
+        在当前进程中处理一个处理单元
+        
+        Args:
+            unit: 单个视频 (Path)、摄像头组 (CameraGroup) 或连续时间线的分段列表
+        
+        Returns:
+            提取的截图数
+        """
+        if isinstance(unit, CameraGroup):
+            return self.process_camera_group(unit)
+        if isinstance(unit, list):
+            return self.process_timeline(unit)
+        return self.process_single_video(Path(unit))
+    
+    @staticmethod
+    def _unit_videos(unit) -> List[Path]:
+        """处理单元包含的视频文件"""
+        if isinstance(unit, CameraGroup):
+            return unit.videos
+        if isinstance(unit, list):
+            return unit
+        return [Path(unit)]
+    
+    def _process_parallel(self, units: list, max_attempts: int = 2, worker=None):
+        """
+        使用进程池并行处理多个处理单元
+        
+        每个单元（单个视频、摄像头组或连续时间线）作为一个任务在工作进程中处理，
+        摄像头组和时间线内部需要共享检测状态，不再拆分；主进程只显示合并的批量进度。
+        工作进程崩溃会导致进程池失效，池中所有未完成的单元都会失败：
+        崩溃时仍在等待的单元重新排队，不计入尝试次数；崩溃时正在处理的单元计一次尝试，
+        之后在只有一个工作进程的进程池中逐个重试，与其同时处理的其他单元不会被再次牵连。
+        同一单元最多尝试 max_attempts 次，仍失败则其中的视频记为失败而不中断整个批次。
+        
+        Args:
+            units: 处理单元列表，元素为 Path、CameraGroup 或分段列表（见 _process_unit）
+            max_attempts: 每个单元的最大尝试次数
+            worker: 在工作进程中处理单个单元的函数，默认为 _process_unit_worker
+        """
+        worker = worker or _process_unit_worker
+        settings = self.worker_settings()
+        pending = list(range(len(units)))
+        attempts = [0] * len(units)
+        suspects = []  # 进程池崩溃时正在处理的单元，逐个单独重试
+        context = multiprocessing.get_context('spawn')
+        workers = min(self.workers, len(units))
+        # 各工作进程共享的片段提取额度：每个工作进程本身占用一个任务，其余额度供额外的提取线程使用
+        clip_slots = context.BoundedSemaphore(max(0, self.max_jobs - workers))
+        # 工作进程开始处理某个单元时置 1，进程池崩溃后据此区分正在处理和仍在等待的单元
+        unit_states = context.RawArray('b', len(units))
+        
+        print(f"并行处理: {workers} 个工作进程")
+        progress = self.progress or BatchProgress(sum(len(self._unit_videos(u)) for u in units))
+        
+        try:
+            while pending or suspects:
+                if suspects:
+                    batch, max_workers = [suspects.pop(0)], 1
+                else:
+                    batch, max_workers = pending, min(workers, len(pending))
+                    pending = []
+                for slot in batch:
+                    unit_states[slot] = 0
+                
+                crashed = []
+                executor = ProcessPoolExecutor(max_workers=max_workers,
+                                               mp_context=context,
+                                               initializer=_init_worker,
+                                               initargs=(clip_slots, unit_states))
+                try:
+                    futures = {}
+                    for slot in batch:
+                        try:
+                            futures[executor.submit(worker, settings, units[slot], slot)] = slot
+                        except BrokenProcessPool:
+                            crashed.append(slot)
+                    for future in as_completed(futures):
+                        slot = futures[future]
+                        try:
+                            output = future.result()
+                        except BrokenProcessPool:
+                            crashed.append(slot)
+                            continue
+                        except Exception as e:
+                            output = {'results': self._failed_results(units[slot], str(e))}
+                        self._collect_parallel_output(output, progress)
+                finally:
+                    executor.shutdown(wait=True, cancel_futures=True)
+                
+                if not crashed:
+                    continue
+                # 工作进程在开始处理任何单元之前就崩溃时无法区分，全部计一次尝试
+                running = [slot for slot in crashed if unit_states[slot]] or crashed
+                for slot in running:
+                    attempts[slot] += 1
+                    if attempts[slot] < max_attempts:
+                        suspects.append(slot)
+                    else:
+                        self._collect_parallel_output(
+                            {'results': self._failed_results(units[slot], '工作进程崩溃')}, progress)
+                waiting = [slot for slot in crashed if slot not in running]
+                pending.extend(waiting)
+                tqdm.write(f"⚠ 工作进程崩溃: 单独重试 {len(suspects)} 个崩溃时正在处理的任务，"
+                           f"重新排队 {len(waiting)} 个等待中的任务")
+        finally:
+            if progress is not self.progress:
+                progress.close()
+    
+    def _failed_results(self, unit, error: str) -> List[dict]:
+        """处理单元中每个视频的失败结果"""
+        return [{'video': str(video), 'frames': 0, 'clips': 0, 'error': error}
+                for video in self._unit_videos(unit)]
+    
+    def _collect_parallel_output(self, output: dict, progress: BatchProgress):
+        """
+        记录工作进程返回的一个处理单元的结果并推进批量进度
+        
+        Args:
+            output: 工作进程的返回值（各视频的结果，附带捕获的日志和分阶段统计）
+            progress: 批量进度
+        """
+        results = output['results']
+        for result in results:
+            self.results.append(result)
+            self._record_result(result)
+            self.total_frames_extracted += result['frames']
+            
+            name = Path(result['video']).name
+            if result['error']:
+                tqdm.write(f"✗ {name}: {result['error']}")
+            else:
+                tqdm.write(f"✓ {name}: {result['frames']} 张截图, {result['clips']} 个片段")
+        # 工作进程的输出被捕获，其中的警告和错误（如截图保存失败、片段复制失败）转发到主进程；
+        # 处理失败的原因已在上面的结果中输出
+        for line in output.get('log', '').splitlines():
+            if line.strip().startswith(('警告', '错误')):
+                tqdm.write(f"  {line.strip()}")
+        if output.get('unit'):
+            # 工作进程的输出被捕获，分阶段耗时和指标由主进程输出
+            self._report_unit(output['unit'], results)
+        progress.advance(len(results), self.total_frames_extracted)
     
     def process_all(self, input_path: str):
         """
         批量处理所有视频
         
+        启用指标导出时，每个视频处理完后追加 JSONL 记录，批次正常结束后写出 Prometheus 汇总指标。
+        
         Args:
             input_path: 输入路径
         """
+        if self.metrics_jsonl or self.metrics_prom:
+            self.metrics = BatchMetrics(self.metrics_jsonl, self.metrics_prom)
+        try:
+            self._process_batch(input_path)
+            if self.metrics:
+                self.metrics.write_prometheus(self.skipped_videos)
+        finally:
+            if self.metrics:
+                self.metrics.close()
+                self.metrics = None
+    
+    def _process_batch(self, input_path: str):
+        """查找、分组并处理输入路径下的所有视频，最后打印总结"""
         video_files = self.find_video_files(input_path)
         
         if not video_files:
@@ -245,20 +895,130 @@ class BatchProcessor:
         print("=" * 60)
         
         self.total_videos = len(video_files)
+        started = time.perf_counter()
         
-        for video_file in video_files:
-            frames_extracted = self.process_single_video(video_file)
-            self.total_frames_extracted += frames_extracted
+        groups = []
+        runs = []
+        if self.camera_groups:
+            root = Path(input_path)
+            groups, video_files = group_camera_files(video_files, root if root.is_dir() else root.parent)
+            print(f"摄像头分组: {len(groups)} 组多角度录像, {len(video_files)} 个单独视频")
+        elif self.continuous:
+            runs, video_files = find_continuous_runs(video_files)
+            print(f"连续时间线: {len(runs)} 条, {len(video_files)} 个单独视频")
+        
+        if self.incremental:
+            settings = self.output_settings()
+            pending = [v for v in video_files if not self.manifest.is_done(str(v), settings)]
+            # 摄像头组中任一角度需要处理时整组重新处理，保证事件融合使用全部角度
+            pending_groups = [g for g in groups
+                              if not all(self.manifest.is_done(str(v), settings) for v in g.videos)]
+            pending_runs = [run for run in runs
+                            if not all(self.manifest.is_done(str(v), settings) for v in run)]
+            self.skipped_videos = (len(video_files) - len(pending) +
+                                   sum(len(g.videos) for g in groups) -
+                                   sum(len(g.videos) for g in pending_groups) +
+                                   sum(len(run) for run in runs) -
+                                   sum(len(run) for run in pending_runs))
+            video_files = pending
+            groups = pending_groups
+            runs = pending_runs
+            pending_count = (len(video_files) + sum(len(g.videos) for g in groups) +
+                             sum(len(run) for run in runs))
+            print(f"增量模式: 跳过 {self.skipped_videos} 个已处理且未修改的视频，待处理 {pending_count} 个")
+            if not pending_count:
+                print("所有视频均已处理，无需重新处理")
+                return
+        
+        # 摄像头组和连续时间线各作为一个处理单元，与单独的视频一起顺序处理或交给进程池
+        units = groups + runs + video_files
+        # 多个视频时显示一个合并的批量进度条
+        self.progress = BatchProgress(sum(len(self._unit_videos(u)) for u in units), enabled=self.show_progress)
+        try:
+            if self.workers > 1 and len(units) > 1:
+                self._process_parallel(units)
+            else:
+                for unit in units:
+                    first_result = len(self.results)
+                    self.total_frames_extracted += self._process_unit(unit)
+                    for result in self.results[first_result:]:
+                        self._record_result(result)
+                    self.progress.advance(len(self._unit_videos(unit)), self.total_frames_extracted)
+        except KeyboardInterrupt:
+            done = sum(1 for r in self.results if not r['error'])
+            total = len(video_files) + sum(len(g.videos) for g in groups) + sum(len(run) for run in runs)
+            print(f"\n处理被中断: 已完成 {done}/{total} 个视频并记录到清单")
+            print("使用 --incremental 重新运行可从中断处继续")
+            raise
+        finally:
+            self.progress.close()
+            self.progress = None
+        
+        failed = [r for r in self.results if r['error']]
         
         # 打印总结
         print("\n" + "=" * 60)
         print("处理完成！")
         print(f"总视频数: {self.total_videos}")
+        if self.skipped_videos:
+            print(f"跳过视频数: {self.skipped_videos}（已处理且未修改）")
         print(f"总提取帧数: {self.total_frames_extracted}")
+        if failed:
+            print(f"失败视频数: {len(failed)}")
+            for result in failed:
+                print(f"  ✗ {Path(result['video']).name}: {result['error']}")
         print(f"输出根目录: {self.output_dir.absolute()}")
         print(f"每个视频的输出都在独立的子文件夹中")
         if self.extract_clips:
             print(f"视频片段: 已提取（连续运动>{self.min_motion_duration}秒的事件）")
+        if self.profile:
+            # 多进程处理时各进程的耗时相加，占比可能超过 100%
+            print(self.batch_profiler.format_report("\n阶段耗时: 整个批次", time.perf_counter() - started))
+
+
+# 工作进程中由进程池传入的共享片段提取额度和各处理单元的状态
+_clip_slots = None
+_unit_states = None
+
+
+def _init_worker(clip_slots=None, unit_states=None):
+    """
+    工作进程初始化：限制 OpenCV 内部线程，避免与进程池争抢CPU
+    
+    Args:
+        clip_slots: 所有工作进程共享的片段提取额度
+        unit_states: 共享的处理单元状态数组，开始处理时置 1
+    """
+    global _clip_slots, _unit_states
+    cv2.setNumThreads(1)
+    _clip_slots = clip_slots
+    _unit_states = unit_states
+
+
+def _mark_started(slot: Optional[int]):
+    """在共享状态中标记工作进程已开始处理第 slot 个单元（写入共享内存，进程随后崩溃也不会丢失）"""
+    if _unit_states is not None and slot is not None:
+        _unit_states[slot] = 1
+
+
+def _process_unit_worker(settings: dict, unit, slot: Optional[int] = None) -> dict:
+    """
+    在工作进程中处理一个处理单元（单个视频、摄像头组或连续时间线）
+    
+    Args:
+        settings: BatchProcessor 构造参数
+        unit: 处理单元（见 BatchProcessor._process_unit）
+        slot: 单元在共享状态数组中的位置
+    
+    Returns:
+        {'results': 单元中每个视频的处理结果, 'log': 被捕获的输出日志, 'unit': 分阶段统计}
+    """
+    _mark_started(slot)
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        processor = BatchProcessor(**settings, clip_slots=_clip_slots)
+        processor._process_unit(unit)
+    return {'results': processor.results, 'log': log.getvalue(), 'unit': processor.last_unit}
 
 
 def main():
@@ -277,14 +1037,44 @@ def main():
   # 自定义视频片段参数
   python main.py -i video.mp4 --extract-clips --motion-duration 5 --clip-before 30 --clip-after 30
   
+  # 快速片段模式（码流复制，不重新编码，需要 ffmpeg）
+  python main.py -i video.mp4 --extract-clips --fast-clips
+  
   # 处理整个文件夹
   python main.py -i /path/to/videos -o ./output --extract-clips
   
+  # 使用 8 个进程并行处理文件夹
+  python main.py -i /path/to/videos --workers 8
+  
+  # 快速片段模式下每个视频同时提取 4 个片段，整个批次最多 12 个并发任务
+  python main.py -i /path/to/videos --workers 8 --extract-clips --fast-clips --clip-workers 4 --max-jobs 12
+  
+  # 单个长视频：解码线程与运动检测并行
+  python main.py -i video.mp4 --decode-thread
+  
+  # 自适应采样：空闲时每秒 1 帧，有运动时每秒 10 帧
+  python main.py -i video.mp4 --fps 1 --adaptive-fps 10 --extract-clips
+  
+  # 特斯拉多摄像头分组：同一分钟的各角度并行分析，按事件输出所有角度
+  python main.py -i /TeslaCam/SentryClips --camera-groups --extract-clips
+  
+  # 连续时间线：跨越 1 分钟分段的事件提取为完整片段
+  python main.py -i /TeslaCam/RecentClips --continuous --extract-clips
+  
+  # 每晚增量处理新增的录像（跳过已处理且未修改的视频）
+  python main.py -i /TeslaCam -o ./output --incremental
+  
   # 调整灵敏度和间隔
   python main.py -i video.mp4 -s 20 --min-interval 2.0
   
   # 启用预览模式（用于调试）
   python main.py -i video.mp4 --preview
+  
+  # 打印各处理阶段的耗时，并保存 cProfile 数据（用 python -m pstats 或 snakeviz 查看）
+  python main.py -i video.mp4 --extract-clips --profile --profile-dump profile.prof
+  
+  # 定时任务：记录每个视频的处理指标，并写出 node_exporter textfile collector 指标
+  python main.py -i /TeslaCam --incremental --metrics-jsonl metrics.jsonl --metrics-prom /var/lib/node_exporter/motion.prom
         """
     )
     
@@ -298,10 +1088,55 @@ def main():
                        help='最小截图间隔（秒） (默认: 1.0)')
     parser.add_argument('--fps', type=int, default=2,
                        help='处理帧率，每秒处理的帧数 (默认: 2)')
-    parser.add_argument('--format', choices=['jpg', 'png'], default='jpg',
+    parser.add_argument('--adaptive-fps', type=int, default=0,
+                       help='自适应采样：空闲时按 --fps 稀疏采样，检测到运动后提高到该帧率，'
+                            '运动结束后逐步回退 (默认: 0，固定按 --fps 采样)')
+    parser.add_argument('--format', choices=['jpg', 'png', 'webp'], default='jpg',
                        help='输出图像格式 (默认: jpg)')
+    parser.add_argument('--quality', type=int, default=95,
+                       help='JPEG/WebP 截图质量 (0-100, 默认: 95)')
+    parser.add_argument('--writer-threads', type=int, default=2,
+                       help='后台编码截图的线程数 (默认: 2)')
     parser.add_argument('--preview', action='store_true',
                        help='启用实时预览（用于调试参数）')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='并行处理的进程数，摄像头组和连续时间线各作为一个任务 (默认: 1)')
+    parser.add_argument('--clip-workers', type=int, default=1,
+                       help='每个视频同时提取的片段数，适用于快速片段、命中运动索引缓存、摄像头分组和连续时间线模式 (默认: 1)')
+    parser.add_argument('--max-jobs', type=int, default=0,
+                       help='整个批次同时进行的解码/编码任务上限，包括 --workers 的进程、额外的片段提取线程和摄像头组的角度线程 '
+                            '(默认: 0，即 CPU 核心数)')
+    parser.add_argument('--detect-scale', type=float, default=1.0,
+                       help='运动检测分辨率缩放比例 (0-1, 默认: 1.0，例如 0.5 表示在 1/2 分辨率上检测)')
+    parser.add_argument('--detect-backend', choices=sorted(DETECTION_BACKENDS), default='diff',
+                       help='运动检测后端：diff 帧差（最快）、average 滑动平均背景、mog2/knn 背景建模'
+                            '（适合树叶摇动等背景变化）(默认: diff)')
+    parser.add_argument('--mask-config', default=None,
+                       help='按摄像头配置检测区域/忽略区域多边形的 JSON 文件（格式见 config_example.py 中的 DETECTION_MASKS）')
+    parser.add_argument('--no-prefilter', action='store_true',
+                       help='禁用缩略图预筛选，每个采样帧都进行完整的轮廓检测')
+    parser.add_argument('--index-cache', default=None,
+                       help='运动索引缓存目录，调整非检测参数后重跑时无需重新解码 (默认: <输出目录>/.motion_index)')
+    parser.add_argument('--no-index-cache', action='store_true',
+                       help='禁用运动索引缓存')
+    parser.add_argument('--incremental', action='store_true',
+                       help='增量模式：跳过已在相同设置下处理完成且未修改的视频，可用于中断后续跑')
+    parser.add_argument('--seek-keyframes', action='store_true',
+                       help='按关键帧跳转采样，跳过非采样帧的解码（适合极低的 --fps）')
+    parser.add_argument('--camera-groups', action='store_true',
+                       help='特斯拉多摄像头分组：同一分钟的前/后/侧方录像并行检测，融合为同一组事件并输出所有角度')
+    parser.add_argument('--continuous', action='store_true',
+                       help='连续时间线：连续的特斯拉 1 分钟分段拼接为一条时间线，事件和片段可以跨越文件')
+    parser.add_argument('--decode-thread', action='store_true',
+                       help='使用独立的解码线程，解码与运动检测并行（适合单个长视频）')
+    parser.add_argument('--profile', action='store_true',
+                       help='统计解码、检测各阶段、标注、编码和写盘的耗时，每个视频和整个批次结束时打印分阶段耗时表')
+    parser.add_argument('--profile-dump', default=None,
+                       help='用 cProfile 分析整个批次并把统计数据写入该文件（--workers > 1 时只包含主进程）')
+    parser.add_argument('--metrics-jsonl', default=None,
+                       help='每个视频处理完后向该文件追加一行 JSON 指标（时长、解码/检测帧数、事件、片段、写入字节、耗时、CPU 时间、帧率）')
+    parser.add_argument('--metrics-prom', default=None,
+                       help='批次结束时写出 Prometheus textfile collector 格式的汇总指标文件（.prom）')
     
     # 视频片段提取参数
     parser.add_argument('--extract-clips', action='store_true',
@@ -312,6 +1147,14 @@ def main():
                        help='运动事件前提取的时长（秒）(默认: 20.0)')
     parser.add_argument('--clip-after', type=float, default=20.0,
                        help='运动事件后提取的时长（秒）(默认: 20.0)')
+    parser.add_argument('--gap-tolerance', type=float, default=0.0,
+                       help='运动中断不超过该时长（秒）时视为同一事件 (默认: 0)')
+    parser.add_argument('--trigger-area', type=float, default=0.0,
+                       help='事件中至少一帧的运动面积达到该值才提取片段，较小的运动只维持已开始的事件 (默认: 0，不限制)')
+    parser.add_argument('--max-clip-length', type=float, default=0.0,
+                       help='前后范围重叠的事件合并为一个片段，合并后片段的最大时长（秒）(默认: 0，不限制)')
+    parser.add_argument('--fast-clips', action='store_true',
+                       help='快速片段模式：按关键帧直接复制码流，不重新编码、不绘制标注（需要 ffmpeg）')
     
     args = parser.parse_args()
     
@@ -328,10 +1171,57 @@ def main():
         print("错误: FPS 必须大于 0")
         sys.exit(1)
     
+    if args.adaptive_fps and args.adaptive_fps <= args.fps:
+        print("错误: 自适应采样帧率必须大于 --fps")
+        sys.exit(1)
+    
     if args.motion_duration <= 0:
         print("错误: 运动时长必须大于 0")
         sys.exit(1)
     
+    if args.gap_tolerance < 0 or args.trigger_area < 0 or args.max_clip_length < 0:
+        print("错误: 运动中断容差、触发面积和最大片段时长必须为非负数")
+        sys.exit(1)
+    
+    if not 0 <= args.quality <= 100:
+        print("错误: 截图质量必须在 0-100 之间")
+        sys.exit(1)
+    
+    if args.writer_threads < 1:
+        print("错误: 写入线程数必须大于 0")
+        sys.exit(1)
+    
+    if not 0 < args.detect_scale <= 1:
+        print("错误: 检测缩放比例必须在 (0, 1] 之间")
+        sys.exit(1)
+    
+    if args.mask_config:
+        try:
+            load_mask_config(args.mask_config)
+        except ValueError as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+    
+    if args.workers < 1:
+        print("错误: 进程数必须大于 0")
+        sys.exit(1)
+    
+    if args.clip_workers < 1 or args.max_jobs < 0:
+        print("错误: 片段提取线程数必须大于 0，任务上限必须为非负数")
+        sys.exit(1)
+    
+    if args.camera_groups and args.continuous:
+        print("错误: --camera-groups 与 --continuous 不能同时使用")
+        sys.exit(1)
+    
+    if args.workers > 1 and args.preview:
+        print("错误: 预览模式不支持多进程处理")
+        sys.exit(1)
+    
+    index_cache_dir = None
+    if not args.no_index_cache:
+        index_cache_dir = args.index_cache or os.path.join(args.output, '.motion_index')
+    
     # 创建批量处理器并执行
     processor = BatchProcessor(
         output_dir=args.output,
@@ -343,10 +1233,36 @@ def main():
         extract_clips=args.extract_clips,
         min_motion_duration=args.motion_duration,
         clip_before=args.clip_before,
-        clip_after=args.clip_after
+        clip_after=args.clip_after,
+        seek_keyframes=args.seek_keyframes,
+        workers=args.workers,
+        detection_scale=args.detect_scale,
+        fast_clips=args.fast_clips,
+        index_cache_dir=index_cache_dir,
+        incremental=args.incremental,
+        jpeg_quality=args.quality,
+        writer_threads=args.writer_threads,
+        threaded_decode=args.decode_thread,
+        camera_groups=args.camera_groups,
+        continuous=args.continuous,
+        gap_tolerance=args.gap_tolerance,
+        trigger_area=args.trigger_area,
+        max_clip_length=args.max_clip_length,
+        prefilter=not args.no_prefilter,
+        adaptive_fps=args.adaptive_fps,
+        detection_backend=args.detect_backend,
+        mask_config=args.mask_config,
+        clip_workers=args.clip_workers,
+        max_jobs=args.max_jobs,
+        profile=args.profile,
+        metrics_jsonl=args.metrics_jsonl,
+        metrics_prom=args.metrics_prom
     )
     
+    profiler = cProfile.Profile() if args.profile_dump else None
     try:
+        if profiler:
+            profiler.enable()
         processor.process_all(args.input)
     except KeyboardInterrupt:
         print("\n\n用户中断处理")
@@ -356,6 +1272,11 @@ def main():
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile_dump)
+            print(f"cProfile 数据已保存: {args.profile_dump}")
 
 
 if __name__ == '__main__':
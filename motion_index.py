@@ -0,0 +1,224 @@
+"""
+运动索引缓存
+将每个采样帧的运动检测结果持久化到磁盘，参数不影响检测结果时可直接复用
+"""
+
+import hashlib
+import json
+import os
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from motion_regions import MotionRegions
+
+
+class MotionIndex:
+    """单个视频的逐采样帧运动检测结果
+    
+    每个采样帧记录帧号、时间戳、是否有运动、运动面积以及运动区域外接矩形，
+    外接矩形以 (x, y, w, h) 存储在一个 N×4 数组中，box_areas 为各区域的面积，
+    box_offsets 指出每帧对应的切片。
+    """
+    
+    def __init__(self, video_fps: float, total_frames: int):
+        """
+        初始化空索引
+        
+        Args:
+            video_fps: 视频原始帧率
+            total_frames: 视频总帧数
+        """
+        self.video_fps = video_fps
+        self.total_frames = total_frames
+        self.frame_indices = np.zeros(0, dtype=np.int64)
+        self.timestamps = np.zeros(0, dtype=np.float64)
+        self.has_motion = np.zeros(0, dtype=bool)
+        self.motion_area = np.zeros(0, dtype=np.float32)
+        self.boxes = np.zeros((0, 4), dtype=np.int32)
+        self.box_areas = np.zeros(0, dtype=np.float32)
+        self.box_offsets = np.zeros(1, dtype=np.int64)
+        self.meta: Optional[dict] = None  # 从缓存文件加载时的校验信息
+        self._pending = []
+    
+    @property
+    def duration(self) -> float:
+        """视频时长（秒），帧率或总帧数未知时为 0"""
+        return self.total_frames / self.video_fps if self.video_fps > 0 and self.total_frames > 0 else 0.0
+    
+    @property
+    def from_cache(self) -> bool:
+        """是否从缓存文件加载（没有解码视频）"""
+        return self.meta is not None
+    
+    def __len__(self) -> int:
+        self._flush()
+        return len(self.frame_indices)
+    
+    def add(self, frame_index: int, timestamp: float, has_motion: bool, regions: MotionRegions):
+        """
+        追加一个采样帧的检测结果
+        
+        Args:
+            frame_index: 帧号
+            timestamp: 时间戳（秒）
+            has_motion: 是否检测到运动
+            regions: 运动区域（原始帧坐标）
+        """
+        self._pending.append((frame_index, timestamp, has_motion, regions))
+    
+    def _flush(self):
+        """把逐帧追加的结果合并进数组"""
+        if not self._pending:
+            return
+        frame_indices, timestamps, has_motion, regions = zip(*self._pending)
+        counts = [len(r) for r in regions]
+        
+        self.frame_indices = np.concatenate([self.frame_indices, np.asarray(frame_indices, dtype=np.int64)])
+        self.timestamps = np.concatenate([self.timestamps, np.asarray(timestamps, dtype=np.float64)])
+        self.has_motion = np.concatenate([self.has_motion, np.asarray(has_motion, dtype=bool)])
+        self.motion_area = np.concatenate([self.motion_area,
+                                           np.asarray([r.total_area for r in regions], dtype=np.float32)])
+        self.boxes = np.concatenate([self.boxes] + [r.boxes.astype(np.int32) for r in regions])
+        self.box_areas = np.concatenate([self.box_areas] + [r.areas.astype(np.float32) for r in regions])
+        self.box_offsets = np.concatenate([self.box_offsets, self.box_offsets[-1] + np.cumsum(counts)])
+        self._pending = []
+    
+    def sort(self):
+        """按帧号重新排列采样（在已有采样之间补充采样后调用）"""
+        self._flush()
+        order = np.argsort(self.frame_indices, kind='stable')
+        if np.array_equal(order, np.arange(len(order))):
+            return
+        
+        counts = np.diff(self.box_offsets)[order]
+        rows = [np.arange(self.box_offsets[i], self.box_offsets[i + 1]) for i in order]
+        if len(self.boxes):
+            rows = np.concatenate(rows)
+            self.boxes = self.boxes[rows]
+            self.box_areas = self.box_areas[rows]
+        self.box_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.frame_indices = self.frame_indices[order]
+        self.timestamps = self.timestamps[order]
+        self.has_motion = self.has_motion[order]
+        self.motion_area = self.motion_area[order]
+    
+    def regions(self, i: int) -> MotionRegions:
+        """
+        返回第 i 个采样帧的运动区域，可直接用于标注绘制
+        
+        Args:
+            i: 采样帧序号
+        
+        Returns:
+            运动区域
+        """
+        self._flush()
+        start, end = self.box_offsets[i], self.box_offsets[i + 1]
+        return MotionRegions(self.boxes[start:end], self.box_areas[start:end])
+    
+    def save(self, path: Path, meta: dict):
+        """保存为压缩的 .npz 文件，meta 用于加载时校验"""
+        self._flush()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp.npz')
+        np.savez_compressed(
+            tmp_path,
+            meta=np.array(json.dumps(meta, sort_keys=True)),
+            video_fps=np.array(self.video_fps),
+            total_frames=np.array(self.total_frames),
+            frame_indices=self.frame_indices,
+            timestamps=self.timestamps,
+            has_motion=self.has_motion,
+            motion_area=self.motion_area,
+            boxes=self.boxes,
+            box_areas=self.box_areas,
+            box_offsets=self.box_offsets,
+        )
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: Path) -> Optional['MotionIndex']:
+        """从 .npz 文件加载索引，文件损坏（包括写到一半被截断）时返回 None"""
+        try:
+            with np.load(path) as data:
+                index = cls(float(data['video_fps']), int(data['total_frames']))
+                index.meta = json.loads(str(data['meta']))
+                index.frame_indices = data['frame_indices']
+                index.timestamps = data['timestamps']
+                index.has_motion = data['has_motion']
+                index.motion_area = data['motion_area']
+                index.boxes = data['boxes']
+                index.box_areas = data['box_areas']
+                index.box_offsets = data['box_offsets']
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile, zlib.error):
+            return None
+        return index
+
+
+class MotionIndexCache:
+    """运动索引的磁盘缓存
+    
+    缓存键由视频文件的绝对路径、大小、修改时间和检测参数共同组成；
+    文件被修改或检测参数变化时缓存自动失效。
+    """
+    
+    def __init__(self, cache_dir: str):
+        """
+        初始化缓存
+        
+        Args:
+            cache_dir: 缓存目录
+        """
+        self.cache_dir = Path(cache_dir)
+    
+    @staticmethod
+    def _meta(video_path: str, params: dict) -> dict:
+        """生成缓存校验信息"""
+        stat = os.stat(video_path)
+        return {
+            'path': str(Path(video_path).resolve()),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'params': params,
+        }
+    
+    def _path(self, video_path: str, params: dict) -> Path:
+        """缓存文件路径，同一视频的不同检测参数对应不同文件"""
+        key = json.dumps([str(Path(video_path).resolve()), params], sort_keys=True)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        return self.cache_dir / f"{Path(video_path).stem}_{digest}.npz"
+    
+    def load(self, video_path: str, params: dict) -> Optional[MotionIndex]:
+        """
+        读取缓存的运动索引
+        
+        Args:
+            video_path: 视频文件路径
+            params: 检测参数
+        
+        Returns:
+            有效的运动索引，不存在或已失效时返回 None
+        """
+        path = self._path(video_path, params)
+        if not path.exists():
+            return None
+        index = MotionIndex.load(path)
+        expected = json.loads(json.dumps(self._meta(video_path, params), sort_keys=True))
+        if index is None or index.meta != expected:
+            return None
+        return index
+    
+    def save(self, video_path: str, params: dict, index: MotionIndex):
+        """
+        保存运动索引
+        
+        Args:
+            video_path: 视频文件路径
+            params: 检测参数
+            index: 运动索引
+        """
+        index.save(self._path(video_path, params), self._meta(video_path, params))
@@ -0,0 +1,139 @@
+"""
+运动区域
+MotionDetector 以 N×4 外接矩形数组和面积数组的形式返回一帧中的运动区域，
+截图和片段标注共用同一套矢量化的边距扩展、裁剪和绘制逻辑。
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class MotionRegions:
+    """一帧中的运动区域（原始帧坐标）
+    
+    boxes 的每一行为 (x, y, w, h)，areas 为对应区域的像素面积。
+    """
+    boxes: np.ndarray = field(default_factory=lambda: np.zeros((0, 4), dtype=np.int32))
+    areas: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.float32))
+    
+    def __len__(self) -> int:
+        return len(self.boxes)
+    
+    @property
+    def total_area(self) -> float:
+        """所有运动区域的面积之和"""
+        return float(self.areas.sum())
+    
+    @classmethod
+    def from_contours(cls,
+                      contours: Sequence[np.ndarray],
+                      min_area: float,
+                      scale: float = 1.0,
+                      offset: Optional[np.ndarray] = None) -> 'MotionRegions':
+        """
+        一次性计算所有轮廓的外接矩形和面积，保留面积大于 min_area 的区域
+        
+        结果与逐个调用 cv2.boundingRect / cv2.contourArea 相同。
+        
+        Args:
+            contours: cv2.findContours 返回的轮廓（检测分辨率）
+            min_area: 检测分辨率下的最小面积
+            scale: 检测分辨率缩放比例，小于 1 时把轮廓映射回原始分辨率
+            offset: 检测区域在原始帧中的左上角坐标
+        
+        Returns:
+            原始帧坐标的运动区域
+        """
+        if not contours:
+            return cls()
+        lengths = np.fromiter(map(len, contours), dtype=np.int64, count=len(contours))
+        points = np.concatenate(contours).reshape(-1, 2)
+        boxes, areas = _measure_polygons(points, lengths)
+        
+        keep = areas > min_area
+        if not keep.any():
+            return cls()
+        if not keep.all():
+            points = points[np.repeat(keep, lengths)]
+            lengths = lengths[keep]
+            boxes, areas = boxes[keep], areas[keep]
+        
+        # 映射回原始帧坐标（与逐个轮廓除以缩放比例后取整相同）
+        if scale < 1:
+            boxes, areas = _measure_polygons((points / scale).astype(np.int32), lengths)
+        if offset is not None:
+            boxes[:, :2] += offset
+        return cls(boxes, areas)
+
+
+def _measure_polygons(points: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    计算首尾相接存放的多个多边形的外接矩形和面积
+    
+    Args:
+        points: 所有多边形的顶点 (M×2)
+        lengths: 每个多边形的顶点数
+    
+    Returns:
+        (boxes, areas): N×4 外接矩形 (x, y, w, h) 和鞋带公式面积
+    """
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    following = np.arange(1, len(points) + 1)
+    following[starts + lengths - 1] = starts
+    x = points[:, 0].astype(np.int64)
+    y = points[:, 1].astype(np.int64)
+    cross = x * y[following] - x[following] * y
+    areas = (np.abs(np.add.reduceat(cross, starts)) / 2).astype(np.float32)
+    
+    low = np.minimum.reduceat(points, starts)
+    high = np.maximum.reduceat(points, starts)
+    boxes = np.hstack([low, high - low + 1]).astype(np.int32)
+    return boxes, areas
+
+
+def pad_boxes(boxes: np.ndarray, frame_shape: tuple) -> np.ndarray:
+    """
+    扩大外接矩形并裁剪到画面范围内，确保完整框住运动物体
+    
+    边距为矩形短边的 15%，至少 15 像素。
+    
+    Args:
+        boxes: N×4 外接矩形 (x, y, w, h)
+        frame_shape: 画面尺寸 (height, width, ...)
+    
+    Returns:
+        扩大后的 N×4 外接矩形
+    """
+    frame_h, frame_w = frame_shape[:2]
+    x, y, w, h = np.asarray(boxes, dtype=np.int32).reshape(-1, 4).T
+    padding = np.maximum(15, (np.minimum(w, h) * 0.15).astype(np.int32))
+    x = np.maximum(0, x - padding)
+    y = np.maximum(0, y - padding)
+    w = np.minimum(frame_w - x, w + 2 * padding)
+    h = np.minimum(frame_h - y, h + 2 * padding)
+    return np.stack([x, y, w, h], axis=1)
+
+
+def draw_motion_boxes(frame: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """
+    在帧上绘制扩大后的绿色运动边界框（原地修改）
+    
+    Args:
+        frame: 视频帧
+        boxes: N×4 外接矩形 (x, y, w, h)
+    
+    Returns:
+        绘制后的帧
+    """
+    if len(boxes) == 0:
+        return frame
+    x, y, w, h = pad_boxes(boxes, frame.shape).T
+    # 所有矩形的四个角点一次交给 polylines（与逐个 cv2.rectangle 的绘制结果相同）
+    corners = np.stack([np.stack([x, y], 1), np.stack([x + w, y], 1),
+                        np.stack([x + w, y + h], 1), np.stack([x, y + h], 1)], axis=1)
+    cv2.polylines(frame, list(corners.astype(np.int32)), True, (0, 255, 0), 3)
+    return frame
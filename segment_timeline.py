@@ -0,0 +1,190 @@
+"""
+跨文件连续时间线
+特斯拉把录像切分为 1 分钟的文件，这里把连续的分段拼接为一条虚拟时间线，
+运动检测状态跨越文件边界延续，事件和片段可以跨越多个文件
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+from camera_groups import parse_tesla_filename
+from video_processor import sample_frames
+
+
+# 特斯拉录像分段的标称时长（秒）
+SEGMENT_SECONDS = 60
+
+
+@dataclass
+class Segment:
+    """时间线中的一个视频文件"""
+    path: Path          # 视频文件路径
+    fps: float          # 视频帧率
+    frame_count: int    # 视频总帧数
+    start: float = 0.0  # 在时间线上的开始时间（秒）
+    
+    @property
+    def duration(self) -> float:
+        """分段时长（秒）"""
+        return self.frame_count / self.fps if self.fps > 0 else 0.0
+    
+    @property
+    def end(self) -> float:
+        """在时间线上的结束时间（秒）"""
+        return self.start + self.duration
+
+
+def _open_capture(video_path: Path) -> cv2.VideoCapture:
+    """打开视频，供预取线程调用"""
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError(f"无法打开视频文件: {video_path}")
+    return cap
+
+
+def _probe(video_path: Path) -> Segment:
+    """读取视频的帧率和帧数"""
+    cap = _open_capture(video_path)
+    try:
+        return Segment(video_path, cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    finally:
+        cap.release()
+
+
+class SegmentTimeline:
+    """按顺序拼接的多个视频文件组成的虚拟时间线
+    
+    各分段首尾相接，时间线时间 = 分段开始时间 + 分段内时间；
+    全局帧号按第一个分段的帧率由时间线时间换算。
+    """
+    
+    def __init__(self, video_files: List[Path]):
+        """
+        初始化时间线（并行读取各分段的帧率和帧数）
+        
+        Args:
+            video_files: 按时间顺序排列的视频文件列表
+        """
+        with ThreadPoolExecutor(max_workers=min(8, len(video_files))) as executor:
+            self.segments = list(executor.map(_probe, video_files))
+        
+        start = 0.0
+        for segment in self.segments:
+            segment.start = start
+            start = segment.end
+    
+    @property
+    def fps(self) -> float:
+        """时间线帧率（第一个分段的帧率）"""
+        return self.segments[0].fps
+    
+    @property
+    def duration(self) -> float:
+        """时间线总时长（秒）"""
+        return self.segments[-1].end
+    
+    @property
+    def total_frames(self) -> int:
+        """时间线总帧数"""
+        return int(round(self.duration * self.fps))
+    
+    @property
+    def name(self) -> str:
+        """时间线名称，用作输出目录名"""
+        return f"{self.segments[0].path.stem}_{len(self.segments)}segs"
+    
+    def segments_between(self, start_time: float, end_time: float) -> List[Segment]:
+        """返回与 [start_time, end_time] 有重叠的分段"""
+        return [s for s in self.segments if s.start <= end_time and s.end > start_time]
+    
+    def segment_at(self, timestamp: float) -> Segment:
+        """返回包含 timestamp 的分段，超出范围时返回首个或最后一个分段"""
+        for segment in self.segments:
+            if timestamp < segment.end:
+                return segment
+        return self.segments[-1]
+    
+    def iter_samples(self,
+                     fps: int,
+                     seek_keyframes: bool = False) -> Iterator[Tuple[Segment, int, float, np.ndarray]]:
+        """
+        按处理帧率依次采样所有分段
+        
+        解码当前分段时，下一个分段在后台线程中预先打开（探测容器并定位到首个关键帧），
+        文件切换时无需等待。
+        
+        Args:
+            fps: 处理帧率（每秒采样的帧数）
+            seek_keyframes: 是否直接跳转到下一个采样帧
+        
+        Yields:
+            (segment, frame_index, timestamp, frame): 分段、分段内帧号、时间线时间和BGR图像
+        """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='segment-prefetch')
+        next_cap = executor.submit(_open_capture, self.segments[0].path)
+        try:
+            for i, segment in enumerate(self.segments):
+                cap = next_cap.result()
+                next_cap = None
+                if i + 1 < len(self.segments):
+                    next_cap = executor.submit(_open_capture, self.segments[i + 1].path)
+                
+                frame_interval = max(1, int(segment.fps / fps)) if segment.fps > 0 else 1
+                try:
+                    for frame_index, frame in sample_frames(cap, frame_interval, seek_keyframes):
+                        yield segment, frame_index, segment.start + frame_index / segment.fps, frame
+                finally:
+                    cap.release()
+        finally:
+            if next_cap is not None:
+                try:
+                    next_cap.result().release()
+                except ValueError:
+                    pass
+            executor.shutdown(wait=True)
+
+
+def find_continuous_runs(video_files: List[Path], max_gap: float = 10.0) -> Tuple[List[List[Path]], List[Path]]:
+    """
+    查找连续录制的特斯拉分段
+    
+    同一目录、同一摄像头，且文件名时间戳相差不超过一个分段时长加 max_gap 秒的文件视为连续。
+    
+    Args:
+        video_files: 视频文件列表
+        max_gap: 相邻分段之间允许的最大间隔（秒）
+    
+    Returns:
+        (runs, singles): 至少包含两个分段的连续文件列表，以及其余的单个视频
+    """
+    streams = {}
+    singles = []
+    for video_path in video_files:
+        parsed = parse_tesla_filename(video_path)
+        if parsed is None:
+            singles.append(video_path)
+            continue
+        timestamp, camera = parsed
+        start = datetime.strptime(timestamp, '%Y-%m-%d_%H-%M-%S')
+        streams.setdefault((video_path.parent, camera), []).append((start, video_path))
+    
+    runs = []
+    for key in sorted(streams):
+        run = []
+        last_start = None
+        for start, video_path in sorted(streams[key]):
+            if last_start is not None and (start - last_start).total_seconds() > SEGMENT_SECONDS + max_gap:
+                runs.append(run)
+                run = []
+            run.append(video_path)
+            last_start = start
+        runs.append(run)
+    
+    singles.extend(v for run in runs if len(run) < 2 for v in run)
+    return [run for run in runs if len(run) >= 2], sorted(singles)
@@ -0,0 +1,182 @@
+"""
+分阶段性能计时
+按阶段累计耗时、调用次数和写入字节数，用于定位处理流程中的瓶颈。
+禁用时所有方法立即返回，不调用计时器，可以常驻在热路径中。
+"""
+
+import contextlib
+import os
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional
+
+
+# 报告中各阶段的排列顺序（按处理流程），其余阶段按名称排在后面
+STAGE_ORDER = ('decode', 'retrieve', 'redecode', 'gray', 'prefilter', 'blur', 'diff', 'morphology', 'contours',
+               'annotate', 'encode', 'remux', 'image_encode', 'write')
+
+
+class StageProfiler:
+    """分阶段计时器
+    
+    用 start()/lap() 对连续的多个阶段计时，lap() 返回的时间点作为下一阶段的起点；
+    计时状态由调用方持有，同一个计时器可以被多个线程和检测器共享。
+    """
+    
+    def __init__(self, enabled: bool = True):
+        """
+        Args:
+            enabled: 是否启用计时
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.stages: Dict[str, list] = {}  # 阶段名 -> [累计耗时(秒), 次数, 字节数]
+    
+    def start(self) -> float:
+        """返回计时起点"""
+        return time.perf_counter() if self.enabled else 0.0
+    
+    def lap(self, name: str, start: float, nbytes: int = 0) -> float:
+        """
+        记录从 start 到现在的耗时
+        
+        Args:
+            name: 阶段名
+            start: 计时起点（start() 或上一次 lap() 的返回值）
+            nbytes: 该阶段写入的字节数
+        
+        Returns:
+            当前时间点，作为下一阶段的起点
+        """
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        self.add(name, now - start, nbytes=nbytes)
+        return now
+    
+    def lap_file(self, name: str, start: float, path: str) -> float:
+        """
+        记录从 start 到现在的耗时，并把 path 的文件大小计为该阶段写入的字节数
+        
+        Args:
+            name: 阶段名
+            start: 计时起点
+            path: 该阶段写出的文件（不存在时按 0 字节计）
+        
+        Returns:
+            当前时间点
+        """
+        if not self.enabled:
+            return 0.0
+        try:
+            nbytes = os.path.getsize(path)
+        except OSError:
+            nbytes = 0
+        return self.lap(name, start, nbytes)
+    
+    def add(self, name: str, seconds: float, count: int = 1, nbytes: int = 0):
+        """
+        累加一个阶段的耗时、次数和字节数
+        
+        Args:
+            name: 阶段名
+            seconds: 耗时（秒）
+            count: 次数
+            nbytes: 字节数
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self.stages.setdefault(name, [0.0, 0, 0])
+            entry[0] += seconds
+            entry[1] += count
+            entry[2] += nbytes
+    
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """对 with 语句块计时"""
+        start = self.start()
+        try:
+            yield
+        finally:
+            self.lap(name, start)
+    
+    def timed(self, name: str, iterable: Iterable) -> Iterable:
+        """
+        对迭代器每次产出元素的等待时间计时（例如解码下一帧）
+        
+        Args:
+            name: 阶段名
+            iterable: 被计时的迭代器
+        
+        Returns:
+            产出相同元素的迭代器；禁用时直接返回原迭代器
+        """
+        if not self.enabled:
+            return iterable
+        return self._timed(name, iter(iterable))
+    
+    def _timed(self, name: str, iterator: Iterator) -> Iterator:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add(name, time.perf_counter() - start)
+            yield item
+    
+    def to_dict(self) -> Dict[str, dict]:
+        """返回可序列化的各阶段统计"""
+        with self._lock:
+            return {name: {'seconds': seconds, 'count': count, 'bytes': nbytes}
+                    for name, (seconds, count, nbytes) in self.stages.items()}
+    
+    def merge(self, other):
+        """
+        并入另一个计时器（或其 to_dict() 结果）的统计
+        
+        Args:
+            other: StageProfiler 或 to_dict() 返回的字典
+        """
+        stages = other.to_dict() if isinstance(other, StageProfiler) else other
+        for name, entry in stages.items():
+            self.add(name, entry['seconds'], entry['count'], entry['bytes'])
+    
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self.stages = {}
+    
+    def format_report(self, title: str, wall_time: Optional[float] = None) -> str:
+        """
+        格式化各阶段耗时表
+        
+        Args:
+            title: 标题
+            wall_time: 总耗时（秒），提供时显示各阶段占比；后台线程与主线程的耗时会重叠，
+                       占比之和可能超过 100%
+        
+        Returns:
+            多行文本
+        """
+        stages = self.to_dict()
+        names = [n for n in STAGE_ORDER if n in stages] + sorted(n for n in stages if n not in STAGE_ORDER)
+        header = ''.join(_pad(text, width) for text, width in
+                         (('阶段', -14), ('耗时(s)', 9), ('次数', 9), ('平均(ms)', 10), ('占比', 8), ('写入(MB)', 10)))
+        lines = [title, '  ' + header]
+        for name in names:
+            entry = stages[name]
+            average = entry['seconds'] / entry['count'] * 1000 if entry['count'] else 0.0
+            share = f"{entry['seconds'] / wall_time * 100:7.1f}%" if wall_time else '       -'
+            written = f"{entry['bytes'] / (1024 * 1024):10.2f}" if entry['bytes'] else '         -'
+            lines.append(f"  {name:<14}{entry['seconds']:9.3f}{entry['count']:9d}{average:10.3f}{share}{written}")
+        if wall_time:
+            lines.append(f"  {_pad('总耗时', -14)}{wall_time:9.3f}")
+        return '\n'.join(lines)
+
+
+def _pad(text: str, width: int) -> str:
+    """按终端显示宽度（中文字符占两列）补齐，width 为负数时左对齐"""
+    fill = ' ' * max(0, abs(width) - len(text) - sum(ord(c) > 0x2e80 for c in text))
+    return text + fill if width < 0 else fill + text
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+测试自适应采样
+验证空闲时稀疏采样、运动期间密集采样，补充采样后事件边界的精度，
+以及截图流程未补充采样的索引不会被片段提取复用
+"""
+
+import os
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+from motion_index import MotionIndexCache
+from test_single_pass_clips import count_frames, make_extractor
+from video_processor import AdaptiveSampler, VideoProcessor
+
+
+def create_offset_event_video(output_path, duration=14, fps=30, motion=(4.4, 9.4)):
+    """创建一段运动的测试视频，运动开始时间不落在整秒的采样点上"""
+    width, height = 320, 240
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    
+    for i in range(duration * fps):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        t = i / fps
+        if motion[0] <= t < motion[1]:
+            x = int(10 + (t - motion[0]) * 50) % 260
+            cv2.circle(frame, (x + 25, 120), 25, (0, 255, 0), -1)
+        out.write(frame)
+    
+    out.release()
+
+
+def test_sampler_ramp_and_backoff():
+    """检测到运动后切换到密集间隔，安静超过冷却时长后逐步回退"""
+    print("测试: 采样间隔调整...")
+    sampler = AdaptiveSampler.for_rates(video_fps=30, fps=1, dense_fps=10, cooldown=1.0)
+    assert (sampler.base_interval, sampler.dense_interval, sampler.cooldown_frames) == (30, 3, 30)
+    assert sampler.adaptive
+    assert not AdaptiveSampler.for_rates(30, 2).adaptive
+    
+    assert sampler.update(0, False) == 30
+    assert sampler.update(30, True) == 3
+    intervals = [sampler.update(frame, False) for frame in (33, 60, 63, 69, 81, 105)]
+    assert intervals == [3, 6, 12, 24, 30, 30], intervals
+    
+    print("  ✓ 间隔调整正确")
+    return True
+
+
+def test_backfilled_event_boundaries():
+    """稀疏采样加补充采样得到与密集采样相同精度的事件边界，检测的帧数更少"""
+    print("测试: 补充采样的事件边界...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'offset.mp4')
+        create_offset_event_video(video_path)
+        
+        fixed = make_extractor().detect_motion_events(video_path, fps=1)
+        dense_extractor = make_extractor()
+        dense = dense_extractor.events_from_index(dense_extractor.build_motion_index(video_path, fps=10))
+        adaptive_extractor = make_extractor(adaptive_fps=10)
+        index = adaptive_extractor.build_motion_index(video_path, fps=1)
+        adaptive = adaptive_extractor.events_from_index(index)
+        
+        assert len(fixed) == len(dense) == len(adaptive) == 1
+        assert fixed[0].start_time - 4.4 > 0.5, fixed
+        assert abs(adaptive[0].start_time - dense[0].start_time) <= 0.1, (adaptive, dense)
+        assert abs(adaptive[0].end_time - dense[0].end_time) <= 0.1, (adaptive, dense)
+        assert np.all(np.diff(index.frame_indices) > 0)
+        assert len(index) < 14 * 10 * 0.7, len(index)
+    
+    print("  ✓ 事件边界精确")
+    return True
+
+
+def test_single_pass_adaptive_matches_two_pass():
+    """单遍处理重新解码并补充采样跳过的帧，片段范围与两遍处理一致"""
+    print("测试: 单遍处理的自适应采样...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'offset.mp4')
+        create_offset_event_video(video_path)
+        
+        extractor = make_extractor(adaptive_fps=10)
+        events = extractor.detect_motion_events(video_path, fps=1)
+        window = extractor.clip_windows(events)[0]
+        clip_path = os.path.join(tmp, 'two_pass.mp4')
+        assert extractor.extract_window(video_path, window, clip_path)
+        
+        clips = make_extractor(adaptive_fps=10).process_video(video_path, os.path.join(tmp, 'clips'), fps=1)
+        assert len(clips) == 1, clips
+        assert abs(count_frames(clips[0]) - count_frames(clip_path)) <= 3, \
+            (count_frames(clips[0]), count_frames(clip_path))
+    
+    print("  ✓ 片段范围一致")
+    return True
+
+
+def test_screenshot_index_not_reused_for_events():
+    """只提取截图后再提取片段时不复用未补充采样的索引，事件边界与不使用缓存时相同"""
+    print("测试: 自适应采样的索引缓存...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'offset.mp4')
+        create_offset_event_video(video_path)
+        cache = MotionIndexCache(os.path.join(tmp, 'cache'))
+        
+        processor = VideoProcessor(fps=1, index_cache=cache, adaptive_fps=10)
+        processor.process_video(video_path)
+        extractor = make_extractor(adaptive_fps=10, index_cache=cache)
+        assert processor.index_params() != extractor.index_params(1)
+        assert extractor.load_cached_index(video_path, 1) is None
+        
+        expected = make_extractor(adaptive_fps=10).detect_motion_events(video_path, fps=1)
+        assert extractor.detect_motion_events(video_path, fps=1) == expected
+        # 两种索引各自缓存，再次运行时都命中
+        assert extractor.detect_motion_events(video_path, fps=1) == expected
+        assert cache.load(video_path, processor.index_params()) is not None
+        
+        # 固定帧率采样时两者的索引相同，继续共用缓存
+        assert VideoProcessor(fps=1).index_params() == make_extractor().index_params(1)
+    
+    print("  ✓ 截图索引未被片段提取复用")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_sampler_ramp_and_backoff(),
+        test_backfilled_event_boundaries(),
+        test_single_pass_adaptive_matches_two_pass(),
+        test_screenshot_index_not_reused_for_events(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+测试批量处理指标导出
+验证逐视频的 JSONL 记录与实际输出一致，Prometheus 汇总指标与记录之和一致，
+多进程处理时工作进程的指标由主进程写出，各类处理单元的时长取自处理时读取的帧率和帧数
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from main import BatchProcessor
+from test_camera_groups import create_camera_video
+from test_single_pass_clips import count_frames, create_two_event_video
+
+
+def read_prometheus(path):
+    """解析 .prom 文件中的样本: {指标名+标签: 值}"""
+    samples = {}
+    for line in Path(path).read_text(encoding='utf-8').splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+
+def run_batch(tmp, input_dir, name, **kwargs):
+    """运行一次带指标导出的批量处理，返回 (处理器, JSONL 记录, Prometheus 样本)"""
+    jsonl = os.path.join(tmp, f'{name}.jsonl')
+    prom = os.path.join(tmp, f'{name}.prom')
+    processor = BatchProcessor(os.path.join(tmp, name), fps=5, show_progress=False,
+                               metrics_jsonl=jsonl, metrics_prom=prom, **kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor.process_all(input_dir)
+    with open(jsonl, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    return processor, records, read_prometheus(prom)
+
+
+def test_video_records_match_outputs():
+    """每个视频一条记录，帧数、事件、片段和写入字节数与实际输出一致"""
+    print("测试: 逐视频指标记录...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        os.makedirs(input_dir)
+        for name in ('a.mp4', 'b.mp4'):
+            create_two_event_video(os.path.join(input_dir, name))
+        
+        processor, records, samples = run_batch(tmp, input_dir, 'out', extract_clips=True,
+                                                clip_before=1.0, clip_after=1.0)
+        assert [Path(r['name']).stem for r in records] == ['a', 'b']
+        for record in records:
+            video = record['videos'][0]
+            outputs = [p for p in (Path(tmp) / 'out' / Path(video).stem).rglob('*') if p.is_file()]
+            clips = [p for p in outputs if p.suffix == '.mp4']
+            assert record['unit'] == 'video' and record['status'] == 'ok' and record['error'] is None
+            assert abs(record['duration_s'] - 20.0) < 0.1
+            # 单遍处理顺序读取每一帧，只有片段的预录部分重新解码一次
+            assert record['frames_decoded'] == count_frames(video)
+            assert 0 < record['frames_redecoded'] <= sum(count_frames(str(c)) for c in clips)
+            assert 0 < record['frames_analysed'] < record['frames_decoded']
+            assert record['events'] == 2 and record['clips'] == len(clips) == 2
+            assert record['screenshots'] == len(outputs) - len(clips) > 0
+            assert record['bytes_written'] == sum(p.stat().st_size for p in outputs)
+            assert record['wall_s'] > 0 and record['cpu_s'] > 0 and record['fps'] > 0
+            assert record['stages']['decode'] > 0
+        
+        assert samples['motion_extractor_batch_videos{status="ok"}'] == 2
+        assert samples['motion_extractor_batch_videos{status="failed"}'] == 0
+        for field, metric in (('frames_decoded', 'frames_decoded'), ('frames_redecoded', 'frames_redecoded'),
+                              ('clips', 'clips'),
+                              ('bytes_written', 'bytes_written'), ('events', 'events')):
+            assert samples[f'motion_extractor_batch_{metric}'] == sum(r[field] for r in records)
+        assert samples['motion_extractor_batch_realtime_factor'] > 0
+        assert 'motion_extractor_batch_stage_seconds{stage="decode"}' in samples
+        assert not processor.profile and processor.batch_profiler.to_dict() == {}
+    
+    print(f"  ✓ {len(records)} 条记录与输出一致")
+    return True
+
+
+def test_frames_decoded_across_modes():
+    """只提取截图、单遍提取片段和命中缓存时 frames_decoded 都是顺序读取的帧数，可以互相比较"""
+    print("测试: 不同模式的解码帧数...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        os.makedirs(input_dir)
+        video = os.path.join(input_dir, 'a.mp4')
+        create_two_event_video(video)
+        total = count_frames(video)
+        cache_dir = os.path.join(tmp, 'cache')
+        
+        _, (screenshots,), _ = run_batch(tmp, input_dir, 'screenshots')
+        assert screenshots['frames_decoded'] == total > screenshots['frames_analysed']
+        assert screenshots['frames_redecoded'] == 0
+        
+        _, (single_pass,), _ = run_batch(tmp, input_dir, 'clips', extract_clips=True,
+                                         clip_before=1.0, clip_after=1.0, index_cache_dir=cache_dir)
+        assert single_pass['frames_decoded'] == total
+        assert single_pass['frames_redecoded'] > 0
+        
+        # 命中缓存时不顺序读取视频，只重新解码截图和片段
+        _, (cached,), _ = run_batch(tmp, input_dir, 'cached', extract_clips=True,
+                                    clip_before=1.0, clip_after=1.0, index_cache_dir=cache_dir)
+        assert cached['frames_decoded'] == 0 and cached['fps'] == 0
+        assert cached['frames_redecoded'] > 0
+    
+    print(f"  ✓ 截图和片段模式均为 {total} 帧")
+    return True
+
+
+def test_parallel_metrics():
+    """多进程处理时每个视频（包括失败的视频）仍各有一条记录"""
+    print("测试: 多进程指标记录...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        os.makedirs(input_dir)
+        for name in ('a.mp4', 'b.mp4'):
+            create_two_event_video(os.path.join(input_dir, name), duration=6)
+        with open(os.path.join(input_dir, 'broken.mp4'), 'wb') as f:
+            f.write(b'not a video')
+        
+        _, sequential, _ = run_batch(tmp, input_dir, 'seq')
+        _, parallel, samples = run_batch(tmp, input_dir, 'par', workers=2)
+        
+        def summary(records):
+            return sorted((r['name'], r['status'], r['screenshots'], r['frames_analysed'], r['events'],
+                           r['duration_s']) for r in records)
+        
+        assert summary(parallel) == summary(sequential)
+        # 只提取截图时时长同样取自处理时读取的帧率和帧数，无法打开的视频计为 0
+        assert all(abs(r['duration_s'] - (0.0 if r['status'] == 'failed' else 6.0)) < 0.1 for r in parallel)
+        assert [r['name'] for r in parallel if r['status'] == 'failed'] == ['broken.mp4']
+        assert samples['motion_extractor_batch_videos{status="ok"}'] == 2
+        assert samples['motion_extractor_batch_videos{status="failed"}'] == 1
+    
+    print("  ✓ 多进程记录与顺序处理一致")
+    return True
+
+
+def test_unit_durations():
+    """命中运动索引缓存的视频和摄像头组记录的时长与视频时长一致"""
+    print("测试: 处理单元时长...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        os.makedirs(input_dir)
+        create_two_event_video(os.path.join(input_dir, 'a.mp4'), duration=6)
+        cache_dir = os.path.join(tmp, 'cache')
+        
+        for name in ('first', 'cached'):
+            _, records, _ = run_batch(tmp, input_dir, name, extract_clips=True, index_cache_dir=cache_dir)
+            assert len(records) == 1 and abs(records[0]['duration_s'] - 6.0) < 0.1, records
+        
+        group_dir = os.path.join(tmp, 'group')
+        os.makedirs(group_dir)
+        for camera in ('front', 'back'):
+            create_camera_video(os.path.join(group_dir, f'2024-05-01_12-30-00-{camera}.mp4'), (2, 8))
+        _, records, _ = run_batch(tmp, group_dir, 'group', camera_groups=True)
+        assert [r['unit'] for r in records] == ['camera_group']
+        assert abs(records[0]['duration_s'] - 24.0) < 0.1
+    
+    print("  ✓ 时长与视频一致")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_video_records_match_outputs(),
+        test_frames_decoded_across_modes(),
+        test_parallel_metrics(),
+        test_unit_durations(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+测试批量处理
+验证 --workers 模式汇总的结果与顺序处理一致，损坏的视频不会中断批次，
+工作进程崩溃只影响崩溃时正在处理的视频，工作进程中的警告转发到主进程，
+以及增量模式只处理新增或修改过的视频
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from create_test_video import create_test_video
+from main import BatchProcessor, _mark_started, _process_unit_worker
+
+
+def test_parallel_matches_sequential():
+    """并行处理与顺序处理提取的截图数一致"""
+    print("测试: 多进程批量处理...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        os.makedirs(input_dir)
+        for name in ('a.mp4', 'b.mp4'):
+            create_test_video(os.path.join(input_dir, name), duration=8, fps=15)
+        with open(os.path.join(input_dir, 'broken.mp4'), 'wb') as f:
+            f.write(b'not a video')
+        
+        sequential = BatchProcessor(output_dir=os.path.join(tmp, 'seq'), show_progress=False)
+        sequential.process_all(input_dir)
+        
+        parallel = BatchProcessor(output_dir=os.path.join(tmp, 'par'), workers=2)
+        parallel.process_all(input_dir)
+        
+        assert parallel.total_frames_extracted == sequential.total_frames_extracted > 0
+        assert len(parallel.results) == 3
+        failed = [r for r in parallel.results if r['error']]
+        assert [os.path.basename(r['video']) for r in failed] == ['broken.mp4']
+    
+    print("  ✓ 并行结果一致")
+    return True
+
+
+def crash_on_video(settings, unit, slot=None):
+    """处理 crash.mp4 时工作进程直接退出（模拟解码器崩溃），其余视频正常处理"""
+    if Path(unit).name == 'crash.mp4':
+        _mark_started(slot)
+        os._exit(1)
+    return _process_unit_worker(settings, unit, slot)
+
+
+def test_worker_crash_isolated():
+    """一个视频反复使工作进程崩溃时只有该视频失败，同一进程池中的其他视频正常完成"""
+    print("测试: 工作进程崩溃...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = Path(tmp) / 'input'
+        input_dir.mkdir()
+        for name in ('crash.mp4', 'd.mp4', 'e.mp4', 'f.mp4', 'g.mp4'):
+            create_test_video(str(input_dir / name), duration=4, fps=15)
+        
+        processor = BatchProcessor(output_dir=os.path.join(tmp, 'output'), workers=2, show_progress=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            processor._process_parallel(processor.find_video_files(str(input_dir)), worker=crash_on_video)
+        
+        errors = {Path(r['video']).name: r['error'] for r in processor.results}
+        assert len(processor.results) == len(errors) == 5
+        assert errors == {'crash.mp4': '工作进程崩溃', 'd.mp4': None, 'e.mp4': None,
+                          'f.mp4': None, 'g.mp4': None}, errors
+        assert all(r['frames'] > 0 for r in processor.results if not r['error'])
+    
+    print("  ✓ 只有崩溃的视频记为失败")
+    return True
+
+
+def test_worker_warnings_forwarded():
+    """工作进程中截图保存失败的警告出现在主进程的输出中"""
+    print("测试: 转发工作进程的警告...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        os.makedirs(input_dir)
+        for name in ('a.mp4', 'b.mp4'):
+            create_test_video(os.path.join(input_dir, name), duration=8, fps=15)
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            BatchProcessor(output_dir=os.path.join(tmp, 'seq'), show_progress=False).process_all(input_dir)
+        # 在第一张截图的位置放一个同名目录，工作进程写入该截图时失败
+        blocked = sorted((Path(tmp) / 'seq' / 'a').glob('*.jpg'))[0]
+        (Path(tmp) / 'par' / 'a' / blocked.name).mkdir(parents=True)
+        
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            BatchProcessor(output_dir=os.path.join(tmp, 'par'), workers=2, show_progress=False).process_all(input_dir)
+        assert f"警告: 无法保存 {Path(tmp) / 'par' / 'a' / blocked.name}" in log.getvalue(), log.getvalue()
+    
+    print("  ✓ 工作进程的警告已转发")
+    return True
+
+
+def test_incremental_skips_processed_videos():
+    """增量模式跳过已处理的视频，文件修改或设置变化后重新处理"""
+    print("测试: 增量批量处理...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        output_dir = os.path.join(tmp, 'output')
+        os.makedirs(input_dir)
+        create_test_video(os.path.join(input_dir, 'a.mp4'), duration=8, fps=15)
+        
+        first = BatchProcessor(output_dir=output_dir, incremental=True, show_progress=False)
+        first.process_all(input_dir)
+        assert len(first.results) == 1 and first.skipped_videos == 0
+        
+        # 新增一个视频，只处理新视频
+        create_test_video(os.path.join(input_dir, 'b.mp4'), duration=8, fps=15)
+        second = BatchProcessor(output_dir=output_dir, incremental=True, show_progress=False)
+        second.process_all(input_dir)
+        assert [os.path.basename(r['video']) for r in second.results] == ['b.mp4']
+        assert second.skipped_videos == 1
+        
+        # 修改已处理的视频后重新处理
+        video_a = os.path.join(input_dir, 'a.mp4')
+        stat = os.stat(video_a)
+        os.utime(video_a, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        third = BatchProcessor(output_dir=output_dir, incremental=True, show_progress=False)
+        third.process_all(input_dir)
+        assert [os.path.basename(r['video']) for r in third.results] == ['a.mp4']
+        
+        # 检测设置变化后全部重新处理
+        fourth = BatchProcessor(output_dir=output_dir, sensitivity=30, incremental=True,
+                                show_progress=False)
+        fourth.process_all(input_dir)
+        assert len(fourth.results) == 2
+    
+    print("  ✓ 增量处理正确")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_parallel_matches_sequential(),
+        test_worker_crash_isolated(),
+        test_worker_warnings_forwarded(),
+        test_incremental_skips_processed_videos(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
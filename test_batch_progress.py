@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+测试批量进度显示
+验证非终端输出时不显示进度、逐帧更新限频刷新、多视频合并为一个批量进度条，
+以及单个视频的进度条使用回调提供的总帧数补满到 100%
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from batch_progress import BatchProgress
+from main import BatchProcessor
+from test_single_pass_clips import count_frames, create_two_event_video
+
+
+class FakeTerminal(io.StringIO):
+    """模拟交互式终端的输出流"""
+    
+    def isatty(self):
+        return True
+
+
+def test_disabled_without_terminal():
+    """输出不是终端时不创建进度条，更新不产生任何输出"""
+    print("测试: 非终端输出...")
+    stream = io.StringIO()
+    for total_videos in (1, 3):
+        progress = BatchProgress(total_videos, file=stream)
+        assert not progress.enabled
+        progress.start_video('a.mp4')
+        for frame in range(100):
+            progress.update(frame, 100, frame / 10)
+        progress.end_video()
+        progress.advance(1, 5)
+        progress.close()
+        assert progress.bar is None
+    assert stream.getvalue() == ''
+    assert not BatchProgress(1, enabled=False, file=FakeTerminal()).enabled
+    
+    print("  ✓ 未显示进度")
+    return True
+
+
+def test_throttled_updates():
+    """刷新间隔内的逐帧更新不刷新显示，结束时补满到总帧数"""
+    print("测试: 限频刷新...")
+    stream = FakeTerminal()
+    progress = BatchProgress(1, interval=60, file=stream)
+    progress.start_video('a.mp4')
+    for frame in range(1, 1001):
+        progress.update(frame, 2000, frame / 30)
+    assert progress.bar.n == 1
+    written = len(stream.getvalue())
+    progress.update(1500, 2000, 50.0)
+    assert len(stream.getvalue()) == written
+    
+    progress.end_video()
+    assert progress.bar is None
+    assert '100%' in stream.getvalue() and '2000/2000' in stream.getvalue()
+    
+    print("  ✓ 1000 次更新只刷新一次")
+    return True
+
+
+def test_aggregated_view():
+    """多个视频合并为一个批量进度条，当前单元的进度按包含的视频数计入"""
+    print("测试: 合并的批量进度...")
+    stream = FakeTerminal()
+    progress = BatchProgress(4, interval=0, file=stream)
+    assert progress.aggregated and progress.bar is not None
+    
+    progress.start_video('run', videos=2)
+    progress.update(50, 100, 1.0)
+    assert progress.bar.n == 1.0
+    assert '当前=run' in stream.getvalue()
+    progress.end_video()
+    assert progress.bar is not None
+    progress.advance(2, screenshots=7)
+    assert progress.bar.n == 2 and progress.video_name is None
+    
+    progress.start_video('c.mp4')
+    progress.update(100, 100, 2.0)
+    assert progress.bar.n == 3
+    progress.advance(1, screenshots=9)
+    output = stream.getvalue()
+    assert '完成=3/4' in output and '截图=9' in output
+    progress.close()
+    
+    print("  ✓ 批量进度合并正确")
+    return True
+
+
+def test_single_video_reaches_total():
+    """处理单个视频时进度条使用处理器提供的总帧数，结束时显示 100%"""
+    print("测试: 单个视频的进度条...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = Path(tmp) / 'events.mp4'
+        create_two_event_video(str(video_path), duration=6)
+        total = count_frames(str(video_path))
+        
+        stream = FakeTerminal()
+        processor = BatchProcessor(os.path.join(tmp, 'output'), fps=5, index_cache_dir=None)
+        processor.progress = BatchProgress(1, interval=0, file=stream)
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert processor.process_single_video(video_path) > 0
+        assert processor.progress.bar is None
+        assert f'{total}/{total}' in stream.getvalue()
+    
+    print(f"  ✓ 进度条到达 {total}/{total}")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_disabled_without_terminal(),
+        test_throttled_updates(),
+        test_aggregated_view(),
+        test_single_video_reaches_total(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+测试特斯拉多摄像头分组
+验证文件名分组、运动时间线融合，分组模式按事件输出所有角度，
+以及 --workers 时每个摄像头组作为一个任务交给进程池，角度线程占用共享额度
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from camera_groups import group_camera_files, parse_tesla_filename
+from main import BatchProcessor
+
+
+def create_camera_video(output_path, motion=None, duration=12, fps=15):
+    """创建单个角度的测试视频，motion 为 (开始秒, 结束秒) 时在该时段内有移动方块"""
+    width, height = 320, 240
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    
+    for i in range(duration * fps):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        t = i / fps
+        if motion and motion[0] <= t < motion[1]:
+            x = int(10 + (t - motion[0]) * 50) % (width - 40)
+            cv2.rectangle(frame, (x, 100), (x + 40, 140), (0, 255, 0), -1)
+        out.write(frame)
+    
+    out.release()
+
+
+def test_group_camera_files():
+    """同一目录、同一分钟的各角度归为一组，其余按单个视频处理"""
+    print("测试: 摄像头文件分组...")
+    assert parse_tesla_filename('2024-05-01_12-30-00-left_repeater.mp4') == \
+        ('2024-05-01_12-30-00', 'left_repeater')
+    assert parse_tesla_filename('dashcam.mp4') is None
+    
+    files = [Path('a/2024-05-01_12-30-00-front.mp4'),
+             Path('a/2024-05-01_12-30-00-back.mp4'),
+             Path('a/2024-05-01_12-31-00-front.mp4'),
+             Path('b/2024-05-01_12-30-00-right_repeater.mp4'),
+             Path('a/other.mp4')]
+    groups, singles = group_camera_files(files)
+    
+    assert len(groups) == 1
+    assert list(groups[0].cameras) == ['front', 'back']
+    assert sorted(singles) == sorted(files[2:])
+    assert groups[0].output_name == Path('a/2024-05-01_12-30-00')
+    groups, _ = group_camera_files(files[:2], root=Path('a'))
+    assert groups[0].output_name == Path('2024-05-01_12-30-00')
+    
+    print("  ✓ 分组正确")
+    return True
+
+
+def test_fused_events_cover_all_cameras():
+    """单个角度的运动都不足最小时长，融合后形成一个事件并输出所有角度"""
+    print("测试: 多角度事件融合...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        output_dir = os.path.join(tmp, 'output')
+        os.makedirs(input_dir)
+        motion = {'front': None, 'back': (5, 9), 'left_repeater': (2, 6), 'right_repeater': None}
+        for camera, span in motion.items():
+            create_camera_video(os.path.join(input_dir, f'2024-05-01_12-30-00-{camera}.mp4'), span)
+        
+        processor = BatchProcessor(output_dir=output_dir, min_motion_duration=5.0,
+                                   clip_before=1.0, clip_after=1.0, extract_clips=True,
+                                   camera_groups=True, show_progress=False)
+        processor.process_all(input_dir)
+        
+        assert len(processor.results) == 4
+        assert not any(r['error'] for r in processor.results)
+        group_dir = Path(output_dir) / '2024-05-01_12-30-00'
+        screenshots = sorted(p.name for p in group_dir.glob('*.jpg'))
+        assert len(screenshots) == 4, screenshots
+        assert all(name.startswith('2024-05-01_12-30-00_event01_') for name in screenshots)
+        assert len(list((group_dir / 'clips').glob('*.mp4'))) == 4
+        
+        # 不分组时每个角度单独判断，运动时长都不足
+        separate = BatchProcessor(output_dir=os.path.join(tmp, 'separate'), min_motion_duration=5.0,
+                                  extract_clips=True, show_progress=False)
+        separate.process_all(input_dir)
+        assert sum(r['clips'] for r in separate.results) == 0
+    
+    print("  ✓ 融合事件输出所有角度")
+    return True
+
+
+def test_groups_in_worker_pool():
+    """多进程处理时摄像头组在工作进程中处理，结果与顺序处理一致"""
+    print("测试: 进程池处理摄像头组...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        os.makedirs(input_dir)
+        for minute in ('30', '31'):
+            create_camera_video(os.path.join(input_dir, f'2024-05-01_12-{minute}-00-front.mp4'), (2, 8))
+            create_camera_video(os.path.join(input_dir, f'2024-05-01_12-{minute}-00-back.mp4'))
+        
+        def run(name, workers):
+            processor = BatchProcessor(output_dir=os.path.join(tmp, name), min_motion_duration=3.0,
+                                       clip_before=1.0, clip_after=1.0, extract_clips=True,
+                                       camera_groups=True, workers=workers, show_progress=False)
+            log = io.StringIO()
+            with contextlib.redirect_stdout(log):
+                processor.process_all(input_dir)
+            results = sorted((Path(r['video']).name, r['frames'], r['clips'], r['error'])
+                             for r in processor.results)
+            return results, log.getvalue()
+        
+        sequential, _ = run('seq', 1)
+        parallel, log = run('par', 2)
+        assert "并行处理: 2 个工作进程" in log
+        assert parallel == sequential and len(parallel) == 4
+        assert all(clips == 1 and error is None for _, _, clips, error in parallel), parallel
+    
+    print("  ✓ 摄像头组在进程池中处理")
+    return True
+
+
+def test_same_timestamp_in_two_folders():
+    """不同目录下同一时间的摄像头组输出到各自的子目录，互不覆盖"""
+    print("测试: 不同目录下同一时间的摄像头组...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = Path(tmp) / 'TeslaCam'
+        for folder in ('SavedClips', 'SentryClips'):
+            (input_dir / folder).mkdir(parents=True)
+            create_camera_video(str(input_dir / folder / '2024-05-01_12-30-00-front.mp4'), (2, 8))
+            create_camera_video(str(input_dir / folder / '2024-05-01_12-30-00-back.mp4'))
+        
+        output_dir = Path(tmp) / 'output'
+        processor = BatchProcessor(output_dir=str(output_dir), min_motion_duration=3.0, extract_clips=True,
+                                   clip_before=1.0, clip_after=1.0, camera_groups=True, show_progress=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            processor.process_all(str(input_dir))
+        
+        counts = {r['video']: (r['frames'], r['clips']) for r in processor.results}
+        for folder in ('SavedClips', 'SentryClips'):
+            group_dir = output_dir / folder / '2024-05-01_12-30-00'
+            screenshots = sorted(group_dir.glob('*.jpg'))
+            clips = sorted((group_dir / 'clips').glob('*.mp4'))
+            expected = [counts[str(input_dir / folder / f'2024-05-01_12-30-00-{camera}.mp4')]
+                        for camera in ('front', 'back')]
+            assert len(screenshots) == sum(frames for frames, _ in expected) > 0
+            assert len(clips) == sum(c for _, c in expected) == 2
+    
+    print("  ✓ 各目录的输出互不覆盖")
+    return True
+
+
+class CountingSlots(threading.BoundedSemaphore):
+    """记录成功取得额度次数的共享额度"""
+    
+    def __init__(self, value):
+        super().__init__(value)
+        self.acquired = 0
+    
+    def acquire(self, *args, **kwargs):
+        acquired = super().acquire(*args, **kwargs)
+        self.acquired += acquired
+        return acquired
+
+
+def test_group_threads_share_slots():
+    """角度线程占用共享额度，额度为零时由当前线程依次处理，结果不变"""
+    print("测试: 角度线程占用共享额度...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        os.makedirs(input_dir)
+        for camera in ('front', 'back', 'side'):
+            create_camera_video(os.path.join(input_dir, f'2024-05-01_12-30-00-{camera}.mp4'), (2, 8))
+        
+        def run(name, clip_slots):
+            processor = BatchProcessor(output_dir=os.path.join(tmp, name), min_motion_duration=3.0,
+                                       clip_before=1.0, clip_after=1.0, extract_clips=True,
+                                       camera_groups=True, clip_slots=clip_slots, show_progress=False)
+            with contextlib.redirect_stdout(io.StringIO()):
+                processor.process_all(input_dir)
+            return sorted((Path(r['video']).name, r['frames'], r['clips'], r['error'])
+                          for r in processor.results)
+        
+        limited = run('limited', CountingSlots(0))
+        slots = CountingSlots(2)
+        assert run('shared', slots) == limited and len(limited) == 3
+        # 额外的角度线程开始前取得额度（调用线程已取完任务时额外线程不再取额度）
+        assert slots.acquired > 0
+        assert all(clips == 1 and error is None for _, _, clips, error in limited), limited
+    
+    print("  ✓ 角度线程受共享额度限制")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_group_camera_files(),
+        test_fused_events_cover_all_cameras(),
+        test_groups_in_worker_pool(),
+        test_group_threads_share_slots(),
+        test_same_timestamp_in_two_folders(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+测试检测区域掩码
+验证忽略区域内的变化不产生运动、ROI 裁剪后轮廓坐标正确，以及按摄像头选择掩码
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+from detection_mask import DetectionMask, load_mask_config, select_mask
+from test_motion_detector import detect_boxes, make_frames
+from video_processor import MotionDetector
+
+
+def test_ignored_region_has_no_motion():
+    """忽略区域内闪烁的时间戳水印既不产生运动，也不影响预筛选"""
+    print("测试: 忽略区域...")
+    width, height = 640, 480
+    mask = DetectionMask(ignore=[[[0.0, 0.0], [1.0, 0.0], [1.0, 0.1], [0.0, 0.1]]])
+    detector = MotionDetector(mask=mask)
+    unmasked = MotionDetector()
+    for i in range(6):
+        frame = np.full((height, width, 3), 40, dtype=np.uint8)
+        cv2.putText(frame, f"12:30:0{i}", (10, 35), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        has_motion, _, regions = detector.detect_motion(frame)
+        assert not has_motion and not regions
+        unmasked.detect_motion(frame)
+    
+    assert detector.stats['prefilter_rejected'] == 5, detector.stats
+    assert unmasked.stats['motion'] > 0, unmasked.stats
+    
+    print("  ✓ 忽略区域无运动")
+    return True
+
+
+def test_roi_crop_geometry():
+    """只处理 ROI 的外接矩形，轮廓映射回原始坐标；ROI 之外的物体被排除"""
+    print("测试: ROI 裁剪...")
+    frames = make_frames(box=(300, 250, 80, 60))
+    _, full_boxes = detect_boxes(MotionDetector(), frames)
+    assert len(full_boxes) == 1
+    
+    roi = DetectionMask(roi=[[[0.3, 0.4], [0.8, 0.4], [0.8, 0.9], [0.3, 0.9]]])
+    for scale in (1.0, 0.5):
+        detector = MotionDetector(detection_scale=scale, mask=roi)
+        has_motion, boxes = detect_boxes(detector, frames)
+        assert has_motion and len(boxes) == 1, (scale, boxes)
+        assert all(abs(a - b) <= 4 / scale for a, b in zip(boxes[0], full_boxes[0])), (boxes, full_boxes)
+        assert detector.config()['mask'] == roi.to_config()
+    
+    outside = make_frames(box=(20, 20, 80, 60))
+    has_motion, _ = detect_boxes(MotionDetector(mask=roi), outside)
+    assert not has_motion
+    
+    print("  ✓ ROI 裁剪正确")
+    return True
+
+
+def test_per_camera_config():
+    """按文件名中的摄像头名称选择掩码，未配置的摄像头使用 default"""
+    print("测试: 按摄像头选择掩码...")
+    config = {
+        'default': {'ignore': [[[0, 0], [1, 0], [1, 0.1]]]},
+        'front': {'roi': [[[0, 0.2], [1, 0.2], [1, 0.8], [0, 0.8]]]},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'masks.json')
+        with open(path, 'w') as f:
+            json.dump(config, f)
+        masks = load_mask_config(path)
+        
+        assert select_mask(masks, '2024-05-01_12-30-00-front.mp4').roi
+        assert select_mask(masks, '2024-05-01_12-30-00-back.mp4') is masks['default']
+        assert select_mask({}, 'video.mp4') is None
+        
+        with open(path, 'w') as f:
+            json.dump({'front': {'roi': [[[0, 0], [2, 0], [1, 1]]]}}, f)
+        try:
+            load_mask_config(path)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("超出 [0, 1] 的坐标应抛出 ValueError")
+    
+    print("  ✓ 掩码选择正确")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_ignored_region_has_no_motion(),
+        test_roi_crop_geometry(),
+        test_per_camera_config(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+测试运动事件切分
+验证向量化的 segment_motion_events 与逐帧状态机 MotionEventTracker 结果一致
+"""
+
+import sys
+
+import numpy as np
+
+from motion_index import MotionIndex
+from video_clip_extractor import MotionEventTracker, segment_motion_events
+
+
+def make_index(has_motion, motion_area=None, fps=2, video_fps=30):
+    """用逐采样帧的运动标志构造运动索引"""
+    index = MotionIndex(video_fps, len(has_motion) * video_fps // fps)
+    index.has_motion = np.asarray(has_motion, dtype=bool)
+    index.timestamps = np.arange(len(has_motion)) / fps
+    index.frame_indices = np.arange(len(has_motion)) * (video_fps // fps)
+    if motion_area is None:
+        motion_area = index.has_motion * 1000.0
+    index.motion_area = np.asarray(motion_area, dtype=np.float32)
+    index.box_offsets = np.zeros(len(has_motion) + 1, dtype=np.int64)
+    return index
+
+
+def track_events(index, min_motion_duration, gap_tolerance, trigger_area):
+    """逐帧输入状态机得到的事件"""
+    tracker = MotionEventTracker(min_motion_duration, index.video_fps, gap_tolerance, trigger_area)
+    events = []
+    for i in range(len(index)):
+        event = tracker.update(bool(index.has_motion[i]), float(index.timestamps[i]),
+                               int(index.frame_indices[i]), float(index.motion_area[i]))
+        if event:
+            events.append(event)
+    event = tracker.finish()
+    if event:
+        events.append(event)
+    return events
+
+
+def test_matches_tracker():
+    """随机时间线上两种实现的事件完全一致"""
+    print("测试: 向量化切分与状态机一致...")
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        length = int(rng.integers(0, 120))
+        has_motion = rng.random(length) < rng.uniform(0.2, 0.9)
+        motion_area = has_motion * rng.uniform(300, 5000, length)
+        index = make_index(has_motion, motion_area)
+        for params in ((1.0, 0.0, 0.0), (2.0, 1.0, 0.0), (1.5, 2.5, 3000.0)):
+            expected = track_events(index, *params)
+            assert segment_motion_events(index, *params) == expected, params
+    
+    print("  ✓ 结果一致")
+    return True
+
+
+def test_gap_tolerance_and_trigger():
+    """短暂中断被合并，面积不足的运动不触发事件"""
+    print("测试: 中断容差和触发面积...")
+    # 0-2秒运动，2.5秒中断，3-5秒运动
+    pattern = [1] * 5 + [0] + [1] * 5 + [0] * 4
+    index = make_index(pattern)
+    
+    assert len(segment_motion_events(index, 2.0)) == 2
+    merged = segment_motion_events(index, 2.0, gap_tolerance=0.5)
+    assert len(merged) == 1 and merged[0].start_time == 0.0 and merged[0].end_time == 5.0
+    
+    weak = make_index(pattern, motion_area=np.array(pattern) * 400.0)
+    assert segment_motion_events(weak, 1.0, trigger_area=1000) == []
+    
+    print("  ✓ 参数生效")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_matches_tracker(),
+        test_gap_tolerance_and_trigger(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+测试采样解码路径
+验证 grab()/retrieve() 采样与逐帧 read() 得到的帧完全一致
+"""
+
+import os
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+from video_processor import VideoProcessor, sample_frames, threaded_sample_frames
+
+
+def create_sample_video(output_path, duration=4, fps=30):
+    """创建一个带移动方块的测试视频"""
+    width, height = 320, 240
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    
+    for i in range(duration * fps):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        if fps <= i < 3 * fps:
+            x = 20 + (i - fps) * 3
+            cv2.rectangle(frame, (x, 80), (x + 40, 140), (0, 255, 0), -1)
+        out.write(frame)
+    
+    out.release()
+
+
+def test_sample_frames_matches_read():
+    """采样帧与逐帧读取的结果一致"""
+    print("测试: sample_frames 与 cap.read() 一致...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'sample.mp4')
+        create_sample_video(video_path)
+        
+        cap = cv2.VideoCapture(video_path)
+        expected = []
+        index = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index % 15 == 0:
+                expected.append((index, frame))
+            index += 1
+        cap.release()
+        
+        cap = cv2.VideoCapture(video_path)
+        sampled = list(sample_frames(cap, 15))
+        cap.release()
+        
+        assert [i for i, _ in sampled] == [i for i, _ in expected]
+        for (_, a), (_, b) in zip(sampled, expected):
+            assert np.array_equal(a, b)
+    
+    print("  ✓ 采样帧一致")
+    return True
+
+
+def test_seek_keyframes_indices():
+    """关键帧跳转模式返回相同的采样帧号"""
+    print("测试: 关键帧跳转采样...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'sample.mp4')
+        create_sample_video(video_path)
+        
+        cap = cv2.VideoCapture(video_path)
+        indices = [i for i, _ in sample_frames(cap, 30, seek_keyframes=True)]
+        cap.release()
+        
+        assert indices == [0, 30, 60, 90], indices
+    
+    print("  ✓ 跳转采样帧号正确")
+    return True
+
+
+def test_threaded_sample_frames():
+    """解码线程产出的帧与同步采样一致，提前关闭和解码异常不会挂起"""
+    print("测试: 解码线程采样...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'sample.mp4')
+        create_sample_video(video_path)
+        
+        cap = cv2.VideoCapture(video_path)
+        expected = list(sample_frames(cap, 15))
+        cap.release()
+        
+        cap = cv2.VideoCapture(video_path)
+        threaded = list(threaded_sample_frames(cap, 15, queue_size=2))
+        cap.release()
+        
+        assert [i for i, _ in threaded] == [i for i, _ in expected]
+        for (_, a), (_, b) in zip(threaded, expected):
+            assert np.array_equal(a, b)
+        
+        # 消费者提前结束时解码线程退出
+        cap = cv2.VideoCapture(video_path)
+        frames = threaded_sample_frames(cap, 1, queue_size=1)
+        next(frames)
+        frames.close()
+        cap.release()
+        
+        # 解码线程中的异常在消费者线程中抛出
+        class BrokenCapture:
+            def grab(self):
+                raise RuntimeError("decode failed")
+        
+        try:
+            list(threaded_sample_frames(BrokenCapture(), 1))
+            assert False, "未抛出解码异常"
+        except RuntimeError as e:
+            assert str(e) == "decode failed"
+        
+        # 使用解码线程的检测结果与同步路径一致
+        plain = VideoProcessor(sensitivity=25, min_interval=0.5, fps=4).process_video(video_path)
+        piped = VideoProcessor(sensitivity=25, min_interval=0.5, fps=4,
+                               threaded_decode=True).process_video(video_path)
+        assert [t for _, t in piped] == [t for _, t in plain]
+    
+    print("  ✓ 解码线程采样一致")
+    return True
+
+
+def test_process_video_detects_motion():
+    """采样路径下仍能检测到运动"""
+    print("测试: VideoProcessor 采样检测...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'sample.mp4')
+        create_sample_video(video_path)
+        
+        for seek in (False, True):
+            processor = VideoProcessor(sensitivity=25, min_interval=0.5, fps=4,
+                                       seek_keyframes=seek)
+            frames = processor.process_video(video_path)
+            assert frames, f"seek_keyframes={seek} 时未检测到运动"
+            assert all(1.0 <= t <= 3.0 for _, t in frames)
+    
+    print("  ✓ 运动检测正常")
+    return True
+
+
+def test_iter_motion_frames_streams():
+    """截图在检测到时立即产出，而不是在视频结束后一次性返回"""
+    print("测试: 流式截图...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'sample.mp4')
+        create_sample_video(video_path)
+        
+        processed = []
+        processor = VideoProcessor(sensitivity=25, min_interval=0.5, fps=4)
+        frames = processor.iter_motion_frames(
+            video_path, callback=lambda *args: processed.append(args[3]))
+        
+        frame, timestamp = next(frames)
+        assert processed and processed[-1] < 90, processed
+        remaining = list(frames)
+        assert processed[-1] >= 90
+        
+        expected = processor.process_video(video_path)
+        assert [timestamp] + [t for _, t in remaining] == [t for _, t in expected]
+    
+    print("  ✓ 截图按需产出")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_sample_frames_matches_read(),
+        test_seek_keyframes_indices(),
+        test_threaded_sample_frames(),
+        test_process_video_detects_motion(),
+        test_iter_motion_frames_streams(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
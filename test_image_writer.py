@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+测试异步截图写入器
+验证后台写入的数量、格式以及失败报告
+"""
+
+import os
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+from image_writer import AsyncImageWriter
+
+
+def test_async_writer_formats():
+    """后台写入 jpg/png/webp 截图，内容可被正确读回"""
+    print("测试: 异步写入截图...")
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    cv2.rectangle(frame, (40, 30), (120, 90), (0, 255, 0), -1)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f'frame_{i}.{ext}')
+                 for i, ext in enumerate(['jpg', 'png', 'webp'] * 4)]
+        with AsyncImageWriter(workers=2, max_pending=1, quality=90) as writer:
+            for path in paths:
+                writer.submit(frame.copy(), path)
+        
+        assert writer.written == len(paths) and not writer.failures
+        for path in paths:
+            image = cv2.imread(path)
+            assert image is not None and image.shape == frame.shape, path
+    
+    print("  ✓ 写入数量和格式正确")
+    return True
+
+
+def test_async_writer_reports_failures():
+    """无法写入的截图记录在失败列表中，不影响其他截图"""
+    print("测试: 写入失败报告...")
+    frame = np.zeros((32, 32, 3), dtype=np.uint8)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = AsyncImageWriter()
+        writer.submit(frame, os.path.join(tmp, 'ok.jpg'))
+        writer.submit(frame, os.path.join(tmp, 'missing', 'bad.jpg'))
+        written, failures = writer.close()
+        
+        assert written == 1
+        assert len(failures) == 1 and failures[0][0].endswith('bad.jpg')
+    
+    print("  ✓ 失败报告正确")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_async_writer_formats(),
+        test_async_writer_reports_failures(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
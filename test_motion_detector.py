@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+测试 MotionDetector 的检测选项
+使用合成帧验证检测结果和轮廓坐标
+"""
+
+import sys
+
+import cv2
+import numpy as np
+
+from detection_backends import DETECTION_BACKENDS
+from video_processor import MotionDetector
+
+
+def make_frames(width=640, height=480, box=(200, 150, 80, 120)):
+    """生成一对静止背景帧，第二帧带一个矩形物体"""
+    background = np.full((height, width, 3), 40, dtype=np.uint8)
+    moved = background.copy()
+    x, y, w, h = box
+    cv2.rectangle(moved, (x, y), (x + w, y + h), (220, 220, 220), -1)
+    return background, moved
+
+
+def detect_boxes(detector, frames):
+    """依次检测多帧，返回最后一帧的检测结果和外接矩形"""
+    result = None
+    for frame in frames:
+        result = detector.detect_motion(frame)
+    has_motion, _, regions = result
+    return has_motion, [tuple(box) for box in regions.boxes.tolist()]
+
+
+def test_downscaled_detection_geometry():
+    """缩小分辨率检测时，外接矩形映射回原始坐标"""
+    print("测试: 缩放检测的轮廓坐标...")
+    frames = make_frames()
+
+    has_full, full_boxes = detect_boxes(MotionDetector(), frames)
+    assert has_full and len(full_boxes) == 1
+
+    fx, fy, fw, fh = full_boxes[0]
+    for scale in (0.5, 0.25):
+        has_motion, boxes = detect_boxes(MotionDetector(detection_scale=scale), frames)
+        assert has_motion, f"scale={scale} 未检测到运动"
+        assert len(boxes) == 1
+        x, y, w, h = boxes[0]
+        tolerance = 4 / scale
+        assert abs(x - fx) <= tolerance and abs(y - fy) <= tolerance, (scale, boxes, full_boxes)
+        assert abs(w - fw) <= 2 * tolerance and abs(h - fh) <= 2 * tolerance, (scale, boxes, full_boxes)
+
+    print("  ✓ 轮廓坐标一致")
+    return True
+
+
+def test_downscaled_min_area():
+    """最小面积按缩放比例换算，小物体在缩放后仍被过滤"""
+    print("测试: 缩放检测的最小面积...")
+    frames = make_frames(box=(300, 200, 4, 4))
+    for scale in (1.0, 0.5):
+        detector = MotionDetector(min_area=5000, detection_scale=scale)
+        has_motion, _ = detect_boxes(detector, frames)
+        assert not has_motion, f"scale={scale} 小物体未被过滤"
+
+    print("  ✓ 最小面积过滤正确")
+    return True
+
+
+def test_prefilter_skips_static_frames():
+    """静止帧在预筛选阶段被排除，有运动的帧仍进入完整检测"""
+    print("测试: 缩略图预筛选...")
+    background, moved = make_frames()
+    detector = MotionDetector()
+    for frame in (background, background, background, moved):
+        has_motion, _, _ = detector.detect_motion(frame)
+    assert has_motion
+    assert detector.stats == {'frames': 4, 'prefilter_rejected': 2, 'contour_rejected': 0, 'motion': 1}, \
+        detector.stats
+
+    detector.reset()
+    assert detector.stats['frames'] == 0
+
+    print("  ✓ 静止帧被预筛选排除")
+    return True
+
+
+def test_prefilter_matches_full_detection():
+    """启用预筛选不改变检测结果"""
+    print("测试: 预筛选结果一致性...")
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(60):
+        x = 100 + 6 * i if 20 <= i < 40 else 100
+        frame = np.full((240, 320, 3), 40, dtype=np.uint8)
+        cv2.rectangle(frame, (x % 280, 100), (x % 280 + 30, 130), (200, 200, 200), -1)
+        noise = rng.integers(0, 6, frame.shape, dtype=np.uint8)
+        frames.append(cv2.add(frame, noise))
+
+    results = []
+    for prefilter in (True, False):
+        detector = MotionDetector(min_area=100, prefilter=prefilter)
+        results.append([detector.detect_motion(frame)[0] for frame in frames])
+    assert results[0] == results[1]
+    assert sum(results[0]) > 0
+
+    print("  ✓ 结果一致")
+    return True
+
+
+def test_detection_backends():
+    """各检测后端都能检测到出现的物体，静止帧无运动；后端在首次检测时才创建"""
+    print("测试: 检测后端...")
+    background, moved = make_frames()
+    for backend in DETECTION_BACKENDS:
+        detector = MotionDetector(backend=backend, prefilter=False)
+        assert detector.backend is None
+        flags = [detector.detect_motion(frame)[0] for frame in [background] * 5 + [moved]]
+        assert flags == [False] * 5 + [True], (backend, flags)
+        assert detector.config()['backend'] == backend
+
+        detector.reset()
+        assert detector.backend is None
+
+    try:
+        MotionDetector(backend='unknown')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知后端应抛出 ValueError")
+
+    print("  ✓ 所有后端检测正确")
+    return True
+
+
+def test_reused_buffers_match():
+    """复用缓冲区与逐帧分配的检测结果完全一致，合并后的形态学核与多次迭代等价"""
+    print("测试: 复用工作缓冲区...")
+    rng = np.random.default_rng(1)
+    frames = []
+    for i in range(12):
+        frame = np.full((240, 320, 3), 40, dtype=np.uint8)
+        cv2.rectangle(frame, (20 + 15 * i, 80), (60 + 15 * i, 140), (220, 220, 220), -1)
+        frames.append(cv2.add(frame, rng.integers(0, 30, frame.shape, dtype=np.uint8)))
+
+    for scale in (1.0, 0.3):
+        reused = MotionDetector(detection_scale=scale, prefilter=False)
+        fresh = MotionDetector(detection_scale=scale, prefilter=False, reuse_buffers=False)
+        for frame in frames:
+            a, b = reused.detect_motion(frame), fresh.detect_motion(frame)
+            assert a[0] == b[0] and np.array_equal(a[1], b[1])
+            assert np.array_equal(a[2].boxes, b[2].boxes) and np.array_equal(a[2].areas, b[2].areas)
+        buffers = dict(reused._buffers)
+        reused.detect_motion(frames[0])
+        assert all(reused._buffers[name] is array for name, array in buffers.items())
+
+    mask = (rng.random((60, 80)) > 0.97).astype(np.uint8) * 255
+    for size, iterations in ((5, 3), (2, 3), (7, 2)):
+        kernel, anchor = MotionDetector._iterated_kernel(size, iterations)
+        expected = cv2.dilate(mask, np.ones((size, size), np.uint8), iterations=iterations)
+        assert np.array_equal(cv2.dilate(mask, kernel, anchor=anchor), expected), (size, iterations)
+
+    print("  ✓ 结果一致，缓冲区被复用")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_downscaled_detection_geometry(),
+        test_downscaled_min_area(),
+        test_prefilter_skips_static_frames(),
+        test_prefilter_matches_full_detection(),
+        test_detection_backends(),
+        test_reused_buffers_match(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+测试运动索引缓存
+验证命中缓存时的截图和事件与完整检测一致，文件或参数变化时缓存失效，
+缓存文件损坏时视为未命中
+"""
+
+import os
+import sys
+import tempfile
+
+from motion_index import MotionIndexCache
+from test_single_pass_clips import create_two_event_video
+from video_clip_extractor import VideoClipExtractor
+from video_processor import VideoProcessor
+
+
+def test_screenshots_from_cache():
+    """命中缓存时截图时间点与完整检测一致"""
+    print("测试: 缓存截图...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'events.mp4')
+        create_two_event_video(video_path)
+        cache = MotionIndexCache(os.path.join(tmp, 'cache'))
+        
+        processor = VideoProcessor(min_interval=1.0, fps=2, index_cache=cache)
+        first = processor.process_video(video_path)
+        assert cache.load(video_path, processor.index_params()) is not None
+        
+        second = processor.process_video(video_path)
+        assert [t for _, t in first] == [t for _, t in second]
+        assert all(a.shape == b.shape for (a, _), (b, _) in zip(first, second))
+        
+        # 截图间隔不影响检测结果，直接复用缓存
+        sparse = VideoProcessor(min_interval=3.0, fps=2, index_cache=cache).process_video(video_path)
+        assert 0 < len(sparse) < len(first)
+    
+    print("  ✓ 缓存截图一致")
+    return True
+
+
+def test_events_from_cache():
+    """命中缓存时事件与完整检测一致，修改事件参数无需重新解码"""
+    print("测试: 缓存事件...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'events.mp4')
+        create_two_event_video(video_path)
+        cache = MotionIndexCache(os.path.join(tmp, 'cache'))
+        
+        extractor = VideoClipExtractor(min_motion_duration=3.0, index_cache=cache)
+        events = extractor.detect_motion_events(video_path, fps=2)
+        cached = extractor.detect_motion_events(video_path, fps=2)
+        assert [(e.start_time, e.end_time) for e in events] == [(e.start_time, e.end_time) for e in cached]
+        
+        index = cache.load(video_path, extractor.index_params(2))
+        longer = VideoClipExtractor(min_motion_duration=10.0, index_cache=cache)
+        assert longer.events_from_index(index) == []
+    
+    print("  ✓ 缓存事件一致")
+    return True
+
+
+def test_cache_invalidation():
+    """视频文件或检测参数变化时缓存失效"""
+    print("测试: 缓存失效...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'events.mp4')
+        create_two_event_video(video_path)
+        cache = MotionIndexCache(os.path.join(tmp, 'cache'))
+        
+        processor = VideoProcessor(fps=2, index_cache=cache)
+        processor.process_video(video_path)
+        params = processor.index_params()
+        assert cache.load(video_path, params) is not None
+        
+        other = VideoProcessor(sensitivity=40, fps=2).index_params()
+        assert cache.load(video_path, other) is None
+        
+        stat = os.stat(video_path)
+        os.utime(video_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert cache.load(video_path, params) is None
+    
+    print("  ✓ 缓存失效正确")
+    return True
+
+
+def test_corrupt_cache_file():
+    """缓存文件被截断或损坏时视为未命中，重新检测后覆盖"""
+    print("测试: 损坏的缓存文件...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'events.mp4')
+        create_two_event_video(video_path)
+        cache = MotionIndexCache(os.path.join(tmp, 'cache'))
+        
+        processor = VideoProcessor(fps=2, index_cache=cache)
+        expected = [t for _, t in processor.process_video(video_path)]
+        params = processor.index_params()
+        path = cache._path(video_path, params)
+        data = path.read_bytes()
+        
+        for corrupt in (data[:len(data) // 2], data[:100], b'not a zip file'):
+            path.write_bytes(corrupt)
+            assert cache.load(video_path, params) is None
+            assert [t for _, t in processor.process_video(video_path)] == expected
+            assert cache.load(video_path, params) is not None
+    
+    print("  ✓ 损坏的缓存重新生成")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_screenshots_from_cache(),
+        test_events_from_cache(),
+        test_cache_invalidation(),
+        test_corrupt_cache_file(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
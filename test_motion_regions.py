@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+测试运动区域
+验证矢量化计算的外接矩形、面积和标注框与逐个轮廓计算的结果一致
+"""
+
+import sys
+
+import cv2
+import numpy as np
+
+from motion_index import MotionIndex
+from motion_regions import MotionRegions, draw_motion_boxes, pad_boxes
+
+
+def make_blob_mask(count=300, seed=0):
+    """生成包含大量大小不一的斑块的二值掩码"""
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((360, 640), dtype=np.uint8)
+    for _ in range(count):
+        center = (int(rng.integers(0, 640)), int(rng.integers(0, 360)))
+        axes = (int(rng.integers(1, 25)), int(rng.integers(1, 25)))
+        cv2.ellipse(mask, center, axes, float(rng.integers(0, 180)), 0, 360, 255, -1)
+    return mask
+
+
+def test_regions_match_contours():
+    """from_contours 的外接矩形和面积与 boundingRect / contourArea 逐个计算的结果相同"""
+    print("测试: 矢量化轮廓统计...")
+    mask = make_blob_mask()
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    assert len(contours) > 50
+    
+    offset = np.array([100, 40], dtype=np.int32)
+    for scale in (1.0, 0.5, 0.3):
+        for min_area in (0, 300):
+            regions = MotionRegions.from_contours(contours, min_area, scale, offset)
+            kept = [c for c in contours if cv2.contourArea(c) > min_area]
+            if scale < 1:
+                kept = [(c / scale).astype(np.int32) for c in kept]
+            expected_boxes = [tuple(np.add(cv2.boundingRect(c), [*offset, 0, 0])) for c in kept]
+            assert [tuple(box) for box in regions.boxes.tolist()] == expected_boxes, (scale, min_area)
+            assert np.allclose(regions.areas, [cv2.contourArea(c) for c in kept])
+    
+    assert len(MotionRegions.from_contours((), 0)) == 0
+    assert len(MotionRegions.from_contours(contours, 1e9)) == 0
+    
+    print(f"  ✓ {len(contours)} 个轮廓的统计结果一致")
+    return True
+
+
+def test_draw_motion_boxes():
+    """批量绘制的标注框与逐个扩大边距后调用 cv2.rectangle 的结果相同，并能存入运动索引"""
+    print("测试: 批量绘制标注框...")
+    mask = make_blob_mask(seed=1)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    regions = MotionRegions.from_contours(contours, 50)
+    frame = np.full((360, 640, 3), 40, dtype=np.uint8)
+    
+    expected = frame.copy()
+    for x, y, w, h in regions.boxes.tolist():
+        padding = max(15, int(min(w, h) * 0.15))
+        x, y = max(0, x - padding), max(0, y - padding)
+        w, h = min(640 - x, w + 2 * padding), min(360 - y, h + 2 * padding)
+        cv2.rectangle(expected, (x, y), (x + w, y + h), (0, 255, 0), 3)
+    
+    assert np.array_equal(draw_motion_boxes(frame.copy(), regions.boxes), expected)
+    assert np.array_equal(draw_motion_boxes(frame.copy(), MotionRegions().boxes), frame)
+    assert (pad_boxes(regions.boxes, frame.shape)[:, :2] >= 0).all()
+    
+    index = MotionIndex(30.0, 60)
+    index.add(0, 0.0, False, MotionRegions())
+    index.add(10, 1 / 3, True, regions)
+    assert len(index.regions(0)) == 0
+    assert np.array_equal(index.regions(1).boxes, regions.boxes)
+    assert np.isclose(index.motion_area[1], regions.total_area)
+    
+    print(f"  ✓ {len(regions)} 个标注框绘制一致")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_regions_match_contours(),
+        test_draw_motion_boxes(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
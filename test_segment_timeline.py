@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+测试跨文件连续时间线
+验证跨越分段边界的运动事件在连续模式下被完整检测和提取
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from main import BatchProcessor
+from segment_timeline import SegmentTimeline, find_continuous_runs
+from test_single_pass_clips import count_frames
+from video_clip_extractor import VideoClipExtractor, find_ffmpeg
+
+
+def make_extractor():
+    return VideoClipExtractor(sensitivity=25, min_motion_duration=4.0, clip_before=1.0, clip_after=1.0)
+
+
+def create_segments(input_dir, fps=15, duration=6, motion=(4, 9)):
+    """创建三个连续分段，motion 为时间线上有移动方块的时段（默认跨越第一个文件边界）"""
+    width, height = 320, 240
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    paths = []
+    for n in range(3):
+        path = os.path.join(input_dir, f'2024-05-01_12-3{n}-00-front.mp4')
+        out = cv2.VideoWriter(path, fourcc, fps, (width, height))
+        for i in range(duration * fps):
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+            t = n * duration + i / fps
+            if motion[0] <= t < motion[1]:
+                x = int(10 + (t - motion[0]) * 50) % (width - 40)
+                cv2.rectangle(frame, (x, 100), (x + 40, 140), (0, 255, 0), -1)
+            out.write(frame)
+        out.release()
+        paths.append(Path(path))
+    return paths
+
+
+def test_find_continuous_runs():
+    """同一摄像头、时间戳相邻的分段组成连续时间线"""
+    print("测试: 查找连续分段...")
+    files = [Path('a/2024-05-01_12-30-00-front.mp4'),
+             Path('a/2024-05-01_12-31-01-front.mp4'),
+             Path('a/2024-05-01_12-35-00-front.mp4'),
+             Path('a/2024-05-01_12-31-01-back.mp4'),
+             Path('a/other.mp4')]
+    runs, singles = find_continuous_runs(files)
+    
+    assert runs == [files[:2]], runs
+    assert sorted(singles) == sorted(files[2:])
+    
+    print("  ✓ 连续分段正确")
+    return True
+
+
+def test_event_spans_segments():
+    """跨越文件边界的事件在连续时间线上被完整检测，片段包含两个文件的内容"""
+    print("测试: 跨文件事件...")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = create_segments(tmp)
+        timeline = SegmentTimeline(paths)
+        assert abs(timeline.duration - 18) < 0.1
+        
+        extractor = make_extractor()
+        events = extractor.events_from_index(extractor.build_timeline_index(timeline, fps=2))
+        assert len(events) == 1, events
+        assert events[0].start_time < 6 < events[0].end_time, events
+        
+        # 单独处理每个文件时，边界两侧的运动都不足最小时长
+        for path in paths:
+            assert not make_extractor().detect_motion_events(str(path), fps=2)
+        
+        window = extractor.clip_windows(events, timeline.duration)[0]
+        clip_path = os.path.join(tmp, 'clip.mp4')
+        assert extractor.extract_timeline_clip(timeline, window, clip_path)
+        expected = (events[0].end_time - events[0].start_time + 2) * 15
+        assert abs(count_frames(clip_path) - expected) <= 2, (count_frames(clip_path), expected)
+        
+        if find_ffmpeg() is not None:
+            extractor.fast_clips = True
+            remux_path = os.path.join(tmp, 'remux.mp4')
+            assert extractor.remux_timeline_clip(timeline, window, remux_path)
+            assert count_frames(remux_path) >= expected - 2
+    
+    print("  ✓ 跨文件事件完整")
+    return True
+
+
+def test_batch_continuous_mode():
+    """批量处理的连续模式为每个文件记录结果，片段计入事件开始的文件"""
+    print("测试: 批量连续模式...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        os.makedirs(input_dir)
+        create_segments(input_dir)
+        
+        processor = BatchProcessor(output_dir=os.path.join(tmp, 'output'), min_motion_duration=4.0,
+                                   clip_before=1.0, clip_after=1.0, extract_clips=True,
+                                   continuous=True, show_progress=False)
+        processor.process_all(input_dir)
+        
+        assert len(processor.results) == 3
+        assert not any(r['error'] for r in processor.results)
+        assert [r['clips'] for r in processor.results] == [1, 0, 0]
+        assert processor.total_frames_extracted > 0
+    
+    print("  ✓ 连续模式结果正确")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_find_continuous_runs(),
+        test_event_spans_segments(),
+        test_batch_continuous_mode(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+测试单遍片段提取
+验证单遍处理生成的片段与逐事件重新解码的结果在范围上一致
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+
+import cv2
+import numpy as np
+
+from stage_profiler import StageProfiler
+from video_clip_extractor import MotionEvent, VideoClipExtractor, find_ffmpeg, merge_clip_windows, run_with_slots
+
+
+def create_two_event_video(output_path, duration=20, fps=30):
+    """创建包含两段连续运动（4-9秒、13-18秒）的测试视频"""
+    width, height = 320, 240
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    
+    for i in range(duration * fps):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        t = i / fps
+        if 4 <= t < 9 or 13 <= t < 18:
+            x = int(10 + (t % 5) * 50)
+            cv2.circle(frame, (x, 120), 25, (0, 255, 0), -1)
+        out.write(frame)
+    
+    out.release()
+
+
+def create_motion_video(output_path, spans, duration=20, fps=30, size=25, color=(0, 255, 0)):
+    """创建在 spans 中各时段 [(开始秒, 结束秒), ...] 有移动圆形的测试视频，size 可以是随时间变化的函数"""
+    width, height = 320, 240
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    
+    for i in range(duration * fps):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        t = i / fps
+        if any(start <= t < end for start, end in spans):
+            radius = size(t) if callable(size) else size
+            cv2.circle(frame, (int(10 + (t % 5) * 50), 120), radius, color, -1)
+        out.write(frame)
+    
+    out.release()
+
+
+def count_frames(video_path):
+    """统计视频帧数"""
+    cap = cv2.VideoCapture(video_path)
+    count = 0
+    while cap.grab():
+        count += 1
+    cap.release()
+    return count
+
+
+def make_extractor(**kwargs):
+    options = dict(sensitivity=25, min_motion_duration=3.0, clip_before=1.0, clip_after=1.0)
+    options.update(kwargs)
+    return VideoClipExtractor(**options)
+
+
+def test_single_pass_matches_per_event_extraction():
+    """单遍片段与逐事件提取的片段帧数一致"""
+    print("测试: 单遍片段提取...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'events.mp4')
+        create_two_event_video(video_path)
+        
+        legacy = make_extractor()
+        events = legacy.detect_motion_events(video_path, fps=2)
+        assert len(events) == 2, events
+        legacy_counts = []
+        for i, event in enumerate(events):
+            clip_path = os.path.join(tmp, f'legacy_{i}.mp4')
+            assert legacy.extract_clip(video_path, event, clip_path)
+            legacy_counts.append(count_frames(clip_path))
+        
+        samples = []
+        clips = make_extractor().process_video(
+            video_path, os.path.join(tmp, 'clips'), fps=2,
+            frame_callback=lambda *args: samples.append(args[1]))
+        
+        assert len(clips) == 2, clips
+        assert len(samples) == 40
+        single_counts = [count_frames(c) for c in clips]
+        for single, expected in zip(single_counts, legacy_counts):
+            # 单遍模式在运动停止后的下一个采样帧才确定结束，允许一个采样间隔的差异
+            assert abs(single - expected) <= 15, (single_counts, legacy_counts)
+    
+    print("  ✓ 片段范围一致")
+    return True
+
+
+def test_preroll_decoded_from_source():
+    """预录部分从源视频重新解码，与逐事件提取的片段逐帧相同"""
+    print("测试: 预录部分重新解码...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'events.mp4')
+        create_two_event_video(video_path)
+        
+        assert len(assert_matches_windows(video_path, tmp)) == 2
+    
+    print("  ✓ 预录部分与源视频一致")
+    return True
+
+
+def test_idle_frames_not_retrieved():
+    """空闲部分只 grab() 不 retrieve()：只有采样帧和正在写入片段的帧取出图像"""
+    print("测试: 空闲帧不取出图像...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'idle.mp4')
+        create_motion_video(video_path, [(4, 9)])
+        
+        profiler = StageProfiler()
+        clips = make_extractor(profiler=profiler).process_video(
+            video_path, os.path.join(tmp, 'clips'), fps=2, draw_contours=False)
+        assert len(clips) == 1
+        stages = profiler.to_dict()
+        total, clip_frames = count_frames(video_path), count_frames(clips[0])
+        # 主循环 grab() 每一帧，预录部分从第二个句柄重新解码
+        assert stages['decode']['count'] == total
+        assert 0 < stages['redecode']['count'] <= clip_frames
+        assert 0 < stages['retrieve']['count'] <= 40 + clip_frames < total
+        
+        assert len(assert_matches_windows(video_path, tmp)) == 1
+    
+    print(f"  ✓ {stages['retrieve']['count']}/{total} 帧取出图像")
+    return True
+
+
+def assert_matches_windows(video_path, tmp, **kwargs):
+    """单遍处理的片段（不绘制运动框）与按两遍处理的片段范围提取的结果逐帧相同"""
+    single = make_extractor(**kwargs)
+    clips = single.process_video(video_path, os.path.join(tmp, 'single'), fps=2, draw_contours=False)
+    two_pass = make_extractor(**kwargs)
+    windows = two_pass.clip_windows(two_pass.detect_motion_events(video_path, fps=2))
+    assert single.last_events == two_pass.detect_motion_events(video_path, fps=2)
+    assert len(clips) == len(windows) > 0, (clips, windows)
+    
+    for i, (clip, window) in enumerate(zip(clips, windows)):
+        expected_path = os.path.join(tmp, f'window_{i}.mp4')
+        assert two_pass.extract_window(video_path, window, expected_path, draw_contours=False)
+        frames, expected = read_frames(clip), read_frames(expected_path)
+        assert len(frames) == len(expected), (i, len(frames), len(expected))
+        assert all(np.array_equal(a, b) for a, b in zip(frames, expected))
+    return clips
+
+
+def test_gap_tolerance_clip_end():
+    """运动中断容差大于 clip_after 时片段不超出事件结束后 clip_after 秒，中断后恢复的运动补写中间的帧"""
+    print("测试: 运动中断时的片段结尾...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'gaps.mp4')
+        # 4-5.5 秒的中断在容差内，属于同一事件；7.5 秒之后的中断超过容差
+        create_motion_video(video_path, [(2, 4), (5.5, 7.5), (12, 15)])
+        clips = assert_matches_windows(video_path, tmp, min_motion_duration=1.0, clip_before=0.5,
+                                       clip_after=0.5, gap_tolerance=2.5)
+        assert len(clips) == 2
+    
+    print("  ✓ 片段结尾与事件范围一致")
+    return True
+
+
+def test_backfilled_motion_merges():
+    """自适应采样补充采样把运动开始提前到上一个片段结束之前时，单遍处理同样合并为一个片段"""
+    print("测试: 补充采样后的片段合并...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'backfill.mp4')
+        # 10.4 秒开始的运动在之后的基础采样帧才被发现，补充采样后提前到上一个片段关闭之前
+        create_motion_video(video_path, [(1.0, 5.1), (6.1, 7.0), (10.4, 14.8), (18.3, 21.0)], duration=25)
+        clips = assert_matches_windows(video_path, tmp, min_motion_duration=3.0, clip_before=0.5,
+                                       clip_after=3.0, gap_tolerance=1.0, adaptive_fps=10)
+        assert len(clips) == 1
+    
+    print("  ✓ 补充采样后合并为一个片段")
+    return True
+
+
+def has_motion_box(frame):
+    """帧中是否绘制了绿色运动框（测试视频中的运动物体为白色）"""
+    return bool(((frame[:, :, 1] > 200) & (frame[:, :, 0] < 80) & (frame[:, :, 2] < 80)).any())
+
+
+def test_late_trigger_preroll():
+    """运动开始很久之后才达到触发面积时，片段仍从运动开始前 clip_before 秒开始并带有运动框"""
+    print("测试: 延迟触发的预录...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'late.mp4')
+        # 2 秒开始的小物体只维持事件，10 秒变大后才达到触发面积
+        create_motion_video(video_path, [(2, 14)], size=lambda t: 45 if t >= 10 else 15, color=(255, 255, 255))
+        options = dict(min_motion_duration=1.0, clip_before=1.0, clip_after=1.0, trigger_area=6000)
+        clips = assert_matches_windows(video_path, tmp, **options)
+        assert len(clips) == 1 and count_frames(clips[0]) == 14 * 30 + 1
+        
+        annotated = make_extractor(**options).process_video(video_path, os.path.join(tmp, 'annotated'), fps=2)
+        frames = read_frames(annotated[0])
+        # 片段从 1 秒开始：运动开始前没有运动框，2 秒之后（远早于触发时刻）已有运动框
+        assert not has_motion_box(frames[15]) and has_motion_box(frames[45])
+    
+    print("  ✓ 预录完整")
+    return True
+
+
+def test_overlapping_windows_merged():
+    """前后范围重叠的事件合并为一个片段，超过最大长度时不合并且不重复输出"""
+    print("测试: 合并重叠片段...")
+    events = [MotionEvent(4.0, 8.5, 4.5, 120, 255), MotionEvent(13.0, 17.5, 4.5, 390, 525)]
+    merged = merge_clip_windows(events, 5.0, 5.0)
+    assert len(merged) == 1 and (merged[0].start_time, merged[0].end_time) == (0.0, 22.5)
+    assert merge_clip_windows(events, 2.0, 2.0)[0].end_time == 10.5
+    limited = merge_clip_windows(events, 5.0, 5.0, max_clip_length=15.0)
+    assert [(w.start_time, w.end_time) for w in limited] == [(0.0, 13.5), (13.5, 22.5)]
+    assert [w.continues for w in limited] == [False, True]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'events.mp4')
+        create_two_event_video(video_path)
+        
+        for before_after in (5.0, 2.0):
+            # 前后5秒时范围重叠，前后2秒时范围恰好相邻（2-11秒、11-20秒）
+            extractor = make_extractor(clip_before=before_after, clip_after=before_after)
+            clips = extractor.process_video(video_path, os.path.join(tmp, f'single_{before_after}'), fps=2)
+            assert len(clips) == 1, clips
+            # 合并后的片段中每帧只写一次
+            start = int(max(0, 4 - before_after) * 30)
+            assert count_frames(clips[0]) == count_frames(video_path) - start, count_frames(clips[0])
+        
+        extractor = make_extractor(clip_before=5.0, clip_after=5.0)
+        
+        windows = extractor.clip_windows(extractor.detect_motion_events(video_path, fps=2))
+        assert len(windows) == 1 and len(windows[0].events) == 2
+        
+        # 在最大长度处拆分的片段紧接上一个片段，边界帧只写入上一个片段
+        clips = assert_matches_windows(video_path, tmp, clip_before=5.0, clip_after=5.0, max_clip_length=15.0)
+        assert len(clips) == 2
+        assert sum(count_frames(c) for c in clips) == count_frames(video_path)
+    
+    print("  ✓ 重叠片段已合并")
+    return True
+
+
+def test_fast_clips_stream_copy():
+    """快速片段模式通过码流复制生成片段，覆盖事件前后范围"""
+    print("测试: 快速片段模式...")
+    if find_ffmpeg() is None:
+        print("  - 未找到 ffmpeg，跳过")
+        return True
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'events.mp4')
+        create_two_event_video(video_path)
+        
+        samples = []
+        clips = make_extractor(fast_clips=True).process_video(
+            video_path, os.path.join(tmp, 'fast'), fps=2,
+            frame_callback=lambda *args: samples.append(args[1]))
+        
+        assert len(clips) == 2, clips
+        assert len(samples) == 40
+        for clip in clips:
+            # 起点对齐到关键帧，片段至少覆盖 事件(5秒) + 前后各1秒
+            assert count_frames(clip) >= 7 * 30 - 1, clip
+    
+    print("  ✓ 快速片段生成正确")
+    return True
+
+
+def read_frames(video_path):
+    """读取视频的全部帧"""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def test_parallel_clip_extraction():
+    """并行提取的片段与顺序提取逐帧相同，额外线程受共享额度限制"""
+    print("测试: 并行提取片段...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'events.mp4')
+        create_two_event_video(video_path)
+        
+        extractor = make_extractor(clip_workers=2)
+        windows = extractor.clip_windows(extractor.detect_motion_events(video_path, fps=2))
+        assert len(windows) == 2
+        paths = [os.path.join(tmp, f'parallel_{i}.mp4') for i in range(len(windows))]
+        jobs = [partial(extractor.extract_window, video_path, w, p) for w, p in zip(windows, paths)]
+        assert extractor.run_clip_jobs(jobs) == [True, True]
+        
+        for i, (window, path) in enumerate(zip(windows, paths)):
+            expected_path = os.path.join(tmp, f'sequential_{i}.mp4')
+            assert make_extractor().extract_window(video_path, window, expected_path)
+            parallel_frames, expected_frames = read_frames(path), read_frames(expected_path)
+            assert len(parallel_frames) == len(expected_frames) > 0
+            assert all(np.array_equal(a, b) for a, b in zip(parallel_frames, expected_frames))
+    
+    def peak_concurrency(clip_slots):
+        lock = threading.Lock()
+        running = peak = 0
+        
+        def job():
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            return True
+        
+        extractor = make_extractor(clip_workers=4, clip_slots=clip_slots)
+        assert extractor.run_clip_jobs([job] * 8) == [True] * 8
+        return peak
+    
+    assert peak_concurrency(threading.BoundedSemaphore(0)) == 1
+    assert peak_concurrency(threading.BoundedSemaphore(1)) == 2
+    assert peak_concurrency(None) == 4
+    
+    # 嵌套调用（摄像头组的角度线程内再提取片段）时总并发仍不超过调用线程 + 额度
+    lock = threading.Lock()
+    running = peak = 0
+    
+    def inner_job():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        return True
+    
+    clip_slots = threading.BoundedSemaphore(1)
+    outer = [partial(run_with_slots, [inner_job] * 4, 4, clip_slots) for _ in range(3)]
+    assert run_with_slots(outer, 3, clip_slots) == [[True] * 4] * 3
+    assert peak == 2
+    
+    def failing():
+        raise RuntimeError("编码失败")
+    try:
+        make_extractor(clip_workers=2).run_clip_jobs([failing, lambda: True])
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("提取线程中的异常应传给调用方")
+    
+    print("  ✓ 并行提取结果一致，并发受额度限制")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_single_pass_matches_per_event_extraction(),
+        test_preroll_decoded_from_source(),
+        test_idle_frames_not_retrieved(),
+        test_gap_tolerance_clip_end(),
+        test_backfilled_motion_merges(),
+        test_late_trigger_preroll(),
+        test_overlapping_windows_merged(),
+        test_fast_clips_stream_copy(),
+        test_parallel_clip_extraction(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+测试分阶段性能计时
+验证计时器的累计、合并和禁用行为，以及各处理流程记录的阶段次数和写入字节数
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from image_writer import AsyncImageWriter
+from main import BatchProcessor
+from stage_profiler import STAGE_ORDER, StageProfiler
+from test_single_pass_clips import count_frames, create_two_event_video, make_extractor
+from video_processor import VideoProcessor
+
+
+def test_profiler_counters():
+    """启用时累计耗时、次数和字节数并可合并；禁用时不记录任何数据"""
+    print("测试: 计时器累计与合并...")
+    disabled = StageProfiler(enabled=False)
+    frames = [1, 2, 3]
+    assert disabled.timed('decode', frames) is frames
+    disabled.lap('gray', disabled.start())
+    with disabled.stage('blur'):
+        pass
+    assert disabled.to_dict() == {}
+    
+    profiler = StageProfiler()
+    assert list(profiler.timed('decode', frames)) == frames
+    started = profiler.lap('gray', profiler.start())
+    profiler.lap('write', started, nbytes=100)
+    profiler.add('custom', 0.5, count=2)
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        f.write(b'x' * 10)
+    try:
+        profiler.lap_file('write', profiler.start(), f.name)
+    finally:
+        os.unlink(f.name)
+    profiler.lap_file('remux', profiler.start(), f.name)
+    
+    stages = profiler.to_dict()
+    assert stages['decode']['count'] == 3
+    assert stages['write']['count'] == 2 and stages['write']['bytes'] == 110
+    assert stages['remux']['bytes'] == 0
+    assert stages['custom'] == {'seconds': 0.5, 'count': 2, 'bytes': 0}
+    
+    total = StageProfiler()
+    total.merge(profiler)
+    total.merge(profiler.to_dict())
+    assert total.to_dict()['custom']['count'] == 4
+    
+    # 报告按处理流程排列，未知阶段排在最后
+    lines = total.format_report("报告", wall_time=1.0).splitlines()
+    names = [line.split()[0] for line in lines[2:-1]]
+    assert names == [n for n in STAGE_ORDER if n in stages] + ['custom']
+    
+    profiler.reset()
+    assert profiler.to_dict() == {}
+    print("  ✓ 累计、合并和禁用行为正确")
+    return True
+
+
+def test_profiled_screenshots():
+    """截图流程记录解码、检测各阶段、标注、编码和写盘，且不影响输出结果"""
+    print("测试: 截图流程的阶段计时...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'events.mp4')
+        create_two_event_video(video_path)
+        
+        profiler = StageProfiler()
+        processor = VideoProcessor(fps=5, profiler=profiler)
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = [t for _, t in VideoProcessor(fps=5).iter_motion_frames(video_path)]
+            screenshots = list(processor.iter_motion_frames(video_path))
+        assert [t for _, t in screenshots] == expected and expected
+        
+        stages = profiler.to_dict()
+        frames = processor.motion_detector.stats['frames']
+        assert stages['decode']['count'] == frames
+        assert stages['gray']['count'] == frames
+        assert stages['prefilter']['count'] == frames
+        assert stages['contours']['count'] == stages['morphology']['count'] > 0
+        assert stages['annotate']['count'] == len(screenshots)
+        
+        paths = [os.path.join(tmp, f'shot_{i}.jpg') for i in range(len(screenshots))]
+        with AsyncImageWriter(profiler=profiler) as writer:
+            for (frame, _), path in zip(screenshots, paths):
+                writer.submit(frame, path)
+        assert writer.written == len(paths)
+        stages = profiler.to_dict()
+        assert stages['image_encode']['count'] == len(paths)
+        assert stages['write']['bytes'] == sum(os.path.getsize(p) for p in paths)
+    
+    print(f"  ✓ {frames} 个采样帧, {len(screenshots)} 张截图的阶段计数正确")
+    return True
+
+
+def test_profiled_clips():
+    """单遍片段提取记录每个写出帧的编码次数和片段文件大小"""
+    print("测试: 片段提取的阶段计时...")
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'events.mp4')
+        create_two_event_video(video_path)
+        
+        profiler = StageProfiler()
+        extractor = make_extractor(profiler=profiler)
+        with contextlib.redirect_stdout(io.StringIO()):
+            clips = extractor.process_video(video_path, os.path.join(tmp, 'clips'), fps=5)
+        assert len(clips) == 2
+        
+        stages = profiler.to_dict()
+        # 主循环读取每一帧；预录部分从源视频重新解码，重新解码的帧不超过片段的总帧数
+        clip_frames = sum(count_frames(c) for c in clips)
+        assert stages['decode']['count'] == count_frames(video_path)
+        assert 0 < stages['redecode']['count'] <= clip_frames
+        assert stages['encode']['count'] == clip_frames
+        assert stages['write']['count'] == len(clips)
+        assert stages['write']['bytes'] == sum(os.path.getsize(c) for c in clips)
+    
+    print(f"  ✓ {len(clips)} 个片段的编码次数和写入字节数正确")
+    return True
+
+
+def test_batch_profile_report():
+    """批量处理启用 profile 时打印每个视频和整个批次的耗时表"""
+    print("测试: 批量处理的耗时报告...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = Path(tmp) / 'input'
+        input_dir.mkdir()
+        for name in ('a.mp4', 'b.mp4'):
+            create_two_event_video(str(input_dir / name), duration=6)
+        
+        processor = BatchProcessor(str(Path(tmp) / 'output'), fps=5, show_progress=False,
+                                   index_cache_dir=None, profile=True)
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            processor.process_all(str(input_dir))
+        
+        output = log.getvalue()
+        assert "阶段耗时: a.mp4" in output and "阶段耗时: b.mp4" in output
+        assert "阶段耗时: 整个批次" in output
+        stages = processor.batch_profiler.to_dict()
+        assert stages['decode']['count'] == 2 * processor.last_unit['stages']['decode']['count']
+        assert stages['write']['count'] == processor.total_frames_extracted > 0
+        assert processor.profiler.to_dict() == {}
+    
+    print("  ✓ 每个视频和整个批次的耗时表均已打印")
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = [
+        test_profiler_counters(),
+        test_profiled_screenshots(),
+        test_profiled_clips(),
+        test_batch_profile_report(),
+    ]
+    print(f"\n通过: {sum(results)}/{len(results)}")
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,12 +3,26 @@
 独立模块，用于检测连续运动并提取视频片段
 """
 
+import contextlib
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
 import cv2
 import numpy as np
 from pathlib import Path
-from typing import List, Tuple, Optional
+from collections import deque
+from typing import Callable, List, Tuple, Optional, Iterator
 from dataclasses import dataclass
-from video_processor import MotionDetector
+from functools import partial
+from video_processor import AdaptiveSampler, MotionDetector, open_frame_source, selective_frames
+from motion_index import MotionIndex, MotionIndexCache
+from motion_regions import MotionRegions, draw_motion_boxes
+from detection_mask import DetectionMask
+from segment_timeline import SegmentTimeline
+from stage_profiler import StageProfiler
 
 
 @dataclass
@@ -24,6 +38,372 @@ class MotionEvent:
         return f"MotionEvent({self.start_time:.1f}s-{self.end_time:.1f}s, {self.duration:.1f}s)"
 
 
+@dataclass
+class ClipWindow:
+    """待提取的片段范围，可以包含多个运动事件"""
+    start_time: float           # 片段开始时间（秒）
+    end_time: float             # 片段结束时间（秒）
+    events: List[MotionEvent]   # 片段包含的运动事件
+    continues: bool = False     # 在 max_clip_length 处从上一个片段拆分，开始时刻的帧已写入上一个片段
+    
+    @property
+    def duration(self) -> float:
+        """片段时长（秒）"""
+        return self.end_time - self.start_time
+    
+    def __repr__(self):
+        return f"ClipWindow({self.start_time:.1f}s-{self.end_time:.1f}s, {len(self.events)} 个事件)"
+
+
+def merge_clip_windows(events: List[MotionEvent],
+                       clip_before: float,
+                       clip_after: float,
+                       max_clip_length: float = 0.0,
+                       duration: Optional[float] = None) -> List[ClipWindow]:
+    """
+    把运动事件扩展为片段范围，并合并重叠或相邻的范围
+    
+    两个事件的前后扩展范围重叠时只输出一个片段，共享的帧只解码和编码一次。
+    合并后的片段超过 max_clip_length 时不再合并，下一个片段紧接上一个片段结束处开始
+    （标记为 continues，结束时刻的帧只写入上一个片段）；
+    单个事件本身超过 max_clip_length 时不拆分。
+    
+    Args:
+        events: 运动事件列表
+        clip_before: 事件前提取的时长（秒）
+        clip_after: 事件后提取的时长（秒）
+        max_clip_length: 合并后片段的最大时长（秒），0 表示不限制
+        duration: 视频总时长（秒），用于截断片段结束时间，None 表示不截断
+    
+    Returns:
+        按时间排序的片段范围列表
+    """
+    windows = []
+    for event in sorted(events, key=lambda e: e.start_time):
+        start_time = max(0.0, event.start_time - clip_before)
+        end_time = event.end_time + clip_after
+        if duration is not None:
+            end_time = min(end_time, duration)
+        
+        if windows and start_time <= windows[-1].end_time:
+            last = windows[-1]
+            merged_end = max(last.end_time, end_time)
+            if not max_clip_length or merged_end - last.start_time <= max_clip_length:
+                last.end_time = merged_end
+                last.events.append(event)
+                continue
+            # 超过最大长度时不合并，但不重复输出上一个片段已包含的部分
+            windows.append(ClipWindow(last.end_time, end_time, [event], continues=True))
+            continue
+        
+        windows.append(ClipWindow(start_time, end_time, [event]))
+    
+    return windows
+
+
+class MotionEventTracker:
+    """连续运动事件状态机
+    
+    逐个输入采样帧的检测结果，在运动停止（或视频结束）时产出持续时间
+    达到阈值的 MotionEvent。供单遍处理等需要在线判断事件的流程使用，
+    已有完整时间线时使用结果相同的 segment_motion_events。
+    """
+    
+    def __init__(self,
+                 min_motion_duration: float,
+                 video_fps: float,
+                 gap_tolerance: float = 0.0,
+                 trigger_area: float = 0.0):
+        """
+        初始化状态机
+        
+        Args:
+            min_motion_duration: 最小连续运动时长（秒）
+            video_fps: 视频原始帧率
+            gap_tolerance: 运动中断不超过该时长（秒）时视为同一事件
+            trigger_area: 事件中至少有一个采样帧的运动面积达到该值才记录事件
+        """
+        self.min_motion_duration = min_motion_duration
+        self.video_fps = video_fps
+        self.gap_tolerance = gap_tolerance
+        self.trigger_area = trigger_area
+        self.reset()
+    
+    def reset(self):
+        """清空当前运动状态"""
+        self.current_motion_start = None
+        self.current_motion_start_frame = None
+        self.last_motion_time = None
+        self.triggered = False
+    
+    @property
+    def confirmed(self) -> bool:
+        """当前连续运动是否已达到最小时长和触发面积"""
+        return (self.current_motion_start is not None and self.triggered and
+                self.last_motion_time - self.current_motion_start >= self.min_motion_duration)
+    
+    def update(self,
+               has_motion: bool,
+               current_time: float,
+               frame_count: int,
+               motion_area: float = 0.0) -> Optional[MotionEvent]:
+        """
+        输入一个采样帧的检测结果
+        
+        Args:
+            has_motion: 是否检测到运动
+            current_time: 当前时间（秒）
+            frame_count: 当前帧号
+            motion_area: 运动区域总面积
+        
+        Returns:
+            运动停止且满足时长要求时返回完成的事件，否则返回 None
+        """
+        if has_motion:
+            # 如果是新的运动事件
+            if self.current_motion_start is None:
+                self.current_motion_start = current_time
+                self.current_motion_start_frame = frame_count
+            
+            self.last_motion_time = current_time
+            if motion_area >= self.trigger_area:
+                self.triggered = True
+            return None
+        
+        # 短暂中断仍属于当前事件
+        if (self.current_motion_start is not None and
+                current_time - self.last_motion_time <= self.gap_tolerance):
+            return None
+        
+        # 如果之前有运动，现在停止了
+        return self.finish()
+    
+    def finish(self) -> Optional[MotionEvent]:
+        """
+        结束当前连续运动（运动停止或视频结束时调用）
+        
+        Returns:
+            满足时长要求的事件，否则返回 None
+        """
+        event = None
+        if self.current_motion_start is not None and self.last_motion_time is not None:
+            duration = self.last_motion_time - self.current_motion_start
+            
+            # 如果持续时间超过阈值，记录事件
+            if duration >= self.min_motion_duration and self.triggered:
+                event = MotionEvent(
+                    start_time=self.current_motion_start,
+                    end_time=self.last_motion_time,
+                    duration=duration,
+                    start_frame=self.current_motion_start_frame,
+                    end_frame=int(self.last_motion_time * self.video_fps)
+                )
+        
+        # 重置状态
+        self.reset()
+        return event
+
+
+def segment_motion_events(index: MotionIndex,
+                          min_motion_duration: float,
+                          gap_tolerance: float = 0.0,
+                          trigger_area: float = 0.0) -> List[MotionEvent]:
+    """
+    从运动时间线向量化地切分运动事件
+    
+    结果与逐帧输入 MotionEventTracker 相同：相邻运动采样之间的无运动采样都在
+    gap_tolerance 秒以内时属于同一事件；事件中至少一个采样的运动面积达到 trigger_area
+    才被记录（滞回：较大的运动触发事件，较小的运动维持事件）。只做数组运算，
+    可以在缓存的时间线上反复调整参数而无需重新解码。
+    
+    Args:
+        index: 运动索引
+        min_motion_duration: 最小连续运动时长（秒）
+        gap_tolerance: 运动中断不超过该时长（秒）时视为同一事件
+        trigger_area: 触发事件所需的最小运动面积
+    
+    Returns:
+        运动事件列表
+    """
+    # len() 同时会把逐帧追加的结果合并进数组
+    if len(index) == 0:
+        return []
+    
+    timestamps = np.asarray(index.timestamps)
+    motion = np.flatnonzero(index.has_motion)
+    if len(motion) == 0:
+        return []
+    
+    # 相邻运动采样之间有无运动采样，且最后一个无运动采样距上次运动超过容差时断开
+    separated = motion[1:] != motion[:-1] + 1
+    gap = timestamps[np.maximum(motion[1:] - 1, 0)] - timestamps[motion[:-1]]
+    breaks = separated & (gap > gap_tolerance)
+    
+    starts = motion[np.concatenate(([True], breaks))]
+    ends = motion[np.concatenate((breaks, [True]))]
+    
+    run_ids = np.cumsum(np.concatenate(([0], breaks)))
+    triggered = np.bincount(run_ids, weights=index.motion_area[motion] >= trigger_area,
+                            minlength=len(starts)) > 0
+    durations = timestamps[ends] - timestamps[starts]
+    keep = triggered & (durations >= min_motion_duration)
+    
+    return [
+        MotionEvent(
+            start_time=float(timestamps[start]),
+            end_time=float(timestamps[end]),
+            duration=float(timestamps[end] - timestamps[start]),
+            start_frame=int(index.frame_indices[start]),
+            end_frame=int(timestamps[end] * index.video_fps)
+        )
+        for start, end in zip(starts[keep], ends[keep])
+    ]
+
+
+def find_ffmpeg() -> Optional[str]:
+    """查找 ffmpeg 可执行文件，快速片段模式依赖它进行码流复制"""
+    return shutil.which('ffmpeg')
+
+
+def run_with_slots(jobs: List[Callable], workers: int, slots=None) -> list:
+    """
+    在最多 workers 个线程中执行一组任务，额外线程受共享额度限制
+    
+    调用线程始终参与执行；其余线程每次开始执行前需从 slots 取得一个额度，
+    额度被其他视频占满时这些线程等待，剩余的任务由调用线程依次执行，
+    整个批次同时运行的解码/编码任务不会超过共享额度的上限。
+    任务内部再次调用本函数时同样只占用自身线程，额外线程另取额度。
+    
+    Args:
+        jobs: 无参数的任务函数
+        workers: 最大线程数（包括调用线程）
+        slots: 共享额度（信号量），None 时不限制
+    
+    Returns:
+        与 jobs 顺序对应的任务返回值
+    """
+    results = [None] * len(jobs)
+    pending = queue.Queue()
+    for item in enumerate(jobs):
+        pending.put(item)
+    errors = []
+    
+    def drain():
+        # 任一任务出错后不再开始新的任务
+        while not errors:
+            try:
+                i, job = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[i] = job()
+            except BaseException as e:
+                errors.append(e)
+                return
+    
+    def borrow():
+        # 取得额度后才开始执行；等待期间任务已被取完时直接退出
+        while not pending.empty() and not errors:
+            if slots is None:
+                drain()
+                return
+            if slots.acquire(timeout=0.1):
+                try:
+                    drain()
+                finally:
+                    slots.release()
+                return
+    
+    helpers = [threading.Thread(target=borrow, daemon=True)
+               for _ in range(min(workers, len(jobs)) - 1)]
+    for helper in helpers:
+        helper.start()
+    drain()
+    for helper in helpers:
+        helper.join()
+    
+    if errors:
+        raise errors[0]
+    return results
+
+
+class _PrerollBuffer:
+    """预录记录，只保存最近若干帧内各采样帧的帧号和检测区域
+    
+    不保存帧数据：片段打开时预录部分从源视频重新定位解码，每个事件只解码一次，
+    没有运动时不产生任何逐帧的额外开销。非采样帧沿用之前最近一个采样帧的检测区域。
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.samples = deque()
+    
+    def append(self, frame_index: int, regions: MotionRegions, keep_from: Optional[int] = None):
+        """
+        记录一个采样帧的检测区域，丢弃不再需要的旧采样
+        
+        Args:
+            frame_index: 采样帧号
+            regions: 标注使用的检测区域
+            keep_from: 仍可能补写的最早帧号（进行中的运动或片段需要），早于容量范围时保留到该帧
+        """
+        self.samples.append((frame_index, regions))
+        # 保留覆盖最早一帧的采样，其余超出范围的采样丢弃
+        oldest = frame_index - self.capacity
+        if keep_from is not None:
+            oldest = min(oldest, keep_from)
+        while len(self.samples) > 1 and self.samples[1][0] <= oldest:
+            self.samples.popleft()
+    
+    def covers(self, frame_index: int) -> bool:
+        """是否仍记录着 frame_index 及之后所有帧的检测区域"""
+        return bool(self.samples) and self.samples[0][0] <= frame_index
+    
+    def regions_between(self, start_frame: int, end_frame: int) -> Iterator[Tuple[int, MotionRegions]]:
+        """按顺序返回 [start_frame, end_frame) 中每一帧标注使用的检测区域"""
+        samples = iter(self.samples)
+        current, pending = MotionRegions(), next(samples, None)
+        for frame_index in range(start_frame, end_frame):
+            while pending is not None and pending[0] <= frame_index:
+                current = pending[1]
+                pending = next(samples, None)
+            yield frame_index, current
+
+
+class _ClipWriter:
+    """单个视频片段的写入状态"""
+    
+    def __init__(self, output_path: str, video_fps: float, size: Tuple[int, int], start_frame: int,
+                 profiler: StageProfiler):
+        self.output_path = output_path
+        self.profiler = profiler
+        self.start_frame = start_frame
+        self.end_frame = None  # 运动结束后才能确定
+        self.next_frame = start_frame  # 下一个待写入的帧号
+        self.written_frames = 0
+        self.closed = False
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        self.writer = cv2.VideoWriter(output_path, fourcc, video_fps, size)
+    
+    def is_opened(self) -> bool:
+        return self.writer.isOpened()
+    
+    def write(self, frame: np.ndarray, frame_index: int):
+        started = self.profiler.start()
+        self.writer.write(frame)
+        self.profiler.lap('encode', started)
+        self.written_frames += 1
+        self.next_frame = frame_index + 1
+    
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        started = self.profiler.start()
+        self.writer.release()
+        self.profiler.lap_file('write', started, self.output_path)
+
+
 class VideoClipExtractor:
     """视频片段提取器
     
@@ -35,7 +415,22 @@ class VideoClipExtractor:
                  min_motion_duration: float = 3.0,
                  clip_before: float = 20.0,
                  clip_after: float = 20.0,
-                 min_area: int = 300):
+                 min_area: int = 300,
+                 seek_keyframes: bool = False,
+                 detection_scale: float = 1.0,
+                 fast_clips: bool = False,
+                 index_cache: Optional[MotionIndexCache] = None,
+                 threaded_decode: bool = False,
+                 gap_tolerance: float = 0.0,
+                 trigger_area: float = 0.0,
+                 max_clip_length: float = 0.0,
+                 prefilter: bool = True,
+                 adaptive_fps: int = 0,
+                 detection_backend: str = 'diff',
+                 detection_mask: Optional[DetectionMask] = None,
+                 clip_workers: int = 1,
+                 clip_slots=None,
+                 profiler: Optional[StageProfiler] = None):
         """
         初始化视频片段提取器
         
@@ -45,25 +440,108 @@ class VideoClipExtractor:
             clip_before: 运动事件前提取的时长（秒）
             clip_after: 运动事件后提取的时长（秒）
             min_area: 最小运动区域面积
+            seek_keyframes: 检测运动事件时是否按关键帧跳转采样
+            detection_scale: 检测分辨率缩放比例 (0-1]，片段标注仍在原始分辨率上绘制
+            fast_clips: 是否使用快速片段模式：在关键帧边界直接复制码流（需要 ffmpeg），
+                        不解码、不重新编码，片段中不绘制标注
+            index_cache: 运动索引缓存，命中时直接从索引推导运动事件，无需重新解码
+            threaded_decode: 是否使用独立的解码线程，使解码与运动检测、片段编码并行
+            gap_tolerance: 运动中断不超过该时长（秒）时视为同一事件
+            trigger_area: 事件中至少有一个采样帧的运动面积达到该值才记录事件（0 表示不限制）
+            max_clip_length: 相邻事件的片段合并后的最大时长（秒），0 表示不限制
+            prefilter: 是否启用缩略图预筛选，静止帧跳过完整的轮廓检测
+            adaptive_fps: 自适应采样时有运动期间的处理帧率，空闲时按 fps 采样；0 表示固定按 fps 采样。
+                          两遍处理时，事件开始处被跳过的帧会补充采样以精确定位边界
+            detection_backend: 运动检测后端 (diff/average/mog2/knn)
+            detection_mask: 检测区域掩码，None 表示检测整个画面
+            clip_workers: 同时提取的片段数（两遍处理和快速片段模式下，每个片段范围由一个线程提取）
+            clip_slots: 与批量处理共享的并发额度（threading 或 multiprocessing 信号量），
+                        除调用线程外的提取线程需占用一个额度；None 表示只受 clip_workers 限制
+            profiler: 分阶段计时器（解码、检测各阶段、标注、片段编码和写出），None 表示不计时
         """
         self.sensitivity = sensitivity
         self.min_motion_duration = min_motion_duration
         self.clip_before = clip_before
         self.clip_after = clip_after
         self.min_area = min_area
-        self.motion_detector = MotionDetector(sensitivity, min_area)
+        self.seek_keyframes = seek_keyframes
+        self.detection_scale = detection_scale
+        self.fast_clips = fast_clips
+        self.index_cache = index_cache
+        self.threaded_decode = threaded_decode
+        self.gap_tolerance = gap_tolerance
+        self.trigger_area = trigger_area
+        self.max_clip_length = max_clip_length
+        self.prefilter = prefilter
+        self.adaptive_fps = adaptive_fps
+        self.detection_backend = detection_backend
+        self.clip_workers = max(1, clip_workers)
+        self.clip_slots = clip_slots
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.last_events: List[MotionEvent] = []  # 最近一次 process_video 检测到的运动事件
+        self.last_index: Optional[MotionIndex] = None  # 最近一次 process_video 使用的运动索引
+        self.motion_detector = MotionDetector(sensitivity, min_area, detection_scale, prefilter,
+                                              detection_backend, detection_mask, profiler=self.profiler)
+        
+        if self.fast_clips and find_ffmpeg() is None:
+            print("警告: 未找到 ffmpeg，快速片段模式不可用，将使用重新编码方式提取片段")
+            self.fast_clips = False
     
-    def detect_motion_events(self, video_path: str, fps: int = 2) -> List[MotionEvent]:
+    def detect_motion_events(self, video_path: str, fps: int = 2, frame_callback=None) -> List[MotionEvent]:
         """
         检测视频中的所有运动事件
         
         Args:
             video_path: 视频文件路径
             fps: 处理帧率（每秒处理的帧数）
-            
+            frame_callback: 回调函数，每个采样帧调用一次，参数同 process_video
+                            （命中运动索引缓存时不会解码，也不会调用回调）
+        
         Returns:
             运动事件列表
         """
+        index = self.build_motion_index(video_path, fps, frame_callback)
+        print(f"最小连续运动时长: {self.min_motion_duration}秒")
+        return self.events_from_index(index)
+    
+    def build_motion_index(self, video_path: str, fps: int = 2, frame_callback=None) -> MotionIndex:
+        """
+        解码采样帧并记录逐帧运动检测结果
+        
+        命中运动索引缓存时直接返回缓存的索引，否则检测完成后写入缓存。
+        自适应采样时，运动开始前被跳过的帧在检测完成后补充采样。
+        
+        Args:
+            video_path: 视频文件路径
+            fps: 处理帧率（每秒处理的帧数）
+            frame_callback: 回调函数，每个采样帧调用一次，参数同 process_video
+        
+        Returns:
+            运动索引
+        """
+        index = self.load_cached_index(video_path, fps)
+        if index is not None:
+            print("使用缓存的运动索引")
+            return index
+        return self._detect_motion_index(video_path, fps, frame_callback)
+    
+    def load_cached_index(self, video_path: str, fps: int = 2) -> Optional[MotionIndex]:
+        """
+        读取缓存的运动索引
+        
+        Args:
+            video_path: 视频文件路径
+            fps: 处理帧率
+        
+        Returns:
+            有效的运动索引，未启用缓存、未命中或已失效时返回 None
+        """
+        if not self.index_cache:
+            return None
+        return self.index_cache.load(video_path, self.index_params(fps))
+    
+    def _detect_motion_index(self, video_path: str, fps: int = 2, frame_callback=None) -> MotionIndex:
+        """解码采样帧检测运动并写入缓存（build_motion_index 未命中缓存时的部分）"""
         cap = cv2.VideoCapture(video_path)
         
         if not cap.isOpened():
@@ -71,81 +549,188 @@ class VideoClipExtractor:
         
         video_fps = cap.get(cv2.CAP_PROP_FPS)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        frame_interval = int(video_fps / fps) if video_fps > 0 else 1
+        frame_interval = max(1, int(video_fps / fps)) if video_fps > 0 else 1
+        sampler = AdaptiveSampler.for_rates(video_fps, fps, self.adaptive_fps)
         
         self.motion_detector.reset()
-        
-        motion_events = []
-        current_motion_start = None
-        current_motion_start_frame = None
-        last_motion_time = None
-        frame_count = 0
+        index = MotionIndex(video_fps, total_frames)
         
         print(f"分析视频中的运动事件...")
-        print(f"最小连续运动时长: {self.min_motion_duration}秒")
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # 只处理间隔帧
-            if frame_count % frame_interval == 0:
-                current_time = frame_count / video_fps if video_fps > 0 else 0
-                
-                # 检测运动
-                has_motion, _, _ = self.motion_detector.detect_motion(frame)
-                
-                if has_motion:
-                    # 如果是新的运动事件
-                    if current_motion_start is None:
-                        current_motion_start = current_time
-                        current_motion_start_frame = frame_count
+        # 只解码采样帧，其余帧仅 grab() 跳过
+        try:
+            with open_frame_source(cap, frame_interval, self.seek_keyframes, self.threaded_decode,
+                                   sampler if sampler.adaptive else None) as frames:
+                for frame_count, frame in self.profiler.timed('decode', frames):
+                    current_time = frame_count / video_fps if video_fps > 0 else 0
                     
-                    last_motion_time = current_time
-                else:
-                    # 如果之前有运动，现在停止了
-                    if current_motion_start is not None and last_motion_time is not None:
-                        duration = last_motion_time - current_motion_start
-                        
-                        # 如果持续时间超过阈值，记录事件
-                        if duration >= self.min_motion_duration:
-                            event = MotionEvent(
-                                start_time=current_motion_start,
-                                end_time=last_motion_time,
-                                duration=duration,
-                                start_frame=current_motion_start_frame,
-                                end_frame=int(last_motion_time * video_fps)
-                            )
-                            motion_events.append(event)
-                            print(f"  检测到运动事件: {event}")
-                        
-                        # 重置状态
-                        current_motion_start = None
-                        current_motion_start_frame = None
-                        last_motion_time = None
-            
-            frame_count += 1
+                    # 检测运动
+                    has_motion, _, regions = self.motion_detector.detect_motion(frame)
+                    index.add(frame_count, current_time, has_motion, regions)
+                    sampler.update(frame_count, has_motion)
+                    
+                    if frame_callback:
+                        frame_callback(frame, current_time, has_motion, regions, frame_count, total_frames)
+        finally:
+            cap.release()
         
-        # 处理视频结束时还在进行的运动
-        if current_motion_start is not None and last_motion_time is not None:
-            duration = last_motion_time - current_motion_start
-            if duration >= self.min_motion_duration:
-                event = MotionEvent(
-                    start_time=current_motion_start,
-                    end_time=last_motion_time,
-                    duration=duration,
-                    start_frame=current_motion_start_frame,
-                    end_frame=int(last_motion_time * video_fps)
-                )
-                motion_events.append(event)
-                print(f"  检测到运动事件: {event}")
+        print(self.motion_detector.format_stats())
         
-        cap.release()
+        if sampler.adaptive:
+            self._backfill_motion_starts(video_path, index, sampler.dense_interval)
+        
+        if self.index_cache:
+            self.index_cache.save(video_path, self.index_params(fps), index)
+        
+        return index
+    
+    def _backfill_motion_starts(self, video_path: str, index: MotionIndex, dense_interval: int) -> int:
+        """
+        在运动开始前被稀疏采样跳过的帧中补充采样，精确定位事件开始位置
+        
+        对每个"无运动采样 -> 运动采样"且间隔大于密集间隔的位置，从无运动采样处定位后
+        按密集间隔重新检测两者之间的帧，结果插入索引。运动结束处已处于密集采样，无需补充。
+        
+        Args:
+            video_path: 视频文件路径
+            index: 运动索引（原地补充）
+            dense_interval: 密集采样间隔（帧）
+        
+        Returns:
+            补充的采样帧数
+        """
+        # len() 同时会把逐帧追加的结果合并进数组
+        if len(index) < 2:
+            return 0
+        frames = index.frame_indices
+        rising = np.flatnonzero(~index.has_motion[:-1] & index.has_motion[1:] &
+                                (np.diff(frames) > dense_interval))
+        if len(rising) == 0:
+            return 0
+        
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"无法打开视频文件: {video_path}")
+        
+        added = 0
+        try:
+            for i in rising:
+                start, end = int(frames[i]), int(frames[i + 1])
+                for frame_index, has_motion, regions in self._detect_skipped(
+                        self.profiler.timed('redecode', self._decode_range(cap, start, end, dense_interval)),
+                        start, dense_interval):
+                    index.add(frame_index, frame_index / index.video_fps, has_motion, regions)
+                    added += 1
+        finally:
+            cap.release()
+        
+        index.sort()
+        print(f"补充采样 {len(rising)} 处运动开始位置，共 {added} 帧")
+        return added
+    
+    def _decode_range(self,
+                      cap: cv2.VideoCapture,
+                      start: int,
+                      end: int,
+                      step: int = 1) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        定位到 start 后按 step 间隔解码 [start, end) 范围内的帧，其余帧只 grab() 跳过
+        
+        cap 已位于 start 时不重新定位，连续补写相邻范围时不会重复解码关键帧之后的帧。
+        
+        Args:
+            cap: 已打开的视频
+            start: 起始帧号
+            end: 结束帧号（不含）
+            step: 解码间隔（帧）
+        
+        Returns:
+            (frame_index, frame) 迭代器
+        """
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for frame_index in range(start, end):
+            if not cap.grab():
+                return
+            if (frame_index - start) % step == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    return
+                yield frame_index, frame
+    
+    def _detect_skipped(self,
+                        frames: Iterator[Tuple[int, np.ndarray]],
+                        start: int,
+                        dense_interval: int) -> List[Tuple[int, bool, list]]:
+        """
+        按密集间隔重新检测 start 之后被跳过的帧
+        
+        使用独立的检测器，以 start 处的帧作为参考帧，不影响主检测器的状态。
+        
+        Args:
+            frames: 从 start 开始按帧号递增的 (frame_index, frame)
+            start: 区间起点（已检测过的无运动采样帧）
+            dense_interval: 密集采样间隔（帧）
+        
+        Returns:
+            [(frame_index, has_motion, regions), ...]，不含 start 本身
+        """
+        detector = self.motion_detector.clone()
+        samples = []
+        for frame_index, frame in frames:
+            if (frame_index - start) % dense_interval:
+                continue
+            has_motion, _, regions = detector.detect_motion(frame)
+            if frame_index > start:
+                samples.append((frame_index, has_motion, regions))
+        return samples
+    
+    def index_params(self, fps: int) -> dict:
+        """运动索引缓存键中的检测参数（检测器参数 + 采样帧率）"""
+        params = self.motion_detector.config()
+        params['fps'] = fps
+        params['seek_keyframes'] = self.seek_keyframes
+        params['adaptive_fps'] = self.adaptive_fps
+        # 补充采样的索引与截图流程（VideoProcessor）未补充的索引使用不同的缓存键
+        if self.adaptive_fps:
+            params['backfilled'] = True
+        return params
+    
+    def events_from_index(self, index: MotionIndex) -> List[MotionEvent]:
+        """
+        从运动索引推导运动事件，无需解码视频
+        
+        Args:
+            index: 运动索引
+        
+        Returns:
+            运动事件列表
+        """
+        motion_events = segment_motion_events(index, self.min_motion_duration,
+                                              self.gap_tolerance, self.trigger_area)
+        for event in motion_events:
+            print(f"  检测到运动事件: {event}")
         
         print(f"共检测到 {len(motion_events)} 个运动事件")
         return motion_events
     
+    def clip_windows(self, events: List[MotionEvent], duration: Optional[float] = None) -> List[ClipWindow]:
+        """
+        按当前的前后时长和最大片段长度合并事件的片段范围
+        
+        Args:
+            events: 运动事件列表
+            duration: 视频总时长（秒），None 表示不截断
+        
+        Returns:
+            片段范围列表
+        """
+        windows = merge_clip_windows(events, self.clip_before, self.clip_after,
+                                     self.max_clip_length, duration)
+        if len(windows) < len(events):
+            print(f"合并重叠的片段范围: {len(events)} 个事件 -> {len(windows)} 个片段")
+        return windows
+    
     def extract_clip(self,
                     video_path: str,
                     event: MotionEvent,
@@ -159,7 +744,26 @@ class VideoClipExtractor:
             event: 运动事件
             output_path: 输出视频路径
             draw_contours: 是否绘制运动检测轮廓
-            
+        
+        Returns:
+            是否成功提取
+        """
+        return self.extract_window(video_path, self.clip_windows([event])[0], output_path, draw_contours)
+    
+    def extract_window(self,
+                       video_path: str,
+                       window: ClipWindow,
+                       output_path: str,
+                       draw_contours: bool = True) -> bool:
+        """
+        提取一个片段范围（重新编码）
+        
+        Args:
+            video_path: 原始视频路径
+            window: 片段范围
+            output_path: 输出视频路径
+            draw_contours: 是否绘制运动检测轮廓
+        
         Returns:
             是否成功提取
         """
@@ -173,15 +777,15 @@ class VideoClipExtractor:
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
-        # 计算提取范围（前后各加指定时长）
-        clip_start_time = max(0, event.start_time - self.clip_before)
-        clip_end_time = event.end_time + self.clip_after
+        clip_start_time = window.start_time
+        clip_end_time = window.end_time
         
-        clip_start_frame = int(clip_start_time * video_fps)
+        # 从上一个片段拆分出的片段不重复写入上一个片段的最后一帧
+        clip_start_frame = int(clip_start_time * video_fps) + (1 if window.continues else 0)
         clip_end_frame = int(clip_end_time * video_fps)
         
         print(f"  提取片段: {clip_start_time:.1f}s - {clip_end_time:.1f}s " +
-              f"(事件: {event.start_time:.1f}s - {event.end_time:.1f}s)")
+              f"(事件: {self._describe_events(window)})")
         
         # 初始化视频写入器
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
@@ -192,8 +796,8 @@ class VideoClipExtractor:
             cap.release()
             return False
         
-        # 重置运动检测器
-        self.motion_detector.reset()
+        # 每个片段使用独立的运动检测器，多个片段可以并行提取
+        detector = self.motion_detector.clone()
         
         # 定位到起始帧
         cap.set(cv2.CAP_PROP_POS_FRAMES, clip_start_frame)
@@ -207,98 +811,634 @@ class VideoClipExtractor:
             for _ in range(warmup_frames):
                 ret, warmup_frame = cap.read()
                 if ret:
-                    self.motion_detector.detect_motion(warmup_frame)
+                    detector.detect_motion(warmup_frame)
             # 重新定位到起始帧
             cap.set(cv2.CAP_PROP_POS_FRAMES, clip_start_frame)
         
         while frame_count <= clip_end_frame:
+            started = self.profiler.start()
             ret, frame = cap.read()
+            self.profiler.lap('redecode', started)
             if not ret:
                 break
             
             current_time = frame_count / video_fps
             
             # 对整个视频片段进行运动检测和标注
+            regions = MotionRegions()
             if draw_contours:
-                # 检测运动并获取轮廓
-                has_motion, _, contours = self.motion_detector.detect_motion(frame)
-                
-                # 如果检测到运动，绘制扩大的绿色矩形边界框
-                if has_motion and contours:
-                    frame_h, frame_w = frame.shape[:2]
-                    for contour in contours:
-                        x, y, w, h = cv2.boundingRect(contour)
-                        
-                        # 扩大边界框，确保完整框住运动物体
-                        padding = max(15, int(min(w, h) * 0.15))  # 动态边距，至少15像素
-                        x = max(0, x - padding)
-                        y = max(0, y - padding)
-                        w = min(frame_w - x, w + 2 * padding)
-                        h = min(frame_h - y, h + 2 * padding)
-                        
-                        # 绘制更粗的绿色矩形框
-                        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 3)
+                # 检测运动并获取运动区域
+                _, _, regions = detector.detect_motion(frame)
             
-            # 添加时间戳
-            timestamp_str = self._format_timestamp(current_time)
-            cv2.putText(frame, timestamp_str, (10, 30),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            frame = self._annotate_frame(frame, regions, current_time)
             
+            started = self.profiler.start()
             writer.write(frame)
+            self.profiler.lap('encode', started)
             written_frames += 1
             frame_count += 1
         
         cap.release()
+        started = self.profiler.start()
         writer.release()
+        self.profiler.lap_file('write', started, output_path)
         
         print(f"  成功提取 {written_frames} 帧")
         return True
     
+    def remux_clip(self,
+                   video_path: str,
+                   event: MotionEvent,
+                   output_path: str) -> bool:
+        """
+        以码流复制方式提取单个运动事件的视频片段
+        
+        Args:
+            video_path: 原始视频路径
+            event: 运动事件
+            output_path: 输出视频路径
+        
+        Returns:
+            是否成功提取
+        """
+        return self.remux_window(video_path, self.clip_windows([event])[0], output_path)
+    
+    def remux_window(self,
+                     video_path: str,
+                     window: ClipWindow,
+                     output_path: str) -> bool:
+        """
+        以码流复制方式提取一个片段范围
+        
+        由 ffmpeg 在容器层面直接复制压缩数据，不解码也不重新编码；
+        片段起点落在范围开始之前最近的关键帧上，画质和编码格式与原视频一致。
+        
+        Args:
+            video_path: 原始视频路径
+            window: 片段范围
+            output_path: 输出视频路径
+        
+        Returns:
+            是否成功提取
+        """
+        ffmpeg = find_ffmpeg()
+        if ffmpeg is None:
+            print("错误: 未找到 ffmpeg，无法使用快速片段模式")
+            return False
+        
+        clip_start_time = window.start_time
+        clip_end_time = window.end_time
+        
+        print(f"  复制片段: {clip_start_time:.1f}s - {clip_end_time:.1f}s " +
+              f"(事件: {self._describe_events(window)})")
+        
+        command = [
+            ffmpeg, '-hide_banner', '-loglevel', 'error', '-y',
+            '-ss', f"{clip_start_time:.3f}",
+            '-i', str(video_path),
+            '-t', f"{clip_end_time - clip_start_time:.3f}",
+            '-map', '0:v', '-map', '0:a?',
+            '-c', 'copy',
+            '-avoid_negative_ts', 'make_zero',
+            str(output_path),
+        ]
+        started = self.profiler.start()
+        result = subprocess.run(command, capture_output=True, text=True)
+        self.profiler.lap_file('remux', started, output_path)
+        
+        if result.returncode != 0:
+            print(f"错误: 片段复制失败 {output_path}: {result.stderr.strip()}")
+            return False
+        
+        return True
+    
+    def build_timeline_index(self, timeline: SegmentTimeline, fps: int = 2, frame_callback=None) -> MotionIndex:
+        """
+        在跨文件的连续时间线上检测运动
+        
+        运动检测器只在时间线开始时重置，前一个文件末尾的背景状态延续到下一个文件，
+        文件边界不会产生误检或打断正在进行的运动。帧号和时间均为时间线上的全局值。
+        检测结果依赖前后文件，因此不读写单文件的运动索引缓存。
+        
+        Args:
+            timeline: 连续时间线
+            fps: 处理帧率（每秒处理的帧数）
+            frame_callback: 回调函数，每个采样帧调用一次，参数同 process_video
+        
+        Returns:
+            时间线上的运动索引
+        """
+        self.motion_detector.reset()
+        index = MotionIndex(timeline.fps, timeline.total_frames)
+        
+        print(f"分析连续时间线中的运动事件: {len(timeline.segments)} 个文件, {timeline.duration:.1f}秒")
+        
+        samples = timeline.iter_samples(fps, self.seek_keyframes)
+        for segment, frame_index, current_time, frame in self.profiler.timed('decode', samples):
+            frame_count = int(round(current_time * timeline.fps))
+            has_motion, _, regions = self.motion_detector.detect_motion(frame)
+            index.add(frame_count, current_time, has_motion, regions)
+            
+            if frame_callback:
+                frame_callback(frame, current_time, has_motion, regions, frame_count, timeline.total_frames)
+        
+        print(self.motion_detector.format_stats())
+        
+        return index
+    
+    def extract_timeline_clip(self,
+                              timeline: SegmentTimeline,
+                              window: ClipWindow,
+                              output_path: str,
+                              draw_contours: bool = True) -> bool:
+        """
+        提取跨文件的片段范围
+        
+        依次解码范围内的各个文件并写入同一个输出视频。
+        
+        Args:
+            timeline: 连续时间线
+            window: 时间线上的片段范围（由 clip_windows 按时间线总时长截断）
+            output_path: 输出视频路径
+            draw_contours: 是否绘制运动检测轮廓
+        
+        Returns:
+            是否成功提取
+        """
+        clip_start_time = window.start_time
+        clip_end_time = min(timeline.duration, window.end_time)
+        segments = timeline.segments_between(clip_start_time, clip_end_time)
+        
+        print(f"  提取片段: {clip_start_time:.1f}s - {clip_end_time:.1f}s " +
+              f"(事件: {self._describe_events(window)}, {len(segments)} 个文件)")
+        
+        writer = None
+        written_frames = 0
+        detector = self.motion_detector.clone()
+        
+        try:
+            for segment in segments:
+                cap = cv2.VideoCapture(str(segment.path))
+                if not cap.isOpened():
+                    print(f"错误: 无法打开视频 {segment.path}")
+                    return False
+                
+                try:
+                    if writer is None:
+                        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                        writer = cv2.VideoWriter(output_path, fourcc, segment.fps, (width, height))
+                        if not writer.isOpened():
+                            print(f"错误: 无法创建输出视频 {output_path}")
+                            return False
+                    
+                    frame_count = int(max(0.0, clip_start_time - segment.start) * segment.fps)
+                    if window.continues and segment is segments[0]:
+                        # 从上一个片段拆分出的片段不重复写入上一个片段的最后一帧
+                        frame_count += 1
+                    end_frame = int((clip_end_time - segment.start) * segment.fps)
+                    if frame_count > 0:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count)
+                    
+                    while frame_count <= end_frame:
+                        started = self.profiler.start()
+                        ret, frame = cap.read()
+                        self.profiler.lap('redecode', started)
+                        if not ret:
+                            break
+                        
+                        regions = MotionRegions()
+                        if draw_contours:
+                            _, _, regions = detector.detect_motion(frame)
+                        
+                        current_time = segment.start + frame_count / segment.fps
+                        frame = self._annotate_frame(frame, regions, current_time)
+                        started = self.profiler.start()
+                        writer.write(frame)
+                        self.profiler.lap('encode', started)
+                        written_frames += 1
+                        frame_count += 1
+                finally:
+                    cap.release()
+        finally:
+            if writer is not None:
+                started = self.profiler.start()
+                writer.release()
+                self.profiler.lap_file('write', started, output_path)
+        
+        print(f"  成功提取 {written_frames} 帧")
+        return written_frames > 0
+    
+    def remux_timeline_clip(self,
+                            timeline: SegmentTimeline,
+                            window: ClipWindow,
+                            output_path: str) -> bool:
+        """
+        以码流复制方式提取跨文件的片段范围
+        
+        范围内的文件通过 ffmpeg concat 分离器拼接后直接复制码流，不解码也不重新编码。
+        
+        Args:
+            timeline: 连续时间线
+            window: 时间线上的片段范围
+            output_path: 输出视频路径
+        
+        Returns:
+            是否成功提取
+        """
+        ffmpeg = find_ffmpeg()
+        if ffmpeg is None:
+            print("错误: 未找到 ffmpeg，无法使用快速片段模式")
+            return False
+        
+        clip_start_time = window.start_time
+        clip_end_time = min(timeline.duration, window.end_time)
+        segments = timeline.segments_between(clip_start_time, clip_end_time)
+        
+        print(f"  复制片段: {clip_start_time:.1f}s - {clip_end_time:.1f}s " +
+              f"(事件: {self._describe_events(window)}, {len(segments)} 个文件)")
+        
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            for segment in segments:
+                escaped = str(segment.path.resolve()).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+            list_path = f.name
+        
+        command = [
+            ffmpeg, '-hide_banner', '-loglevel', 'error', '-y',
+            '-f', 'concat', '-safe', '0',
+            '-ss', f"{clip_start_time - segments[0].start:.3f}",
+            '-i', list_path,
+            '-t', f"{clip_end_time - clip_start_time:.3f}",
+            '-map', '0:v', '-map', '0:a?',
+            '-c', 'copy',
+            '-avoid_negative_ts', 'make_zero',
+            str(output_path),
+        ]
+        started = self.profiler.start()
+        try:
+            result = subprocess.run(command, capture_output=True, text=True)
+        finally:
+            os.unlink(list_path)
+        self.profiler.lap_file('remux', started, output_path)
+        
+        if result.returncode != 0:
+            print(f"错误: 片段复制失败 {output_path}: {result.stderr.strip()}")
+            return False
+        
+        return True
+    
     def process_video(self,
                      video_path: str,
                      output_dir: str,
-                     fps: int = 2) -> List[str]:
+                     fps: int = 2,
+                     frame_callback=None,
+                     draw_contours: bool = True,
+                     index: Optional[MotionIndex] = None) -> List[str]:
         """
-        处理视频，检测运动事件并提取所有片段
+        单遍处理视频：检测运动事件的同时写出视频片段
+        
+        启用 fast_clips 时只解码采样帧检测事件，片段由 remux_clip 以码流复制方式生成，
+        不再解码和重新编码全部帧。命中运动索引缓存时事件直接从索引推导，
+        只有片段范围内的帧需要解码。
+        
+        整个文件按顺序只解码一遍。预录记录中只保存最近 clip_before + min_motion_duration 秒内
+        采样帧的检测区域，运动进行中时保留到运动开始前 clip_before 秒（trigger_area 使事件在运动
+        开始很久之后才确认时预录仍然完整）。连续运动确认为事件时打开片段写入器，预录部分从源视频
+        重新定位解码后写出（每个事件一次），运动结束 clip_after 秒后关闭写入器。
         
         Args:
             video_path: 输入视频路径
             output_dir: 输出目录
-            fps: 处理帧率
-            
+            fps: 处理帧率（运动检测的采样帧率）
+            frame_callback: 回调函数，每个采样帧调用一次，接收
+                            (frame, timestamp, has_motion, regions, current_frame, total_frames)，
+                            可用于在同一遍解码中提取截图和更新进度
+            draw_contours: 是否在片段中绘制运动边界框（使用最近一个采样帧的检测结果）
+            index: 调用方已读取的缓存运动索引，None 时由 index_cache 读取
+        
         Returns:
             生成的视频片段路径列表
         """
         video_path = Path(video_path)
+        self.last_events = []
+        self.last_index = None
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
         
         print(f"\n处理视频: {video_path.name}")
         print("=" * 60)
         
-        # 检测运动事件
-        events = self.detect_motion_events(str(video_path), fps)
+        if index is None:
+            index = self.load_cached_index(str(video_path), fps)
         
-        if not events:
-            print("未检测到符合条件的运动事件")
-            return []
+        if self.fast_clips or index is not None:
+            # 快速片段模式：只解码采样帧检测事件，片段通过码流复制生成；
+            # 命中运动索引缓存时事件直接来自索引，只需解码片段范围内的帧
+            if index is None:
+                index = self._detect_motion_index(str(video_path), fps, frame_callback)
+            else:
+                print("使用缓存的运动索引")
+            self.last_index = index
+            print(f"最小连续运动时长: {self.min_motion_duration}秒")
+            events = self.events_from_index(index)
+            self.last_events = events
+            if not events:
+                print("未检测到符合条件的运动事件")
+                return []
+            
+            windows = self.clip_windows(events)
+            paths = [str(output_dir / self._clip_filename(video_path.stem, i, window.events[0].start_time))
+                     for i, window in enumerate(windows, 1)]
+            if self.fast_clips:
+                jobs = [partial(self.remux_window, str(video_path), window, path)
+                        for window, path in zip(windows, paths)]
+            else:
+                jobs = [partial(self.extract_window, str(video_path), window, path, draw_contours)
+                        for window, path in zip(windows, paths)]
+            print(f"\n提取 {len(windows)} 个片段:")
+            extracted = self.run_clip_jobs(jobs)
+            output_paths = [path for path, success in zip(paths, extracted) if success]
+            
+            print(f"\n完成! 共生成 {len(output_paths)} 个视频片段")
+            return output_paths
+        
+        cap = cv2.VideoCapture(str(video_path))
+        
+        if not cap.isOpened():
+            raise ValueError(f"无法打开视频文件: {video_path}")
+        
+        video_fps = cap.get(cv2.CAP_PROP_FPS)
+        if video_fps <= 0:
+            cap.release()
+            raise ValueError(f"无法获取视频帧率: {video_path}")
+        
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frame_interval = max(1, int(video_fps / fps))
+        sampler = AdaptiveSampler.for_rates(video_fps, fps, self.adaptive_fps)
+        next_sample = 0
+        last_sample = None
+        
+        # 预录记录需要覆盖 事件开始前 clip_before 秒 + 确认事件所需的最小运动时长
+        capacity = int((self.clip_before + self.min_motion_duration) * video_fps) + frame_interval + 1
+        preroll = _PrerollBuffer(capacity)
+        # 预录帧和自适应采样跳过的帧从第二个句柄重新定位解码，不打断顺序解码
+        source = None
+        
+        def decode_again(start: int, end: int, step: int = 1) -> Iterator[Tuple[int, np.ndarray]]:
+            nonlocal source
+            if source is None:
+                source = cv2.VideoCapture(str(video_path))
+            return self.profiler.timed('redecode', self._decode_range(source, start, end, step))
+        
+        def write_buffered(clip: _ClipWriter, end: int):
+            # 补写片段中 end 之前尚未写出的帧
+            buffered = zip(decode_again(clip.next_frame, end), preroll.regions_between(clip.next_frame, end))
+            for (buffered_index, buffered_frame), (_, buffered_regions) in buffered:
+                clip.write(self._annotate_frame(buffered_frame, buffered_regions, buffered_index / video_fps),
+                           buffered_index)
+        
+        self.motion_detector.reset()
+        tracker = MotionEventTracker(self.min_motion_duration, video_fps,
+                                     self.gap_tolerance, self.trigger_area)
+        index = self.last_index = MotionIndex(video_fps, total_frames)
+        
+        print(f"分析视频中的运动事件并提取片段...")
+        print(f"最小连续运动时长: {self.min_motion_duration}秒")
         
-        # 提取每个事件的视频片段
-        output_paths = []
         video_name = video_path.stem
+        output_paths = []
+        events = self.last_events = []
+        active_clips = []
+        current_clip = None
+        last_clip = None
+        regions = MotionRegions()
         
-        for i, event in enumerate(events, 1):
-            output_filename = f"{video_name}_clip_{i:03d}_" + \
-                            f"{self._format_timestamp(event.start_time).replace(':', '')}.mp4"
-            output_path = output_dir / output_filename
-            
-            print(f"\n提取片段 {i}/{len(events)}:")
-            if self.extract_clip(str(video_path), event, str(output_path)):
-                output_paths.append(str(output_path))
+        def writing_clips(frame_index: int) -> List[_ClipWriter]:
+            # 正在进行的片段只写到最近一次运动之后 clip_after 秒：运动中断未超过容差时先停止写入，
+            # 运动恢复后再补写中断期间的帧，中断超过容差时片段恰好在事件结束 clip_after 秒后结束
+            pending_end = (int((tracker.last_motion_time + self.clip_after) * video_fps)
+                           if tracker.last_motion_time is not None else frame_index)
+            return [c for c in active_clips
+                    if c.start_frame <= frame_index <=
+                    (c.end_frame if c.end_frame is not None else pending_end)]
+        
+        def needs_frame(frame_index: int) -> bool:
+            # 采样帧需要检测，正在写入的片段需要当前帧；其余帧只 grab() 推进解码位置
+            return frame_index >= next_sample or bool(writing_clips(frame_index))
+        
+        # 解码线程预先解码每一帧，与检测并行；不使用解码线程时只取出需要的帧
+        if self.threaded_decode:
+            frame_source = open_frame_source(cap, 1, threaded=True)
+        else:
+            frame_source = contextlib.closing(selective_frames(cap, needs_frame, self.profiler))
+        
+        try:
+            with frame_source as frames:
+                if self.threaded_decode:
+                    frames = self.profiler.timed('decode', frames)
+                for frame_count, frame in frames:
+                    current_time = frame_count / video_fps
+                    
+                    # 只对采样帧做运动检测，非采样帧沿用最近一次的检测结果绘制标注
+                    if frame_count >= next_sample:
+                        has_motion, _, sample_regions = self.motion_detector.detect_motion(frame)
+                        regions = sample_regions if draw_contours else MotionRegions()
+                        # 进行中的运动之后确认时片段从其开始前 clip_before 秒开始，未写完的片段可能补写
+                        keep_from = [c.next_frame for c in active_clips]
+                        if tracker.current_motion_start is not None:
+                            keep_from.append(int(max(0, tracker.current_motion_start - self.clip_before) * video_fps))
+                        preroll.append(frame_count, regions, min(keep_from, default=None))
+                        
+                        if frame_callback:
+                            frame_callback(frame, current_time, has_motion, sample_regions,
+                                           frame_count, total_frames)
+                        
+                        # 自适应采样在运动开始时，重新解码并检测跳过的帧，与两遍处理的事件边界一致
+                        samples = [(frame_count, has_motion, sample_regions)]
+                        if (has_motion and last_sample is not None and not last_sample[1] and
+                                frame_count - last_sample[0] > sampler.dense_interval):
+                            skipped = decode_again(last_sample[0], frame_count, sampler.dense_interval)
+                            samples = self._detect_skipped(skipped, last_sample[0], sampler.dense_interval) + samples
+                        last_sample = (frame_count, has_motion)
+                        next_sample = frame_count + sampler.update(frame_count, has_motion)
+                        
+                        for sample_index, sample_motion, sample_found in samples:
+                            sample_time = sample_index / video_fps
+                            index.add(sample_index, sample_time, sample_motion, sample_found)
+                            motion_area = sample_found.total_area
+                            event = tracker.update(sample_motion, sample_time, sample_index, motion_area)
+                            if event:
+                                events.append(event)
+                                print(f"  检测到运动事件: {event}")
+                                if current_clip is not None:
+                                    current_clip.end_frame = int((event.end_time + self.clip_after) * video_fps)
+                                    current_clip = None
+                        
+                        # 连续运动刚达到最小时长：与上一个片段的范围重叠时并入该片段，
+                        # 否则打开新的片段写入器，预录部分在写入当前帧之前补写
+                        if tracker.confirmed and current_clip is None:
+                            clip_start_time = max(0, tracker.current_motion_start - self.clip_before)
+                            clip_start_frame = int(clip_start_time * video_fps)
+                            if last_clip is not None and last_clip.end_frame is not None:
+                                if (last_clip in active_clips and clip_start_frame <= last_clip.end_frame and
+                                        self._can_merge(last_clip, tracker, frame_count, video_fps) and
+                                        preroll.covers(last_clip.end_frame + 1)):
+                                    # 上一个片段结束后的帧在写入当前帧之前补写，之后继续写入同一个片段
+                                    print(f"  合并到上一个片段: {Path(last_clip.output_path).name}")
+                                    last_clip.end_frame = None
+                                    current_clip = last_clip
+                                else:
+                                    # 不合并时从上一个片段结束后开始，不重复编码同一帧
+                                    clip_start_frame = max(clip_start_frame, last_clip.end_frame + 1)
+                        
+                        if tracker.confirmed and current_clip is None:
+                            clip_index = len(output_paths) + 1
+                            output_path = output_dir / self._clip_filename(
+                                video_name, clip_index, tracker.current_motion_start)
+                            
+                            print(f"\n提取片段 {clip_index}: 从 {clip_start_frame / video_fps:.1f}s 开始")
+                            current_clip = _ClipWriter(str(output_path), video_fps, (width, height),
+                                                       clip_start_frame, self.profiler)
+                            if current_clip.is_opened():
+                                active_clips.append(current_clip)
+                                output_paths.append(str(output_path))
+                                last_clip = current_clip
+                            else:
+                                print(f"错误: 无法创建输出视频 {output_path}")
+                    
+                    writing = writing_clips(frame_count)
+                    if writing:
+                        annotated = self._annotate_frame(frame.copy(), regions, current_time)
+                        for clip in writing:
+                            if clip.next_frame < frame_count:
+                                write_buffered(clip, frame_count)
+                            clip.write(annotated, frame_count)
+                    
+                    # 关闭已写完 clip_after 的片段；新的运动仍可能并入时暂不关闭
+                    # （下一个采样帧发现的运动经补充采样最早从上一个采样帧之后的密集采样帧开始）
+                    earliest_motion = min(frame_count + 1, last_sample[0] + sampler.dense_interval)
+                    for clip in [c for c in active_clips if c.end_frame is not None and frame_count >= c.end_frame]:
+                        if clip is last_clip and self._can_merge(clip, tracker, frame_count, video_fps,
+                                                                 earliest_motion):
+                            continue
+                        clip.close()
+                        active_clips.remove(clip)
+                        print(f"  成功提取 {clip.written_frames} 帧 -> {Path(clip.output_path).name}")
+        finally:
+            cap.release()
+            if source is not None:
+                source.release()
+            for clip in active_clips:
+                clip.close()
+        
+        print(self.motion_detector.format_stats())
+        
+        if self.index_cache:
+            self.index_cache.save(str(video_path), self.index_params(fps), index)
+        
+        # 处理视频结束时还在进行的运动
+        event = tracker.finish()
+        if event:
+            events.append(event)
+            print(f"  检测到运动事件: {event}")
+        
+        for clip in active_clips:
+            clip.close()
+            print(f"  成功提取 {clip.written_frames} 帧 -> {Path(clip.output_path).name}")
+        
+        print(f"共检测到 {len(events)} 个运动事件")
+        if not events:
+            print("未检测到符合条件的运动事件")
+            return []
         
         print(f"\n完成! 共生成 {len(output_paths)} 个视频片段")
         return output_paths
     
+    def run_clip_jobs(self, jobs: List[Callable[[], bool]]) -> List[bool]:
+        """
+        执行一组片段提取任务，clip_workers > 1 时并行执行
+        
+        并发受 clip_slots 限制（见 run_with_slots）。
+        每个片段使用独立的检测器（见 extract_window），OpenCV 解码和编码期间释放 GIL。
+        
+        Args:
+            jobs: 提取单个片段的函数，返回是否成功
+        
+        Returns:
+            与 jobs 顺序对应的提取结果
+        """
+        return run_with_slots(jobs, self.clip_workers, self.clip_slots)
+    
+    def _can_merge(self,
+                   clip: _ClipWriter,
+                   tracker: MotionEventTracker,
+                   frame_count: int,
+                   video_fps: float,
+                   earliest_motion: Optional[int] = None) -> bool:
+        """
+        当前或之后开始的运动确认为事件后，是否还能并入已写完 clip_after 的片段
+        
+        Args:
+            clip: 已确定结束帧的片段
+            tracker: 运动事件状态机
+            frame_count: 当前帧号
+            video_fps: 视频帧率
+            earliest_motion: 之后开始的运动最早可能的帧号，None 表示下一帧；自适应采样在下一个采样帧
+                             发现运动后补充采样，运动开始可能提前到上一个采样帧之后
+        
+        Returns:
+            运动的片段范围可能与该片段重叠（或相邻）且合并后不超过最大时长时返回 True
+        """
+        if tracker.current_motion_start is None:
+            # 之后开始的运动，其片段范围最早从该运动开始之前 clip_before 秒开始
+            earliest = frame_count + 1 if earliest_motion is None else earliest_motion
+            return earliest - self.clip_before * video_fps <= clip.end_frame
+        if int((tracker.current_motion_start - self.clip_before) * video_fps) > clip.end_frame:
+            return False
+        if self.max_clip_length:
+            earliest_end = (max(tracker.last_motion_time, tracker.current_motion_start + self.min_motion_duration) +
+                            self.clip_after)
+            return earliest_end - clip.start_frame / video_fps <= self.max_clip_length
+        return True
+    
+    @staticmethod
+    def _describe_events(window: ClipWindow) -> str:
+        """片段中各事件的时间范围，用于日志"""
+        return ", ".join(f"{e.start_time:.1f}s - {e.end_time:.1f}s" for e in window.events)
+    
+    def _annotate_frame(self, frame: np.ndarray, regions: MotionRegions, current_time: float) -> np.ndarray:
+        """
+        在片段帧上绘制运动边界框和时间戳（原地修改）
+        
+        Args:
+            frame: 视频帧
+            regions: 运动区域，为空时只绘制时间戳
+            current_time: 当前时间（秒）
+        
+        Returns:
+            绘制后的帧
+        """
+        started = self.profiler.start()
+        # 如果检测到运动，绘制扩大的绿色矩形边界框
+        draw_motion_boxes(frame, regions.boxes)
+        
+        # 添加时间戳
+        timestamp_str = self._format_timestamp(current_time)
+        cv2.putText(frame, timestamp_str, (10, 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        
+        self.profiler.lap('annotate', started)
+        return frame
+    
+    @classmethod
+    def _clip_filename(cls, video_name: str, index: int, start_time: float) -> str:
+        """生成片段文件名，例如 video_clip_001_000130.mp4"""
+        return f"{video_name}_clip_{index:03d}_{cls._format_timestamp(start_time).replace(':', '')}.mp4"
+    
     @staticmethod
     def _format_timestamp(seconds: float) -> str:
         """格式化时间戳为 HH:MM:SS"""
@@ -3,90 +3,603 @@
 使用OpenCV实现帧差法检测视频中的运动区域
 """
 
+import queue
+import threading
+import contextlib
 import cv2
 import numpy as np
-from typing import Tuple, Optional, List
+from typing import Tuple, Optional, List, Iterator
+
+from detection_backends import DETECTION_BACKENDS
+from detection_mask import DetectionMask
+from motion_index import MotionIndex, MotionIndexCache
+from motion_regions import MotionRegions, draw_motion_boxes
+from stage_profiler import StageProfiler
+
+
+def sample_frames(cap: cv2.VideoCapture,
+                  frame_interval: int,
+                  seek_keyframes: bool = False) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    按固定间隔采样视频帧
+    
+    跳过的帧只调用 grab() 推进解码位置，不做颜色转换和内存拷贝；
+    只有被采样的帧才调用 retrieve() 取出BGR图像。
+    
+    Args:
+        cap: 已打开的视频对象
+        frame_interval: 采样间隔（帧）
+        seek_keyframes: 是否直接跳转到下一个采样帧（适合极低采样率，
+                        间隔大于关键帧间距时可跳过整段解码）
+    
+    Yields:
+        (frame_index, frame): 帧号和对应的BGR图像
+    """
+    frame_interval = max(1, frame_interval)
+    frame_count = 0
+    
+    if seek_keyframes and frame_interval > 1:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        while total_frames <= 0 or frame_count < total_frames:
+            if frame_count > 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame_count, frame
+            frame_count += frame_interval
+        return
+    
+    while True:
+        if not cap.grab():
+            break
+        
+        if frame_count % frame_interval == 0:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            yield frame_count, frame
+        
+        frame_count += 1
+
+
+class AdaptiveSampler:
+    """自适应采样间隔
+    
+    空闲时按基础间隔稀疏采样；检测到运动后立即切换到密集间隔，
+    连续 cooldown_frames 帧无运动后每个采样把间隔加倍，逐步回退到基础间隔。
+    基础间隔与密集间隔相同时等价于固定间隔采样。
+    """
+    
+    def __init__(self, base_interval: int, dense_interval: int = 1, cooldown_frames: int = 0):
+        """
+        初始化采样器
+        
+        Args:
+            base_interval: 空闲时的采样间隔（帧）
+            dense_interval: 有运动时的采样间隔（帧）
+            cooldown_frames: 最后一次运动之后保持密集采样的帧数
+        """
+        self.base_interval = max(1, base_interval)
+        self.dense_interval = max(1, min(dense_interval, self.base_interval))
+        self.cooldown_frames = cooldown_frames
+        self.interval = self.base_interval
+        self.last_motion_frame = None
+    
+    @classmethod
+    def for_rates(cls,
+                  video_fps: float,
+                  fps: float,
+                  dense_fps: float = 0,
+                  cooldown: float = 1.0) -> 'AdaptiveSampler':
+        """
+        按帧率创建采样器
+        
+        Args:
+            video_fps: 视频原始帧率
+            fps: 空闲时的处理帧率
+            dense_fps: 有运动时的处理帧率，0 表示不自适应（始终按 fps 采样），
+                       超过原始帧率时逐帧采样
+            cooldown: 运动结束后保持密集采样的时长（秒）
+        
+        Returns:
+            采样器
+        """
+        base_interval = max(1, int(video_fps / fps)) if video_fps > 0 else 1
+        dense_interval = max(1, int(video_fps / dense_fps)) if video_fps > 0 and dense_fps > 0 else base_interval
+        return cls(base_interval, dense_interval, int(cooldown * video_fps))
+    
+    @property
+    def adaptive(self) -> bool:
+        """采样间隔是否会随运动变化"""
+        return self.dense_interval < self.base_interval
+    
+    def update(self, frame_index: int, has_motion: bool) -> int:
+        """
+        根据采样帧的检测结果调整采样间隔
+        
+        Args:
+            frame_index: 采样帧号
+            has_motion: 该帧是否检测到运动
+        
+        Returns:
+            到下一个采样帧的间隔（帧）
+        """
+        if has_motion:
+            self.last_motion_frame = frame_index
+            self.interval = self.dense_interval
+        elif (self.interval < self.base_interval and
+              frame_index - self.last_motion_frame >= self.cooldown_frames):
+            self.interval = min(self.base_interval, self.interval * 2)
+        return self.interval
+    
+    def reset(self):
+        """恢复到基础间隔"""
+        self.interval = self.base_interval
+        self.last_motion_frame = None
+
+
+def adaptive_sample_frames(cap: cv2.VideoCapture,
+                           sampler: AdaptiveSampler) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    按自适应间隔采样视频帧
+    
+    每产出一帧后读取 sampler.interval 决定下一个采样帧，调用方应在处理完该帧后、
+    取下一帧之前调用 sampler.update()。跳过的帧同样只调用 grab()。
+    
+    Args:
+        cap: 已打开的视频对象
+        sampler: 自适应采样器
+    
+    Yields:
+        (frame_index, frame): 帧号和对应的BGR图像
+    """
+    frame_count = 0
+    next_sample = 0
+    
+    while True:
+        if not cap.grab():
+            break
+        
+        if frame_count >= next_sample:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            yield frame_count, frame
+            next_sample = frame_count + sampler.interval
+        
+        frame_count += 1
+
+
+def selective_frames(cap: cv2.VideoCapture,
+                     needs_frame,
+                     profiler: Optional[StageProfiler] = None) -> Iterator[Tuple[int, Optional[np.ndarray]]]:
+    """
+    逐帧 grab()，只对调用方需要图像的帧调用 retrieve()
+    
+    每一帧都会产出，不需要图像的帧产出 None，调用方仍可按帧号推进自身状态。
+    needs_frame 在产出该帧之前调用，可以依赖调用方处理完上一帧之后的状态。
+    
+    Args:
+        cap: 已打开的视频对象
+        needs_frame: 接收帧号，返回是否需要该帧的BGR图像
+        profiler: 分阶段计时器，grab() 计入 decode 阶段，retrieve() 计入 retrieve 阶段
+    
+    Yields:
+        (frame_index, frame): 帧号和对应的BGR图像（不需要时为 None）
+    """
+    profiler = profiler or StageProfiler(enabled=False)
+    frame_count = 0
+    
+    while True:
+        started = profiler.start()
+        if not cap.grab():
+            break
+        started = profiler.lap('decode', started)
+        
+        frame = None
+        if needs_frame(frame_count):
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            profiler.lap('retrieve', started)
+        yield frame_count, frame
+        
+        frame_count += 1
+
+
+def threaded_sample_frames(cap: cv2.VideoCapture,
+                           frame_interval: int,
+                           seek_keyframes: bool = False,
+                           queue_size: int = 8,
+                           sampler: Optional[AdaptiveSampler] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    在独立的解码线程中按间隔采样视频帧
+    
+    解码线程把 sample_frames 的结果放入有界队列，调用方在当前线程消费。
+    OpenCV 解码期间释放 GIL，因此解码与运动检测可以在多核上并行。
+    调用方必须在释放 cap 之前关闭本生成器（例如使用 contextlib.closing），
+    以确保解码线程已经退出。
+    
+    使用自适应采样器时，解码线程领先检测最多 queue_size 个采样帧，采样间隔的调整相应滞后。
+    
+    Args:
+        cap: 已打开的视频对象
+        frame_interval: 采样间隔（帧）
+        seek_keyframes: 是否直接跳转到下一个采样帧
+        queue_size: 解码队列长度，解码领先检测的最大帧数
+        sampler: 自适应采样器，指定时忽略 frame_interval 和 seek_keyframes
+    
+    Yields:
+        (frame_index, frame): 帧号和对应的BGR图像
+    """
+    frames = queue.Queue(maxsize=max(1, queue_size))
+    stop = threading.Event()
+    end_of_stream = object()
+    
+    def put(item) -> bool:
+        # 队列已满时等待，消费者提前结束时放弃
+        while not stop.is_set():
+            try:
+                frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def decode():
+        try:
+            if sampler is not None:
+                source = adaptive_sample_frames(cap, sampler)
+            else:
+                source = sample_frames(cap, frame_interval, seek_keyframes)
+            for item in source:
+                if not put(item):
+                    return
+            put(end_of_stream)
+        except Exception as e:
+            put(e)
+    
+    thread = threading.Thread(target=decode, name='frame-decoder', daemon=True)
+    thread.start()
+    
+    try:
+        while True:
+            item = frames.get()
+            if item is end_of_stream:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def open_frame_source(cap: cv2.VideoCapture,
+                      frame_interval: int,
+                      seek_keyframes: bool = False,
+                      threaded: bool = False,
+                      sampler: Optional[AdaptiveSampler] = None):
+    """
+    打开采样帧来源，返回可用于 with 语句的生成器
+    
+    退出 with 语句时生成器被关闭，使用解码线程时会等待线程退出，之后才能安全释放 cap。
+    
+    Args:
+        cap: 已打开的视频对象
+        frame_interval: 采样间隔（帧）
+        seek_keyframes: 是否直接跳转到下一个采样帧
+        threaded: 是否使用独立的解码线程
+        sampler: 自适应采样器，指定时按其间隔采样（不按关键帧跳转）
+    
+    Returns:
+        产出 (frame_index, frame) 的生成器（上下文管理器）
+    """
+    if threaded:
+        return contextlib.closing(threaded_sample_frames(cap, frame_interval, seek_keyframes, sampler=sampler))
+    if sampler is not None:
+        return contextlib.closing(adaptive_sample_frames(cap, sampler))
+    return contextlib.closing(sample_frames(cap, frame_interval, seek_keyframes))
 
 
 class MotionDetector:
-    """运动检测器类，负责检测视频帧中的运动"""
+    """运动检测器类，负责检测视频帧中的运动
     
-    def __init__(self, sensitivity: int = 25, min_area: int = 300):
+    检测分两级：先比较 1/8 缩略图的帧差，最大差值明显低于二值化阈值的帧直接判定为
+    无运动；只有候选帧才交给检测后端生成前景掩码，再进行形态学和轮廓查找。
+    stats 记录各级排除的帧数。配置了检测区域掩码时，只处理检测区域的外接矩形，
+    忽略区域内的变化既不影响预筛选，也不会产生轮廓。
+    启用 profiler 时按 gray/prefilter/blur/diff/morphology/contours 阶段累计耗时。
+    """
+    
+    # 预筛选缩略图相对检测分辨率的缩放比例
+    PREFILTER_SCALE = 1 / 8
+    # 缩略图帧差低于 二值化阈值 × 该比例 时判定为无运动（保守取值，避免漏检）
+    PREFILTER_MARGIN = 0.5
+    
+    def __init__(self,
+                 sensitivity: int = 25,
+                 min_area: int = 300,
+                 detection_scale: float = 1.0,
+                 prefilter: bool = True,
+                 backend: str = 'diff',
+                 mask: Optional[DetectionMask] = None,
+                 reuse_buffers: bool = True,
+                 profiler: Optional[StageProfiler] = None):
         """
         初始化运动检测器
         
         Args:
             sensitivity: 运动检测灵敏度 (0-100)，值越小越敏感
             min_area: 最小运动区域面积（像素），小于此值的运动被忽略
+            detection_scale: 检测分辨率缩放比例 (0-1]，例如 0.5 表示在 1/2 分辨率上检测，
+                             模糊核、形态学核和最小面积按比例缩放，轮廓映射回原始坐标
+            prefilter: 是否启用缩略图预筛选，静止帧跳过完整的轮廓检测
+            backend: 检测后端，见 detection_backends.DETECTION_BACKENDS：
+                     diff（帧差，默认）、average（滑动平均背景）、mog2、knn；
+                     背景模型只在候选帧上更新，sensitivity 对 mog2/knn 不起作用
+            mask: 检测区域掩码，None 表示检测整个画面
+            reuse_buffers: 是否复用按分辨率预分配的工作缓冲区（结果相同，逐帧不再分配数组）；
+                           启用时返回的运动掩码在下一次检测时会被覆盖
+            profiler: 分阶段计时器，None 表示不计时；clone() 出的检测器共用同一个计时器
         """
+        if not 0 < detection_scale <= 1:
+            raise ValueError(f"检测缩放比例必须在 (0, 1] 之间: {detection_scale}")
+        if backend not in DETECTION_BACKENDS:
+            raise ValueError(f"未知的检测后端: {backend}（可选: {', '.join(DETECTION_BACKENDS)}）")
+        
         self.sensitivity = sensitivity
         self.min_area = min_area
-        self.prev_frame = None
-        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
-            history=500,
-            varThreshold=16,
-            detectShadows=False
-        )
+        self.detection_scale = detection_scale
+        
+        # 按检测分辨率缩放核大小和最小面积，保持与全分辨率检测相同的几何含义
+        blur_size = max(3, int(round(21 * detection_scale)) | 1)
+        self.blur_ksize = (blur_size, blur_size)
+        # 形态学：膨胀 5x5×3 次 -> 腐蚀 5x5 -> 膨胀 7x7×2 次。矩形核的多次迭代等价于一次
+        # 更大的矩形核，预先合并为三次单遍运算
+        self.morphology = [
+            (cv2.dilate,) + self._iterated_kernel(self._scaled_size(5), 3),  # 连接断裂区域
+            (cv2.erode,) + self._iterated_kernel(self._scaled_size(5), 1),   # 去除噪声
+            (cv2.dilate,) + self._iterated_kernel(self._scaled_size(7), 2),  # 确保运动区域连续
+        ]
+        self.scaled_min_area = min_area * detection_scale * detection_scale
+        self.threshold_value = sensitivity * 2.55  # 转换为0-255范围
+        self.prefilter = prefilter
+        self.backend_name = backend
+        self.mask = mask
+        self.reuse_buffers = reuse_buffers
+        self.profiler = profiler or StageProfiler(enabled=False)
+        
+        # 工作缓冲区：名称 -> 数组，画面尺寸变化时清空
+        self._buffers = {}
+        self._buffer_shape = None
+        self._flip = 0
+        # 掩码按画面尺寸栅格化后缓存：(画面尺寸, 裁剪矩形, 检测分辨率掩码, 缩略图掩码)
+        self._mask_region = None
+        # 后端在第一次检测时创建
+        self.backend = None
+        self.prev_thumb = None
+        self.stats = self._empty_stats()
+    
+    def config(self) -> dict:
+        """
+        返回影响检测结果的参数，用作运动索引缓存键的一部分
+        
+        Returns:
+            检测参数字典
+        """
+        return {
+            'sensitivity': self.sensitivity,
+            'min_area': self.min_area,
+            'detection_scale': self.detection_scale,
+            'prefilter': self.prefilter,
+            'backend': self.backend_name,
+            'mask': self.mask.to_config() if self.mask else None,
+        }
+    
+    def clone(self) -> 'MotionDetector':
+        """创建参数相同、状态独立的检测器"""
+        return MotionDetector(self.sensitivity, self.min_area, self.detection_scale,
+                              self.prefilter, self.backend_name, self.mask, self.reuse_buffers,
+                              self.profiler)
+    
+    def set_mask(self, mask: Optional[DetectionMask]):
+        """
+        更换检测区域掩码（同时重置检测器状态）
+        
+        Args:
+            mask: 检测区域掩码，None 表示检测整个画面
+        """
+        self.mask = mask
+        self._mask_region = None
+        self.reset()
     
-    def detect_motion(self, frame: np.ndarray) -> Tuple[bool, np.ndarray, List]:
+    def _scaled_size(self, size: int) -> int:
+        """按检测缩放比例换算核尺寸（至少为1）"""
+        return max(1, int(round(size * self.detection_scale)))
+    
+    @staticmethod
+    def _iterated_kernel(size: int, iterations: int) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        把 size×size 矩形核的 iterations 次迭代合并为一个核
+        
+        与 OpenCV 对矩形核迭代的处理相同：边长为 size + (iterations - 1) * (size - 1)，
+        锚点为原锚点乘以迭代次数（偶数尺寸的核锚点不在中心，需要显式指定）。
+        
+        Returns:
+            (kernel, anchor)
+        """
+        merged = size + (iterations - 1) * (size - 1)
+        anchor = (size // 2) * iterations
+        return np.ones((merged, merged), np.uint8), (anchor, anchor)
+    
+    def _buffer(self, name: str) -> Optional[np.ndarray]:
+        """返回可复用的工作缓冲区，尚未分配或未启用复用时返回 None（由 OpenCV 分配）"""
+        return self._buffers.get(name) if self.reuse_buffers else None
+    
+    def _keep(self, name: str, array: np.ndarray) -> np.ndarray:
+        """记录 OpenCV 输出的数组，下一帧作为 dst 复用"""
+        if self.reuse_buffers:
+            self._buffers[name] = array
+        return array
+    
+    def _region(self, frame_shape: tuple) -> tuple:
+        """
+        按画面尺寸栅格化检测区域掩码
+        
+        Returns:
+            (crop, mask, thumb_mask): 原始坐标下检测区域的外接矩形 (x, y, w, h)、
+            裁剪并缩放到检测分辨率的掩码、预筛选缩略图尺寸的掩码
+        """
+        if self._mask_region is not None and self._mask_region[0] == frame_shape[:2]:
+            return self._mask_region[1:]
+        
+        height, width = frame_shape[:2]
+        full = self.mask.rasterize(width, height)
+        crop = cv2.boundingRect(full)
+        if crop[2] == 0 or crop[3] == 0:
+            raise ValueError("检测区域为空：ROI 被忽略区域完全覆盖")
+        x, y, w, h = crop
+        mask = full[y:y + h, x:x + w]
+        if self.detection_scale < 1:
+            mask = cv2.resize(mask, None, fx=self.detection_scale, fy=self.detection_scale,
+                              interpolation=cv2.INTER_NEAREST)
+        thumb_mask = cv2.resize(mask, None, fx=self.PREFILTER_SCALE, fy=self.PREFILTER_SCALE,
+                                interpolation=cv2.INTER_AREA)
+        thumb_mask = (thumb_mask > 0).astype(np.uint8)
+        
+        self._mask_region = (frame_shape[:2], crop, mask, thumb_mask)
+        return self._mask_region[1:]
+    
+    def detect_motion(self, frame: np.ndarray) -> Tuple[bool, np.ndarray, MotionRegions]:
         """
         检测单帧中的运动
         
         Args:
             frame: 输入视频帧 (BGR格式)
-            
+        
         Returns:
-            (has_motion, motion_mask, contours): 是否检测到运动、运动区域的掩码、检测到的轮廓列表
+            (has_motion, motion_mask, regions): 是否检测到运动、运动区域的掩码（检测分辨率）、
+            检测到的运动区域（原始帧坐标的外接矩形和面积）；配置了检测区域掩码时，运动掩码只覆盖检测区域的外接矩形
         """
+        profiler = self.profiler
+        started = profiler.start()
+        
+        # 只处理检测区域的外接矩形
+        region_mask = thumb_mask = None
+        offset = None
+        if self.mask is not None:
+            (x, y, w, h), region_mask, thumb_mask = self._region(frame.shape)
+            frame = frame[y:y + h, x:x + w]
+            offset = np.array([x, y], dtype=np.int32)
+        
+        # 画面尺寸变化时丢弃工作缓冲区；灰度图、模糊图和缩略图会被后端或下一帧引用，
+        # 两组缓冲区交替使用
+        if frame.shape != self._buffer_shape:
+            self._buffers = {}
+            self._buffer_shape = frame.shape
+        self._flip ^= 1
+        current = str(self._flip)
+        
+        # 缩小到检测分辨率
+        if self.detection_scale < 1:
+            frame = self._keep('small', cv2.resize(frame, None, self._buffer('small'),
+                                                   fx=self.detection_scale, fy=self.detection_scale,
+                                                   interpolation=cv2.INTER_AREA))
+        
         # 转换为灰度图
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (21, 21), 0)
+        gray = self._keep('gray' + current, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY,
+                                                          dst=self._buffer('gray' + current)))
+        self.stats['frames'] += 1
+        started = profiler.lap('gray', started)
+        
+        if self.backend is None:
+            self.backend = DETECTION_BACKENDS[self.backend_name](self.threshold_value, self.blur_ksize)
         
-        # 如果是第一帧，初始化
-        if self.prev_frame is None:
-            self.prev_frame = gray
-            return False, np.zeros_like(gray), []
+        # 第一级：缩略图帧差明显低于阈值时直接判定为无运动，跳过模糊和轮廓查找
+        thumb = None
+        if self.prefilter:
+            thumb = self._keep('thumb' + current, cv2.resize(gray, None, self._buffer('thumb' + current),
+                                                              fx=self.PREFILTER_SCALE, fy=self.PREFILTER_SCALE,
+                                                              interpolation=cv2.INTER_AREA))
+            if self.prev_thumb is not None and thumb.shape == self.prev_thumb.shape:
+                thumb_diff = self._keep('thumb_diff', cv2.absdiff(self.prev_thumb, thumb,
+                                                                  dst=self._buffer('thumb_diff')))
+                _, max_diff, _, _ = cv2.minMaxLoc(thumb_diff, thumb_mask)
+                if max_diff < self.threshold_value * self.PREFILTER_MARGIN:
+                    self.stats['prefilter_rejected'] += 1
+                    self.backend.skip(gray)
+                    self.prev_thumb = thumb
+                    profiler.lap('prefilter', started)
+                    return False, self._empty_mask(gray), MotionRegions()
+            started = profiler.lap('prefilter', started)
         
-        # 计算帧差
-        frame_diff = cv2.absdiff(self.prev_frame, gray)
+        # 第二级：完整检测
+        blurred = self._keep('blurred' + current, cv2.GaussianBlur(gray, self.blur_ksize, 0,
+                                                                    dst=self._buffer('blurred' + current)))
+        self.prev_thumb = thumb
+        started = profiler.lap('blur', started)
         
-        # 二值化
-        threshold_value = self.sensitivity * 2.55  # 转换为0-255范围
-        _, thresh = cv2.threshold(frame_diff, threshold_value, 255, cv2.THRESH_BINARY)
+        # 前景掩码（后端尚未建立参考时为 None）
+        thresh = self.backend.apply(gray, blurred, self._buffer('foreground'))
+        if thresh is None:
+            profiler.lap('diff', started)
+            return False, self._empty_mask(blurred), MotionRegions()
+        self._keep('foreground', thresh)
         
-        # 形态学操作，去除噪声并连接断裂的运动区域
-        kernel = np.ones((5, 5), np.uint8)
-        thresh = cv2.dilate(thresh, kernel, iterations=3)  # 增加膨胀次数，连接断裂区域
-        thresh = cv2.erode(thresh, kernel, iterations=1)
+        # 排除忽略区域的前景
+        if region_mask is not None:
+            cv2.bitwise_and(thresh, region_mask, dst=thresh)
+        started = profiler.lap('diff', started)
         
-        # 再次膨胀以确保运动区域连续
-        kernel_large = np.ones((7, 7), np.uint8)
-        thresh = cv2.dilate(thresh, kernel_large, iterations=2)
+        # 形态学操作，去除噪声并连接断裂的运动区域（两个缓冲区交替作为输出）
+        for step, (operation, kernel, anchor) in enumerate(self.morphology):
+            name = f'morph{step % 2}'
+            thresh = self._keep(name, operation(thresh, kernel, self._buffer(name), anchor))
+        started = profiler.lap('morphology', started)
         
-        # 查找轮廓
+        # 查找轮廓，一次性计算外接矩形和面积，过滤出足够大的运动区域并映射回原始帧坐标
         contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        regions = MotionRegions.from_contours(contours, self.scaled_min_area, self.detection_scale, offset)
+        has_motion = len(regions) > 0
+        profiler.lap('contours', started)
         
-        # 过滤出足够大的运动区域轮廓
-        has_motion = False
-        motion_contours = []
-        for contour in contours:
-            if cv2.contourArea(contour) > self.min_area:
-                has_motion = True
-                motion_contours.append(contour)
+        if has_motion:
+            self.stats['motion'] += 1
+        else:
+            self.stats['contour_rejected'] += 1
         
-        # 更新前一帧
-        self.prev_frame = gray
+        return has_motion, thresh, regions
+    
+    def _empty_mask(self, like: np.ndarray) -> np.ndarray:
+        """无运动时返回的全零掩码（复用缓冲区时只分配一次）"""
+        empty = self._buffer('empty')
+        if empty is None or empty.shape != like.shape:
+            empty = self._keep('empty', np.zeros_like(like))
+        return empty
+    
+    @staticmethod
+    def _empty_stats() -> dict:
+        """各检测阶段的帧计数"""
+        return {'frames': 0, 'prefilter_rejected': 0, 'contour_rejected': 0, 'motion': 0}
+    
+    def format_stats(self) -> str:
+        """
+        格式化各检测阶段的帧计数
         
-        return has_motion, thresh, motion_contours
+        Returns:
+            形如 "检测 120 帧: 预筛选排除 100, 轮廓阶段排除 8, 有运动 12" 的说明
+        """
+        stats = self.stats
+        return (f"检测 {stats['frames']} 帧: 预筛选排除 {stats['prefilter_rejected']}, "
+                f"轮廓阶段排除 {stats['contour_rejected']}, 有运动 {stats['motion']}")
     
     def reset(self):
-        """重置检测器状态"""
-        self.prev_frame = None
-        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
-            history=500,
-            varThreshold=16,
-            detectShadows=False
-        )
+        """重置检测器状态和阶段计数（后端在下一次检测时重新创建）"""
+        self.backend = None
+        self.prev_thumb = None
+        self.stats = self._empty_stats()
 
 
 class VideoProcessor:
@@ -96,7 +609,16 @@ class VideoProcessor:
                  sensitivity: int = 25,
                  min_interval: float = 1.0,
                  fps: int = 2,
-                 min_area: int = 300):
+                 min_area: int = 300,
+                 seek_keyframes: bool = False,
+                 detection_scale: float = 1.0,
+                 index_cache: Optional[MotionIndexCache] = None,
+                 threaded_decode: bool = False,
+                 prefilter: bool = True,
+                 adaptive_fps: int = 0,
+                 detection_backend: str = 'diff',
+                 detection_mask: Optional[DetectionMask] = None,
+                 profiler: Optional[StageProfiler] = None):
         """
         初始化视频处理器
         
@@ -105,12 +627,32 @@ class VideoProcessor:
             min_interval: 两次截图之间的最小时间间隔（秒）
             fps: 处理帧率，每秒处理的帧数
             min_area: 最小运动区域面积
+            seek_keyframes: 是否按关键帧跳转采样（适合极低的处理帧率）
+            detection_scale: 检测分辨率缩放比例 (0-1]，标注仍在原始分辨率上绘制
+            index_cache: 运动索引缓存，命中时直接从索引推导截图，只解码需要截图的帧
+            threaded_decode: 是否使用独立的解码线程，使解码与运动检测并行
+            prefilter: 是否启用缩略图预筛选，静止帧跳过完整的轮廓检测
+            adaptive_fps: 自适应采样时有运动期间的处理帧率，空闲时按 fps 采样；0 表示固定按 fps 采样
+            detection_backend: 运动检测后端 (diff/average/mog2/knn)
+            detection_mask: 检测区域掩码，None 表示检测整个画面
+            profiler: 分阶段计时器（解码、检测各阶段、标注），None 表示不计时
         """
         self.sensitivity = sensitivity
         self.min_interval = min_interval
         self.process_fps = fps
         self.min_area = min_area
-        self.motion_detector = MotionDetector(sensitivity, min_area)
+        self.seek_keyframes = seek_keyframes
+        self.detection_scale = detection_scale
+        self.index_cache = index_cache
+        self.threaded_decode = threaded_decode
+        self.prefilter = prefilter
+        self.adaptive_fps = adaptive_fps
+        self.detection_backend = detection_backend
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.motion_detector = MotionDetector(sensitivity, min_area, detection_scale, prefilter,
+                                              detection_backend, detection_mask, profiler=self.profiler)
+        self.last_extract_time = -min_interval
+        self.last_index: Optional[MotionIndex] = None  # 最近一次 iter_motion_frames 使用的运动索引
     
     def process_video(self, 
                      video_path: str,
@@ -119,98 +661,229 @@ class VideoProcessor:
         """
         处理单个视频文件，提取包含运动的截图
         
+        所有截图会保存在内存中直到视频处理结束；长视频请使用 iter_motion_frames 流式处理。
+        
         Args:
             video_path: 视频文件路径
             callback: 回调函数，接收 (frame, timestamp, has_motion, current_frame, total_frames) 参数
             output_video_path: 已弃用，保留用于向后兼容
-            
+        
         Returns:
             提取的帧列表，每个元素为 (frame, timestamp) 元组
         """
+        return list(self.iter_motion_frames(video_path, callback))
+    
+    def iter_motion_frames(self,
+                           video_path: str,
+                           callback=None) -> Iterator[Tuple[np.ndarray, float]]:
+        """
+        流式处理单个视频文件，检测到需要截图的帧时立即产出
+        
+        调用方每处理完一帧即可释放，峰值内存与视频长度和运动密度无关。
+        
+        Args:
+            video_path: 视频文件路径
+            callback: 回调函数，接收 (frame, timestamp, has_motion, current_frame, total_frames) 参数
+        
+        Yields:
+            (frame, timestamp): 带标注的截图和对应时间（秒）
+        """
+        self.last_index = None
+        # 命中运动索引缓存时无需重新检测
+        if self.index_cache:
+            index = self.index_cache.load(video_path, self.index_params())
+            if index is not None:
+                print("使用缓存的运动索引")
+                self.last_index = index
+                yield from self.iter_screenshots_from_index(video_path, index)
+                return
+        
         cap = cv2.VideoCapture(video_path)
         
         if not cap.isOpened():
             raise ValueError(f"无法打开视频文件: {video_path}")
         
-        # 获取视频信息
-        video_fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        try:
+            # 获取视频信息
+            video_fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            
+            # 计算帧间隔
+            frame_interval = max(1, int(video_fps / self.process_fps)) if video_fps > 0 else 1
+            sampler = AdaptiveSampler.for_rates(video_fps, self.process_fps, self.adaptive_fps)
+            
+            index = self.last_index = MotionIndex(video_fps, total_frames)
+            
+            self.reset()
+            
+            # 只解码采样帧，其余帧仅 grab() 跳过
+            with open_frame_source(cap, frame_interval, self.seek_keyframes, self.threaded_decode,
+                                   sampler if sampler.adaptive else None) as frames:
+                for frame_count, frame in self.profiler.timed('decode', frames):
+                    current_time = frame_count / video_fps if video_fps > 0 else 0
+                    
+                    # 检测运动
+                    has_motion, motion_mask, regions = self.motion_detector.detect_motion(frame)
+                    index.add(frame_count, current_time, has_motion, regions)
+                    sampler.update(frame_count, has_motion)
+                    
+                    # 提取截图（如果检测到运动且距离上次提取已超过最小间隔）
+                    annotated_frame = self.select_screenshot(frame, has_motion, regions, current_time)
+                    if annotated_frame is not None:
+                        yield annotated_frame, current_time
+                    
+                    # 调用回调函数（每个间隔帧调用一次）
+                    if callback:
+                        callback(frame, current_time, has_motion, frame_count, total_frames)
+        finally:
+            cap.release()
         
-        # 计算帧间隔
-        frame_interval = int(video_fps / self.process_fps) if video_fps > 0 else 1
+        print(self.motion_detector.format_stats())
         
-        extracted_frames = []
-        last_extract_time = -self.min_interval  # 确保第一帧可以被提取
-        frame_count = 0
+        # 只有完整处理的视频才写入缓存
+        if self.index_cache:
+            self.index_cache.save(video_path, self.index_params(), index)
+    
+    def index_params(self) -> dict:
+        """运动索引缓存键中的检测参数（检测器参数 + 采样帧率）"""
+        params = self.motion_detector.config()
+        params['fps'] = self.process_fps
+        params['seek_keyframes'] = self.seek_keyframes
+        params['adaptive_fps'] = self.adaptive_fps
+        # 自适应采样时片段提取器会在事件开始处补充采样，截图流程不补充，两者的索引不能共用
+        if self.adaptive_fps:
+            params['backfilled'] = False
+        return params
+    
+    def screenshots_from_index(self, video_path: str, index: MotionIndex) -> list:
+        """
+        根据运动索引推导截图，只解码需要截图的帧
         
+        Args:
+            video_path: 视频文件路径
+            index: 运动索引
+        
+        Returns:
+            提取的帧列表，每个元素为 (frame, timestamp) 元组
+        """
+        return list(self.iter_screenshots_from_index(video_path, index))
+    
+    def iter_screenshots_from_index(self,
+                                    video_path: str,
+                                    index: MotionIndex) -> Iterator[Tuple[np.ndarray, float]]:
+        """
+        根据运动索引流式推导截图，只解码需要截图的帧
+        
+        Args:
+            video_path: 视频文件路径
+            index: 运动索引
+        
+        Yields:
+            (frame, timestamp): 带标注的截图和对应时间（秒）
+        """
+        self.reset()
+        selected = []
+        for i in np.flatnonzero(index.has_motion):
+            current_time = float(index.timestamps[i])
+            if (current_time - self.last_extract_time) >= self.min_interval:
+                selected.append(i)
+                self.last_extract_time = current_time
+        
+        yield from self.iter_index_frames(video_path, index, selected)
+    
+    def iter_index_frames(self,
+                          video_path: str,
+                          index: MotionIndex,
+                          samples: List[int]) -> Iterator[Tuple[np.ndarray, float]]:
+        """
+        跳转解码运动索引中指定的采样帧，并用索引中的运动区域标注
+        
+        Args:
+            video_path: 视频文件路径
+            index: 运动索引
+            samples: 采样帧序号列表（按时间顺序）
+        
+        Yields:
+            (frame, timestamp): 带标注的帧和对应时间（秒）
+        """
+        if len(samples) == 0:
+            return
+        
+        cap = cv2.VideoCapture(video_path)
+        
+        if not cap.isOpened():
+            raise ValueError(f"无法打开视频文件: {video_path}")
+        
+        try:
+            for i in samples:
+                started = self.profiler.start()
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(index.frame_indices[i]))
+                ret, frame = cap.read()
+                self.profiler.lap('redecode', started)
+                if not ret:
+                    break
+                current_time = float(index.timestamps[i])
+                yield self._draw_motion_boxes(frame, index.regions(i), current_time), current_time
+        finally:
+            cap.release()
+    
+    def reset(self):
+        """重置检测器和截图间隔状态，开始处理新视频前调用"""
         self.motion_detector.reset()
+        self.last_extract_time = -self.min_interval  # 确保第一帧可以被提取
+    
+    def select_screenshot(self,
+                          frame: np.ndarray,
+                          has_motion: bool,
+                          regions: MotionRegions,
+                          current_time: float) -> Optional[np.ndarray]:
+        """
+        根据检测结果和最小间隔判断是否截图
         
-        while True:
-            ret, frame = cap.read()
-            
-            if not ret:
-                break
-            
-            # 只处理间隔帧
-            if frame_count % frame_interval == 0:
-                current_time = frame_count / video_fps if video_fps > 0 else 0
-                
-                # 检测运动
-                has_motion, motion_mask, contours = self.motion_detector.detect_motion(frame)
-                
-                # 如果检测到运动
-                if has_motion:
-                    # 创建带有运动检测标注的帧（绿色矩形框）
-                    annotated_frame = self._draw_motion_contours(frame.copy(), contours, current_time)
-                    
-                    # 提取截图（如果距离上次提取已超过最小间隔）
-                    if (current_time - last_extract_time) >= self.min_interval:
-                        extracted_frames.append((annotated_frame.copy(), current_time))
-                        last_extract_time = current_time
-                
-                # 调用回调函数（每个间隔帧调用一次）
-                if callback:
-                    callback(frame, current_time, has_motion, frame_count, total_frames)
-            
-            frame_count += 1
+        供外部的单遍处理流程（例如 VideoClipExtractor.process_video）复用，
+        检测结果由调用方提供，不会再次运行运动检测。
         
-        cap.release()
-            
-        return extracted_frames
+        Args:
+            frame: 原始视频帧（不会被修改）
+            has_motion: 是否检测到运动
+            regions: 运动区域
+            current_time: 当前时间（秒）
+        
+        Returns:
+            带标注的截图，不需要截图时返回 None
+        """
+        if not has_motion:
+            return None
+        
+        if (current_time - self.last_extract_time) < self.min_interval:
+            return None
+        
+        self.last_extract_time = current_time
+        # 创建带有运动检测标注的帧（绿色矩形框）
+        return self._draw_motion_boxes(frame.copy(), regions, current_time)
     
-    def _draw_motion_contours(self, frame: np.ndarray, contours: list, current_time: float) -> np.ndarray:
+    def _draw_motion_boxes(self, frame: np.ndarray, regions: MotionRegions, current_time: float) -> np.ndarray:
         """
-        在帧上绘制运动检测的轮廓和相关信息
+        在帧上绘制运动区域的边界框和相关信息
         
         Args:
             frame: 要绘制的帧
-            contours: 运动轮廓列表
+            regions: 运动区域
             current_time: 当前时间（秒）
-            
+        
         Returns:
             绘制后的帧
         """
-        # 为每个轮廓绘制扩大的绿色矩形边界框
-        frame_h, frame_w = frame.shape[:2]
-        for contour in contours:
-            # 获取边界框
-            x, y, w, h = cv2.boundingRect(contour)
-            
-            # 扩大边界框，确保完整框住运动物体
-            padding = max(15, int(min(w, h) * 0.15))  # 动态边距，至少15像素
-            x = max(0, x - padding)
-            y = max(0, y - padding)
-            w = min(frame_w - x, w + 2 * padding)
-            h = min(frame_h - y, h + 2 * padding)
-            
-            # 绘制更粗的绿色边界框
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 3)
+        started = self.profiler.start()
+        # 为每个运动区域绘制扩大的绿色矩形边界框
+        draw_motion_boxes(frame, regions.boxes)
         
         # 添加时间戳（左上角，白色）
         timestamp_str = self.format_timestamp(current_time)
         cv2.putText(frame, timestamp_str, (10, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
         
+        self.profiler.lap('annotate', started)
         return frame
     
     @staticmethod
@@ -220,7 +893,7 @@ class VideoProcessor:
         
         Args:
             seconds: 秒数
-            
+        
         Returns:
             格式化的时间戳字符串 (例如: "00h05m30s")
         """
@@ -239,12 +912,28 @@ class VideoProcessor:
         Args:
             frame: 要保存的帧
             output_path: 输出文件路径
-            quality: JPEG质量 (0-100)
-            
+            quality: JPEG/WebP质量 (0-100)
+        
         Returns:
             是否成功保存
         """
+        return cv2.imwrite(output_path, frame, VideoProcessor.image_params(output_path, quality))
+    
+    @staticmethod
+    def image_params(output_path: str, quality: int = 95) -> List[int]:
+        """
+        按输出文件扩展名返回图像编码参数
+        
+        Args:
+            output_path: 输出文件路径
+            quality: JPEG/WebP质量 (0-100)
+        
+        Returns:
+            cv2.imwrite / cv2.imencode 的编码参数
+        """
         if output_path.lower().endswith('.jpg') or output_path.lower().endswith('.jpeg'):
-            return cv2.imwrite(output_path, frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            return [cv2.IMWRITE_JPEG_QUALITY, quality]
+        elif output_path.lower().endswith('.webp'):
+            return [cv2.IMWRITE_WEBP_QUALITY, quality]
         else:
-            return cv2.imwrite(output_path, frame)
+            return []